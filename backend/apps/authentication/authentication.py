@@ -3,17 +3,22 @@ Backend d'authentification JWT personnalisé pour MongoEngine
 """
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
-from .models import User
+from .statuts import statut_utilisateur
 
 
 class TokenUser:
     """
     Classe pour encapsuler le payload du token JWT.
     Permet d'utiliser request.user.get('user_id') dans les views.
+
+    `id`, `role` et `est_actif` viennent des claims du token (aucune
+    requête). Les autres attributs (nom, adresse, ...) chargent le User
+    une seule fois par requête via `utilisateur`.
     """
     def __init__(self, token_payload):
         self.token_payload = token_payload
         self.is_authenticated = True
+        self._utilisateur = None
 
     def get(self, key, default=None):
         """Permet d'utiliser request.user.get('user_id')"""
@@ -23,6 +28,40 @@ class TokenUser:
         """Permet d'utiliser request.user['user_id']"""
         return self.token_payload[key]
 
+    @property
+    def id(self):
+        return self.token_payload.get('user_id')
+
+    pk = id
+
+    @property
+    def role(self):
+        role = self.token_payload.get('role')
+        return role if role is not None else self.utilisateur.role
+
+    @property
+    def est_actif(self):
+        return self.token_payload.get('est_actif', True)
+
+    @property
+    def utilisateur(self):
+        """Document User, chargé au premier accès puis mémorisé."""
+        if self._utilisateur is None:
+            from .models import User
+            self._utilisateur = User.objects(id=self.id).first()
+        return self._utilisateur
+
+    def __getattr__(self, nom):
+        """Claims du token, puis attributs du User chargé à la demande."""
+        if nom.startswith('_'):
+            raise AttributeError(nom)
+        if nom in self.token_payload:
+            return self.token_payload[nom]
+        utilisateur = self.utilisateur
+        if utilisateur is None:
+            raise AttributeError(nom)
+        return getattr(utilisateur, nom)
+
     def __str__(self):
         return f"TokenUser({self.token_payload.get('email', 'unknown')})"
 
@@ -34,7 +73,8 @@ class MongoJWTAuthentication(JWTAuthentication):
 
     def get_user(self, validated_token):
         """
-        Récupérer l'utilisateur depuis MongoDB en utilisant le user_id du token JWT.
+        Vérifier l'utilisateur du user_id du token JWT (statut mis en cache,
+        seuls est_actif, role et version_jeton sont lus dans MongoDB).
         """
         try:
             user_id = validated_token.get('user_id')
@@ -42,16 +82,21 @@ class MongoJWTAuthentication(JWTAuthentication):
             raise InvalidToken('Token ne contient pas user_id')
 
         try:
-            user = User.objects(id=user_id).first()
+            statut = statut_utilisateur(user_id)
         except Exception:
             raise AuthenticationFailed('Utilisateur non trouvé')
 
-        if user is None:
+        if statut is None:
             raise AuthenticationFailed('Utilisateur non trouvé')
 
-        if not user.est_actif:
+        if not statut['est_actif']:
             raise AuthenticationFailed('Utilisateur inactif')
 
+        # Rôle ou statut modifié depuis l'émission du token: claims périmés
+        version = validated_token.get('version')
+        if version is not None and version != statut['version']:
+            raise AuthenticationFailed('Token périmé, veuillez vous reconnecter')
+
         # Retourner un objet TokenUser qui encapsule le payload du token
         # car les views utilisent request.user.get('user_id')
         return TokenUser(validated_token)
@@ -0,0 +1,130 @@
+"""
+Vérification locale des ID tokens Google.
+
+`id_token.verify_oauth2_token` télécharge les certificats publics de Google
+à chaque appel, avec un nouveau transport HTTP. Ici, les certificats sont
+gardés en mémoire pendant la durée annoncée par `Cache-Control: max-age`,
+et téléchargés via une session HTTP partagée (connexions réutilisées).
+La signature, l'audience, l'expiration et l'émetteur du token sont
+vérifiés localement : une connexion Google ne dépend plus d'un appel
+sortant, sauf à l'expiration du cache ou lors d'une rotation des clés.
+
+`GOOGLE_CERTS_URL` permet de pointer vers un serveur de clés de test.
+"""
+import base64
+import json
+import re
+import threading
+import time
+
+import requests
+from django.conf import settings
+from google.auth import jwt
+from requests.adapters import HTTPAdapter
+
+EMETTEURS_GOOGLE = ('accounts.google.com', 'https://accounts.google.com')
+
+# Durée de cache si la réponse n'indique pas de max-age (secondes)
+DUREE_PAR_DEFAUT = 300
+# Délai minimal entre deux téléchargements forcés (kid inconnu)
+INTERVALLE_RAFRAICHISSEMENT_MIN = 30
+# Tolérance d'horloge pour iat/exp (secondes)
+TOLERANCE_HORLOGE = 10
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+def duree_cache(cache_control):
+    """Durée (secondes) annoncée par un en-tête Cache-Control."""
+    correspondance = _MAX_AGE.search(cache_control or '')
+    if correspondance:
+        return int(correspondance.group(1))
+    return DUREE_PAR_DEFAUT
+
+
+def kid_token(token):
+    """Identifiant de clé (kid) de l'en-tête du JWT, sans vérification."""
+    try:
+        entete = token.split('.', 1)[0]
+        entete += '=' * (-len(entete) % 4)
+        return json.loads(base64.urlsafe_b64decode(entete)).get('kid')
+    except (ValueError, AttributeError):
+        raise ValueError('Token mal formé')
+
+
+class CertificatsGoogle:
+    """Certificats publics de Google (kid -> PEM) mis en cache."""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        self._session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        self._verrou = threading.Lock()
+        self._certificats = {}
+        self._expiration = 0
+        self._dernier_telechargement = 0
+
+    def _telecharger(self):
+        reponse = self._session.get(self.url, timeout=self.timeout)
+        reponse.raise_for_status()
+        maintenant = time.monotonic()
+        self._certificats = reponse.json()
+        self._expiration = maintenant + duree_cache(reponse.headers.get('Cache-Control'))
+        self._dernier_telechargement = maintenant
+
+    def certificats(self, kid=None):
+        """
+        Certificats courants. Téléchargés si le cache a expiré, ou si `kid`
+        est inconnu (rotation des clés), au plus une fois par
+        INTERVALLE_RAFRAICHISSEMENT_MIN secondes dans ce second cas.
+        """
+        maintenant = time.monotonic()
+        if maintenant < self._expiration and (kid is None or kid in self._certificats):
+            return self._certificats
+        with self._verrou:
+            maintenant = time.monotonic()
+            expire = maintenant >= self._expiration
+            kid_inconnu = (
+                kid is not None and kid not in self._certificats
+                and maintenant - self._dernier_telechargement >= INTERVALLE_RAFRAICHISSEMENT_MIN
+            )
+            if expire or kid_inconnu:
+                self._telecharger()
+            return self._certificats
+
+    def invalider(self):
+        """Oublier les certificats (prochain appel: téléchargement)."""
+        self._expiration = 0
+
+
+_certificats = None
+_certificats_verrou = threading.Lock()
+
+
+def certificats_google():
+    """Cache partagé des certificats, pour l'URL configurée."""
+    global _certificats
+    if _certificats is None:
+        with _certificats_verrou:
+            if _certificats is None:
+                _certificats = CertificatsGoogle(settings.GOOGLE_CERTS_URL)
+    return _certificats
+
+
+def verifier_id_token(token, client_id):
+    """
+    Vérifier un ID token Google et retourner ses claims.
+    Lève ValueError si le token est invalide (comme verify_oauth2_token).
+    """
+    certificats = certificats_google().certificats(kid_token(token))
+    idinfo = jwt.decode(
+        token,
+        certs=certificats,
+        audience=client_id,
+        clock_skew_in_seconds=TOLERANCE_HORLOGE,
+    )
+    if idinfo.get('iss') not in EMETTEURS_GOOGLE:
+        raise ValueError(f"Émetteur invalide: {idinfo.get('iss')}")
+    return idinfo
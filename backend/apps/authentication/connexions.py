@@ -0,0 +1,99 @@
+"""
+Enregistrement différé de la dernière connexion des utilisateurs.
+
+Mettre à jour `derniere_connexion` par un `user.save()` complet à chaque
+connexion revalide et réécrit tout le document. Les dates sont plutôt
+accumulées en mémoire (une entrée par utilisateur, la plus récente) et
+écrites par lots avec un `bulk_write` d'opérations atomiques, toutes les
+INTERVALLE_VIDAGE secondes, dès que le tampon atteint TAILLE_MAX entrées,
+et à l'arrêt du processus.
+
+`$max` plutôt que `$set`: une date plus ancienne arrivant d'un autre
+worker n'écrase jamais une date plus récente.
+"""
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+INTERVALLE_VIDAGE = 10  # secondes
+TAILLE_MAX = 1000
+
+
+class TamponConnexions:
+    """Dates de dernière connexion en attente d'écriture, par utilisateur."""
+
+    def __init__(self, intervalle=INTERVALLE_VIDAGE, taille_max=TAILLE_MAX):
+        self.intervalle = intervalle
+        self.taille_max = taille_max
+        self._verrou = threading.Lock()
+        self._en_attente = {}
+        self._arret = threading.Event()
+        self._thread = None
+
+    def enregistrer(self, user_id, date=None):
+        """Noter une connexion; l'écriture se fera au prochain vidage."""
+        date = date or datetime.utcnow()
+        with self._verrou:
+            precedente = self._en_attente.get(user_id)
+            if precedente is None or date > precedente:
+                self._en_attente[user_id] = date
+            plein = len(self._en_attente) >= self.taille_max
+            self._demarrer()
+        if plein:
+            self.vider()
+
+    def _demarrer(self):
+        # Thread de vidage lancé au premier usage (après le fork des workers)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._boucle, name='tampon-connexions', daemon=True
+            )
+            self._thread.start()
+
+    def _boucle(self):
+        while not self._arret.wait(self.intervalle):
+            self.vider()
+
+    def vider(self):
+        """Écrire toutes les dates en attente en un seul bulk_write."""
+        from .models import User
+
+        with self._verrou:
+            lot, self._en_attente = self._en_attente, {}
+        if not lot:
+            return 0
+        operations = [
+            UpdateOne({'_id': user_id}, {'$max': {'derniere_connexion': date}})
+            for user_id, date in lot.items()
+        ]
+        try:
+            User._get_collection().bulk_write(operations, ordered=False)
+        except Exception:
+            logger.exception("Écriture des dernières connexions impossible")
+            # Remettre le lot en attente sans écraser des dates plus récentes
+            with self._verrou:
+                for user_id, date in lot.items():
+                    if date > self._en_attente.get(user_id, date.min):
+                        self._en_attente[user_id] = date
+            return 0
+        return len(operations)
+
+    def arreter(self):
+        """Arrêter le thread de vidage et écrire le reste du tampon."""
+        self._arret.set()
+        self.vider()
+
+
+tampon_connexions = TamponConnexions()
+atexit.register(tampon_connexions.arreter)
+
+
+def enregistrer_connexion(user):
+    """Mettre à jour la dernière connexion de l'utilisateur (écriture différée)."""
+    user.derniere_connexion = datetime.utcnow()
+    tampon_connexions.enregistrer(user.id, user.derniere_connexion)
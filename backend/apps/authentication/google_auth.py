@@ -5,11 +5,11 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from decouple import config
 from datetime import datetime
 
+from .certificats_google import verifier_id_token
+from .connexions import enregistrer_connexion
 from .models import User
 from .serializers import UserSerializer, TokenSerializer
 
@@ -38,12 +38,8 @@ def google_auth(request):
                 'error': 'Configuration Google OAuth manquante'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # Vérifier le token Google
-        idinfo = id_token.verify_oauth2_token(
-            token,
-            google_requests.Request(),
-            google_client_id
-        )
+        # Vérifier le token Google (certificats en cache, vérification locale)
+        idinfo = verifier_id_token(token, google_client_id)
 
         # Extraire les informations utilisateur
         google_id = idinfo['sub']
@@ -56,6 +52,7 @@ def google_auth(request):
         # Chercher si l'utilisateur existe déjà avec ce google_id
         user = User.objects(google_id=google_id).first()
         is_new_user = False
+        maintenant = datetime.utcnow()
 
         if not user:
             # Vérifier si un compte avec cet email existe
@@ -68,6 +65,7 @@ def google_auth(request):
                 user.auth_provider = 'google'
                 if email_verifie:
                     user.est_verifie = True
+                user.derniere_connexion = maintenant
                 user.save()
             else:
                 # Créer un nouveau compte avec rôle temporaire 'client'
@@ -84,12 +82,12 @@ def google_auth(request):
                     est_verifie=email_verifie,
                     role='client',  # Rôle par défaut, sera modifié lors du choix
                     mot_de_passe='',  # Pas de mot de passe pour OAuth
+                    derniere_connexion=maintenant,
                 )
                 user.save()
-
-        # Mettre à jour la dernière connexion
-        user.derniere_connexion = datetime.utcnow()
-        user.save()
+        else:
+            # Mettre à jour la dernière connexion (écriture différée, par lots)
+            enregistrer_connexion(user)
 
         # Générer les tokens JWT
         token_serializer = TokenSerializer(data={'user': user})
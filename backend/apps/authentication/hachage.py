@@ -0,0 +1,184 @@
+"""
+Hachage bcrypt des mots de passe dans un pool de threads borné.
+
+bcrypt coûte ~250 ms de CPU par appel (coût 12). Exécuté directement dans
+les workers WSGI, un afflux de connexions occupe tous les coeurs et
+affame les requêtes du catalogue. Les calculs passent donc par un pool de
+`BCRYPT_THREADS` threads (bcrypt libère le GIL), avec au plus
+`BCRYPT_FILE_MAX` demandes en cours ou en attente : au-delà, la demande
+est refusée (503) plutôt que d'allonger la file indéfiniment.
+
+Le temps d'attente dans la file et la durée des calculs sont mesurés par
+processus : compteurs, moyennes et percentiles (p50, p95, p99) sur les
+derniers appels, journalisés au plus une fois par minute et lisibles par
+`statistiques()`. Une attente anormale et chaque refus sont journalisés
+immédiatement.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+# Attente au-delà de laquelle un avertissement est journalisé (secondes)
+SEUIL_ATTENTE_ALERTE = 1.0
+# Appels récents gardés pour les percentiles
+ECHANTILLONS = 1000
+# Intervalle minimal entre deux journalisations des mesures (secondes)
+INTERVALLE_JOURNAL = 60
+
+
+def percentiles(valeurs, rangs=(50, 95, 99)):
+    """Percentiles (méthode du rang le plus proche) d'une liste de valeurs."""
+    valeurs = sorted(valeurs)
+    if not valeurs:
+        return {f'p{rang}': 0.0 for rang in rangs}
+    return {
+        f'p{rang}': valeurs[min(len(valeurs) - 1, round(rang / 100 * (len(valeurs) - 1)))]
+        for rang in rangs
+    }
+
+
+class HachageIndisponible(APIException):
+    """File de hachage pleine: le client doit réessayer."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Service momentanément surchargé, veuillez réessayer.'
+    default_code = 'hachage_indisponible'
+
+
+class PoolHachage:
+    """Pool de threads borné pour bcrypt, avec mesures de la file."""
+
+    def __init__(self, threads, file_max, attente_max):
+        self.attente_max = attente_max
+        self._executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='bcrypt'
+        )
+        self._places = threading.BoundedSemaphore(file_max)
+        self._verrou = threading.Lock()
+        self._stats = {
+            'appels': 0,
+            'refus': 0,
+            'attente_totale': 0.0,
+            'attente_max': 0.0,
+            'calcul_total': 0.0,
+        }
+        self._attentes = deque(maxlen=ECHANTILLONS)
+        self._calculs = deque(maxlen=ECHANTILLONS)
+        self._dernier_journal = time.monotonic()
+
+    def executer(self, fonction, *args):
+        """Exécuter `fonction(*args)` dans le pool et attendre le résultat."""
+        if not self._places.acquire(timeout=self.attente_max):
+            with self._verrou:
+                self._stats['refus'] += 1
+            logger.warning("Hachage bcrypt: file pleine, demande refusée")
+            raise HachageIndisponible()
+        try:
+            soumis = time.monotonic()
+            return self._executor.submit(self._mesurer, soumis, fonction, *args).result()
+        finally:
+            self._places.release()
+            self._journaliser()
+
+    def _mesurer(self, soumis, fonction, *args):
+        debut = time.monotonic()
+        attente = debut - soumis
+        if attente > SEUIL_ATTENTE_ALERTE:
+            logger.warning("Hachage bcrypt: %.2fs d'attente dans la file", attente)
+        try:
+            return fonction(*args)
+        finally:
+            calcul = time.monotonic() - debut
+            with self._verrou:
+                self._stats['appels'] += 1
+                self._stats['attente_totale'] += attente
+                self._stats['attente_max'] = max(self._stats['attente_max'], attente)
+                self._stats['calcul_total'] += calcul
+                self._attentes.append(attente)
+                self._calculs.append(calcul)
+
+    def _journaliser(self):
+        """Journaliser les mesures si la dernière journalisation est ancienne."""
+        maintenant = time.monotonic()
+        with self._verrou:
+            if maintenant - self._dernier_journal < INTERVALLE_JOURNAL:
+                return
+            self._dernier_journal = maintenant
+        stats = self.statistiques()
+        logger.info(
+            "Hachage bcrypt: %d appels, %d refus, attente p50/p95/p99 "
+            "%.3f/%.3f/%.3fs (max %.3fs), calcul p50/p95 %.3f/%.3fs",
+            stats['appels'], stats['refus'],
+            stats['attente']['p50'], stats['attente']['p95'], stats['attente']['p99'],
+            stats['attente_max'], stats['calcul']['p50'], stats['calcul']['p95'],
+        )
+
+    def statistiques(self):
+        """
+        Compteurs et moyennes depuis le démarrage du processus, percentiles
+        de l'attente dans la file et de la durée de calcul sur les
+        `ECHANTILLONS` derniers appels.
+        """
+        with self._verrou:
+            stats = dict(self._stats)
+            attentes, calculs = list(self._attentes), list(self._calculs)
+        appels = stats['appels'] or 1
+        stats['attente_moyenne'] = stats['attente_totale'] / appels
+        stats['calcul_moyen'] = stats['calcul_total'] / appels
+        stats['attente'] = percentiles(attentes)
+        stats['calcul'] = percentiles(calculs)
+        return stats
+
+
+_pool = None
+_pool_verrou = threading.Lock()
+
+
+def pool():
+    """Pool partagé, créé au premier usage avec les réglages courants."""
+    global _pool
+    if _pool is None:
+        with _pool_verrou:
+            if _pool is None:
+                _pool = PoolHachage(
+                    settings.BCRYPT_THREADS,
+                    settings.BCRYPT_FILE_MAX,
+                    settings.BCRYPT_ATTENTE_MAX,
+                )
+    return _pool
+
+
+def hacher(mot_de_passe):
+    """Hash bcrypt du mot de passe au coût `BCRYPT_ROUNDS`."""
+    sel = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
+    return pool().executer(
+        bcrypt.hashpw, mot_de_passe.encode('utf-8'), sel
+    ).decode('utf-8')
+
+
+def verifier(mot_de_passe, hash_existant):
+    """Vérifier un mot de passe contre son hash bcrypt."""
+    return pool().executer(
+        bcrypt.checkpw, mot_de_passe.encode('utf-8'), hash_existant.encode('utf-8')
+    )
+
+
+def cout(hash_existant):
+    """Coût (log2 des itérations) encodé dans un hash bcrypt, ou None."""
+    try:
+        return int(hash_existant.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def statistiques():
+    """Mesures du pool de hachage de ce processus."""
+    return pool().statistiques()
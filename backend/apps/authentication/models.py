@@ -2,9 +2,12 @@
 Modèle MongoDB pour les utilisateurs (clients et vendeurs).
 Collection: users
 """
-from mongoengine import Document, StringField, EmailField, BooleanField, DateTimeField
+from mongoengine import Document, StringField, EmailField, BooleanField, DateTimeField, IntField
 from datetime import datetime
-import bcrypt
+
+from django.conf import settings
+
+from . import hachage
 
 
 class User(Document):
@@ -43,6 +46,10 @@ class User(Document):
     est_actif = BooleanField(default=True)
     est_verifie = BooleanField(default=False)
 
+    # Incrémentée quand le rôle ou l'activation change: les tokens émis
+    # avec une version antérieure sont refusés
+    version_jeton = IntField(default=0)
+
     # Dates
     date_inscription = DateTimeField(default=datetime.utcnow)
     derniere_connexion = DateTimeField()
@@ -60,21 +67,31 @@ class User(Document):
     def __str__(self):
         return f"{self.prenom} {self.nom} ({self.email})"
 
+    def save(self, *args, **kwargs):
+        """
+        Sauvegarder et invalider le statut mis en cache. Un changement de
+        rôle ou d'activation incrémente la version des tokens.
+        """
+        from .statuts import invalider_statut
+        if self.pk and {'role', 'est_actif'} & set(self._get_changed_fields()):
+            self.version_jeton = (self.version_jeton or 0) + 1
+        resultat = super(User, self).save(*args, **kwargs)
+        invalider_statut(self.id)
+        return resultat
+
     def definir_mot_de_passe(self, mot_de_passe_brut):
-        """Hasher le mot de passe avec bcrypt."""
-        self.mot_de_passe = bcrypt.hashpw(
-            mot_de_passe_brut.encode('utf-8'),
-            bcrypt.gensalt()
-        ).decode('utf-8')
+        """Hasher le mot de passe avec bcrypt (pool de hachage borné)."""
+        self.mot_de_passe = hachage.hacher(mot_de_passe_brut)
 
     def verifier_mot_de_passe(self, mot_de_passe_brut):
         """Vérifier le mot de passe."""
-        if not self.mot_de_passe:
+        if not self.mot_de_passe or not mot_de_passe_brut:
             return False
-        return bcrypt.checkpw(
-            mot_de_passe_brut.encode('utf-8'),
-            self.mot_de_passe.encode('utf-8')
-        )
+        return hachage.verifier(mot_de_passe_brut, self.mot_de_passe)
+
+    def besoin_rehachage(self):
+        """Vrai si le hash a été calculé avec un autre coût que BCRYPT_ROUNDS."""
+        return bool(self.mot_de_passe) and hachage.cout(self.mot_de_passe) != settings.BCRYPT_ROUNDS
 
     def est_vendeur(self):
         """Vérifier si l'utilisateur est un vendeur."""
@@ -109,6 +109,11 @@ class ConnexionSerializer(serializers.Serializer):
         if not user.est_actif:
             raise serializers.ValidationError('Ce compte a été désactivé.')
 
+        # Coût bcrypt modifié: recalculer le hash tant qu'on a le mot de passe
+        if user.besoin_rehachage():
+            user.definir_mot_de_passe(mot_de_passe)
+            User.objects(id=user.id).update_one(set__mot_de_passe=user.mot_de_passe)
+
         data['user'] = user
         return data
 
@@ -128,6 +133,8 @@ class TokenSerializer(serializers.Serializer):
         refresh['user_id'] = str(user.id)
         refresh['email'] = user.email
         refresh['role'] = user.role
+        refresh['est_actif'] = user.est_actif
+        refresh['version'] = user.version_jeton or 0
 
         return {
             'access': str(refresh.access_token),
@@ -0,0 +1,45 @@
+"""
+Cache du statut des utilisateurs authentifiés.
+
+`MongoJWTAuthentication` vérifie à chaque requête que l'utilisateur du token
+existe et est actif. Plutôt que de charger tout le document User, seuls
+`est_actif`, `role` et `version_jeton` sont lus (projection) et gardés
+quelques secondes dans un cache mémoire borné. Toute sauvegarde d'un User
+(choix du rôle, modification du profil, désactivation) invalide son entrée.
+"""
+from apps.core.cache import TTLCache
+
+STATUT_TTL = 30  # secondes
+STATUT_TAILLE_MAX = 10000
+
+_statuts = TTLCache(STATUT_TTL, STATUT_TAILLE_MAX)
+_ABSENT = object()  # None est une valeur en cache (utilisateur inexistant)
+
+
+def statut_utilisateur(user_id):
+    """
+    Retourner {'est_actif', 'role', 'version'} de l'utilisateur, ou None s'il
+    n'existe pas. Une seule requête projetée en cas d'absence du cache.
+    """
+    from .models import User
+
+    user_id = str(user_id)
+    statut = _statuts.get(user_id, _ABSENT)
+    if statut is not _ABSENT:
+        return statut
+
+    doc = User.objects(id=user_id).only('est_actif', 'role', 'version_jeton').as_pymongo().first()
+    statut = None
+    if doc is not None:
+        statut = {
+            'est_actif': doc.get('est_actif', True),
+            'role': doc.get('role', User.ROLE_CLIENT),
+            'version': doc.get('version_jeton', 0),
+        }
+    _statuts.set(user_id, statut)
+    return statut
+
+
+def invalider_statut(user_id):
+    """Oublier le statut mis en cache d'un utilisateur."""
+    _statuts.delete(str(user_id))
@@ -0,0 +1,74 @@
+"""
+Tests du cache des certificats Google (serveur de clés simulé).
+"""
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from . import certificats_google
+from .certificats_google import CertificatsGoogle, duree_cache
+
+
+class ReponseCles:
+    """Réponse du serveur de clés simulé."""
+
+    def __init__(self, cles, cache_control='public, max-age=600'):
+        self._cles = cles
+        self.headers = {'Cache-Control': cache_control}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return dict(self._cles)
+
+
+class CertificatsGoogleTests(SimpleTestCase):
+
+    def setUp(self):
+        self.horloge = 1000.0
+        self.addCleanup(mock.patch.stopall)
+        # Horloge du module seulement (pas time.monotonic de tout le processus)
+        mock.patch.object(
+            certificats_google, 'time', mock.Mock(monotonic=lambda: self.horloge)
+        ).start()
+
+        self.cles = {'kid1': 'PEM1'}
+        self.certificats = CertificatsGoogle('https://cles.test/certs')
+        self.telechargement = mock.patch.object(
+            self.certificats._session, 'get',
+            side_effect=lambda url, timeout: ReponseCles(self.cles)
+        ).start()
+
+    def test_duree_cache(self):
+        self.assertEqual(duree_cache('public, max-age=19845, must-revalidate'), 19845)
+        self.assertEqual(duree_cache(None), certificats_google.DUREE_PAR_DEFAUT)
+
+    def test_certificats_gardes_pendant_max_age(self):
+        self.assertEqual(self.certificats.certificats('kid1'), {'kid1': 'PEM1'})
+        self.horloge += 599
+        self.certificats.certificats('kid1')
+        self.assertEqual(self.telechargement.call_count, 1)
+
+        self.horloge += 2
+        self.certificats.certificats('kid1')
+        self.assertEqual(self.telechargement.call_count, 2)
+
+    def test_rotation_des_cles(self):
+        self.certificats.certificats('kid1')
+        self.cles = {'kid1': 'PEM1', 'kid2': 'PEM2'}
+
+        # kid inconnu juste après un téléchargement: pas de nouvel appel
+        self.assertNotIn('kid2', self.certificats.certificats('kid2'))
+        self.assertEqual(self.telechargement.call_count, 1)
+
+        # Au-delà de l'intervalle minimal: nouveau téléchargement
+        self.horloge += certificats_google.INTERVALLE_RAFRAICHISSEMENT_MIN
+        self.assertEqual(self.certificats.certificats('kid2')['kid2'], 'PEM2')
+        self.assertEqual(self.telechargement.call_count, 2)
+
+    def test_invalider(self):
+        self.certificats.certificats()
+        self.certificats.invalider()
+        self.certificats.certificats()
+        self.assertEqual(self.telechargement.call_count, 2)
@@ -6,9 +6,8 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
-from datetime import datetime
 
-from .models import User
+from .connexions import enregistrer_connexion
 from .serializers import (
     UserSerializer,
     InscriptionSerializer,
@@ -17,6 +16,12 @@ from .serializers import (
 )
 
 
+def nouveaux_tokens(user):
+    """Tokens JWT à jour (rôle, statut, version) pour l'utilisateur."""
+    token_data = TokenSerializer().create({'user': user})
+    return {'access': token_data['access'], 'refresh': token_data['refresh']}
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def inscription(request):
@@ -56,9 +61,8 @@ def connexion(request):
     if serializer.is_valid():
         user = serializer.validated_data['user']
 
-        # Mettre à jour la dernière connexion
-        user.derniere_connexion = datetime.utcnow()
-        user.save()
+        # Mettre à jour la dernière connexion (écriture différée, par lots)
+        enregistrer_connexion(user)
 
         # Générer les tokens JWT
         token_serializer = TokenSerializer(data={'user': user})
@@ -104,15 +108,8 @@ def profil(request):
     Obtenir le profil de l'utilisateur connecté.
     GET /api/auth/profil/
     """
-    # Récupérer l'ID utilisateur depuis le token JWT
-    user_id = request.user.get('user_id')
-
-    if not user_id:
-        return Response({
-            'error': 'Utilisateur non trouvé'
-        }, status=status.HTTP_404_NOT_FOUND)
-
-    user = User.objects(id=user_id).first()
+    # Utilisateur du token JWT (chargé une fois par requête)
+    user = request.user.utilisateur
 
     if not user:
         return Response({
@@ -130,8 +127,7 @@ def modifier_profil(request):
     Modifier le profil de l'utilisateur connecté.
     PUT/PATCH /api/auth/profil/modifier/
     """
-    user_id = request.user.get('user_id')
-    user = User.objects(id=user_id).first()
+    user = request.user.utilisateur
 
     if not user:
         return Response({
@@ -141,13 +137,18 @@ def modifier_profil(request):
     serializer = UserSerializer(user, data=request.data, partial=True)
 
     if serializer.is_valid():
+        version = user.version_jeton
         updated_user = serializer.update(user, serializer.validated_data)
         updated_user.save()
 
-        return Response({
+        reponse = {
             'message': 'Profil mis à jour avec succès',
             'user': UserSerializer(updated_user).data
-        }, status=status.HTTP_200_OK)
+        }
+        # Rôle modifié: les anciens tokens sont périmés
+        if updated_user.version_jeton != version:
+            reponse.update(nouveaux_tokens(updated_user))
+        return Response(reponse, status=status.HTTP_200_OK)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -159,8 +160,7 @@ def changer_mot_de_passe(request):
     Changer le mot de passe de l'utilisateur connecté.
     POST /api/auth/changer-mot-de-passe/
     """
-    user_id = request.user.get('user_id')
-    user = User.objects(id=user_id).first()
+    user = request.user.utilisateur
 
     if not user:
         return Response({
@@ -200,14 +200,7 @@ def choisir_role(request):
     PATCH /api/auth/choisir-role/
     Body: { "role": "client" | "vendeur" }
     """
-    user_id = request.user.get('user_id')
-
-    if not user_id:
-        return Response({
-            'error': 'Token invalide'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-
-    user = User.objects(id=user_id).first()
+    user = request.user.utilisateur
 
     if not user:
         return Response({
@@ -226,7 +219,9 @@ def choisir_role(request):
     user.role = role
     user.save()
 
+    # Les tokens portent le rôle: en émettre de nouveaux
     return Response({
         'message': 'Rôle choisi avec succès',
-        'user': UserSerializer(user).data
+        'user': UserSerializer(user).data,
+        **nouveaux_tokens(user)
     }, status=status.HTTP_200_OK)
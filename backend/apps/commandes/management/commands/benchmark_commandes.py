@@ -0,0 +1,121 @@
+"""
+Banc d'essai de contention sur le passage de commande.
+
+Usage: python manage.py benchmark_commandes [--threads 16] [--stock 100] [--commandes 20]
+
+Crée un produit « chaud » avec un stock limité, puis `--threads` clients
+passent chacun `--commandes` commandes d'un exemplaire en parallèle. La
+commande vérifie qu'il n'y a pas de survente (unités vendues == stock
+initial consommé, stock final >= 0) et affiche débit et latences. Les
+données créées (produit, paniers, commandes) sont supprimées à la fin.
+
+À lancer sur une base de test: les écritures sont réelles.
+"""
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.commandes.models import Commande
+from apps.commandes.services import passer_commande, StockInsuffisant
+from apps.panier import services as panier_services
+from apps.panier.models import Panier
+from apps.produits.models import Produit, Categorie
+
+ADRESSE_TEST = {
+    'rue': '1 rue du Test', 'ville': 'Tunis',
+    'code_postal': '1000', 'telephone': '00000000',
+}
+
+
+def centile(valeurs, p):
+    if not valeurs:
+        return 0
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p))]
+
+
+class Command(BaseCommand):
+    help = "Mesure le passage de commande concurrent sur un produit à stock limité."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--stock', type=int, default=100)
+        parser.add_argument('--commandes', type=int, default=20,
+                            help="Commandes tentées par thread.")
+
+    def handle(self, *args, **options):
+        suffixe = uuid.uuid4().hex[:8]
+        categorie = Categorie.objects.first()
+        if categorie is None:
+            raise CommandError("Au moins une catégorie est nécessaire.")
+
+        produit = Produit(
+            nom=f'Produit benchmark {suffixe}',
+            slug=f'benchmark-{suffixe}',
+            description='Produit temporaire du banc d\'essai',
+            prix=10,
+            stock=options['stock'],
+            categorie=categorie,
+            vendeur_id='benchmark',
+            type_produit=Produit.TYPE_PARAPHARMACIE,
+            est_actif=True,
+        ).save()
+        clients = [f'benchmark-{suffixe}-{i}' for i in range(options['threads'])]
+
+        reussites, ruptures, erreurs, latences = [], [], [], []
+        verrou = threading.Lock()
+
+        def client(client_id):
+            for _ in range(options['commandes']):
+                panier_services.ajouter_article(client_id, produit, 1)
+                debut = time.perf_counter()
+                try:
+                    commande = passer_commande(client_id, ADRESSE_TEST)
+                    resultat = reussites
+                except StockInsuffisant:
+                    commande, resultat = None, ruptures
+                except Exception as e:
+                    commande, resultat = e, erreurs
+                duree = time.perf_counter() - debut
+                with verrou:
+                    resultat.append(commande)
+                    latences.append(duree)
+
+        threads = [threading.Thread(target=client, args=(c,)) for c in clients]
+        debut = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            duree_totale = time.perf_counter() - debut
+
+            stock_final = Produit.objects(id=produit.id).scalar('stock').first()
+            self.stdout.write(
+                f"{len(latences)} tentatives en {duree_totale:.2f}s "
+                f"({len(latences) / duree_totale:.0f}/s) avec {len(threads)} threads"
+            )
+            self.stdout.write(
+                f"réussies: {len(reussites)}, rupture de stock: {len(ruptures)}, "
+                f"erreurs: {len(erreurs)}"
+            )
+            self.stdout.write(
+                f"latence p50: {centile(latences, 0.5) * 1000:.1f} ms, "
+                f"p95: {centile(latences, 0.95) * 1000:.1f} ms, "
+                f"max: {max(latences, default=0) * 1000:.1f} ms"
+            )
+            for erreur in erreurs[:5]:
+                self.stdout.write(self.style.ERROR(f"erreur: {erreur!r}"))
+
+            vendus = sum(a.quantite for commande in reussites for a in commande.articles)
+            survente = stock_final < 0 or vendus != options['stock'] - stock_final
+            message = f"stock initial {options['stock']}, stock final {stock_final}"
+            if survente:
+                raise CommandError(f"Incohérence de stock: {message}, {vendus} vendus")
+            self.stdout.write(self.style.SUCCESS(f"Aucune survente ({message})."))
+        finally:
+            Commande.objects(client_id__in=clients).delete()
+            Panier.objects(client_id__in=clients).delete()
+            produit.delete()
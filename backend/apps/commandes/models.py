@@ -76,6 +76,10 @@ class Commande(Document):
     notes_client = StringField()
     notes_vendeur = StringField()
 
+    # Clé d'idempotence (préfixée par client_id): un passage de commande
+    # rejoué retrouve la commande déjà créée
+    cle_idempotence = StringField()
+
     # Dates
     date_commande = DateTimeField(default=datetime.utcnow)
     date_livraison_estimee = DateTimeField()
@@ -88,7 +92,8 @@ class Commande(Document):
             'client_id',
             'statut',
             'date_commande',
-            'est_payee'
+            'est_payee',
+            {'fields': ['cle_idempotence'], 'unique': True, 'sparse': True},
         ]
     }
 
@@ -0,0 +1,48 @@
+"""
+Serializers pour les commandes.
+"""
+from rest_framework import serializers
+
+
+class ArticleCommandeSerializer(serializers.Serializer):
+    """Ligne de commande."""
+    produit_id = serializers.CharField()
+    nom_produit = serializers.CharField()
+    quantite = serializers.IntegerField()
+    prix_unitaire = serializers.FloatField()
+    prix_total = serializers.FloatField()
+
+
+class CommandeSerializer(serializers.Serializer):
+    """Commande (lecture)."""
+    id = serializers.SerializerMethodField()
+    numero_commande = serializers.CharField()
+    client_id = serializers.CharField()
+    articles = ArticleCommandeSerializer(many=True)
+    montant_total = serializers.FloatField()
+    frais_livraison = serializers.FloatField()
+    montant_final = serializers.FloatField()
+    statut = serializers.CharField()
+    adresse_livraison = serializers.DictField()
+    est_payee = serializers.BooleanField()
+    notes_client = serializers.CharField(allow_null=True)
+    date_commande = serializers.DateTimeField()
+    date_livraison_estimee = serializers.DateTimeField(allow_null=True)
+
+    def get_id(self, obj):
+        """Convertir ObjectId MongoDB en string."""
+        return str(obj.id)
+
+
+class AdresseLivraisonSerializer(serializers.Serializer):
+    """Adresse de livraison d'une commande."""
+    rue = serializers.CharField(max_length=255)
+    ville = serializers.CharField(max_length=100)
+    code_postal = serializers.CharField(max_length=10)
+    telephone = serializers.CharField(max_length=20)
+
+
+class PasserCommandeSerializer(serializers.Serializer):
+    """Données du passage de commande."""
+    adresse_livraison = AdresseLivraisonSerializer()
+    notes_client = serializers.CharField(required=False, allow_blank=True, default='')
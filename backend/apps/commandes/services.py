@@ -0,0 +1,190 @@
+"""
+Passage de commande: du panier à la commande.
+
+Le stock est réservé ligne par ligne par des `$inc` conditionnels
+(`stock >= quantité`) : MongoDB garantit l'atomicité de chaque mise à jour,
+deux commandes simultanées sur un produit très demandé ne peuvent donc pas
+le survendre, sans verrou global. Si une ligne échoue (stock épuisé
+entre-temps) ou si l'enregistrement de la commande échoue, les lignes déjà
+réservées sont rendues par des `$inc` inverses (compensation) plutôt que
+par une transaction, qui exigerait un replica set.
+
+Les réservations ne touchent pas au cache du catalogue : il relit le stock
+courant des produits qu'il sert (`apps.produits.cache.actualiser_stock`).
+
+Un prix modifié depuis l'ajout au panier interrompt la commande (409) : le
+panier est mis aux prix courants et le client confirme en renvoyant la
+commande. Avec une clé d'idempotence, une commande rejouée (réseau
+instable, double clic) retourne la commande déjà passée.
+"""
+import logging
+
+from bson import ObjectId
+from django.conf import settings
+from mongoengine import NotUniqueError
+
+from apps.core.compteurs import SequenceJournaliere
+from apps.panier import services as panier_services
+from apps.panier.revalidation import revalider, INDISPONIBLE, PRIX_MODIFIE
+from apps.produits.models import Produit
+from .models import Commande, ArticleCommande
+
+logger = logging.getLogger(__name__)
+
+
+class ErreurCommande(Exception):
+    """Commande impossible; `details` est renvoyé au client."""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.message = message
+        self.details = details or {}
+
+
+class PanierVide(ErreurCommande):
+    def __init__(self):
+        super().__init__('Le panier est vide')
+
+
+class ProduitsIndisponibles(ErreurCommande):
+    def __init__(self, revalidation):
+        super().__init__(
+            'Certains produits ne sont plus disponibles',
+            {'revalidation': revalidation}
+        )
+
+
+class PrixModifies(ErreurCommande):
+    def __init__(self, revalidation):
+        super().__init__(
+            'Certains prix ont changé, veuillez confirmer la commande',
+            {'revalidation': revalidation}
+        )
+
+
+class StockInsuffisant(ErreurCommande):
+    def __init__(self, produit_id, nom_produit):
+        super().__init__(
+            f'Stock insuffisant pour {nom_produit}',
+            {'produit_id': produit_id}
+        )
+
+
+# Numéros de commande: compteur du jour, réservé par blocs par processus
+_sequence_commandes = SequenceJournaliere('commandes', settings.NUMERO_COMMANDE_BLOC)
+
+
+def numero_commande():
+    """Numéro de commande unique, par exemple CMD-20250114-000042."""
+    jour, numero = _sequence_commandes.suivant()
+    return f"CMD-{jour}-{numero:06d}"
+
+
+def reserver_stock(lignes):
+    """
+    Décrémenter le stock de chaque (produit_id, quantite, nom) si suffisant.
+    Tout ou rien: en cas d'échec, les réservations faites sont annulées et
+    StockInsuffisant est levée.
+    """
+    collection = Produit._get_collection()
+    reservees = []
+    try:
+        for produit_id, quantite, nom in lignes:
+            resultat = collection.update_one(
+                {'_id': ObjectId(produit_id), 'est_actif': True, 'stock': {'$gte': quantite}},
+                {'$inc': {'stock': -quantite}}
+            )
+            if resultat.modified_count != 1:
+                raise StockInsuffisant(produit_id, nom)
+            reservees.append((produit_id, quantite))
+    except Exception:
+        liberer_stock(reservees)
+        raise
+    return reservees
+
+
+def liberer_stock(reservees):
+    """Rendre le stock réservé (compensation)."""
+    collection = Produit._get_collection()
+    for produit_id, quantite in reservees:
+        try:
+            collection.update_one({'_id': ObjectId(produit_id)}, {'$inc': {'stock': quantite}})
+        except Exception:
+            logger.exception(
+                "Stock non rendu: produit %s, quantité %s", produit_id, quantite
+            )
+
+
+def passer_commande(client_id, adresse_livraison, notes_client='', cle_idempotence=None):
+    """
+    Transformer le panier du client en commande aux prix actuels.
+    Lève ErreurCommande si le panier est vide, si un produit n'est plus
+    en vente, si un prix a changé ou si le stock ne suffit pas. Avec une
+    clé d'idempotence, une requête rejouée retourne la même commande.
+    """
+    cle = f'{client_id}:{cle_idempotence}' if cle_idempotence else None
+    if cle:
+        existante = Commande.objects(cle_idempotence=cle).first()
+        if existante:
+            return existante
+
+    panier = panier_services.obtenir_panier(client_id)
+    if not panier.get('articles'):
+        raise PanierVide()
+
+    # Sans cache: prix et stock lus au moment de la commande
+    revalidation = revalider(panier)
+    if any(INDISPONIBLE in ligne['problemes'] for ligne in revalidation['lignes']):
+        raise ProduitsIndisponibles(revalidation)
+    modifies = {
+        ligne['produit_id']: ligne['prix_actuel']
+        for ligne in revalidation['lignes'] if PRIX_MODIFIE in ligne['problemes']
+    }
+    if modifies:
+        panier_services.actualiser_prix(client_id, modifies)
+        raise PrixModifies(revalidation)
+
+    lignes = revalidation['lignes']
+    # Ordre stable des réservations entre commandes concurrentes
+    reservees = reserver_stock(sorted(
+        (ligne['produit_id'], ligne['quantite'], ligne['nom_produit'])
+        for ligne in lignes
+    ))
+
+    articles = [
+        ArticleCommande(
+            produit_id=ligne['produit_id'],
+            nom_produit=ligne['nom_produit'],
+            quantite=ligne['quantite'],
+            prix_unitaire=ligne['prix_actuel'],
+            prix_total=ligne['prix_actuel'] * ligne['quantite'],
+        )
+        for ligne in lignes
+    ]
+    commande = Commande(
+        client_id=client_id,
+        numero_commande=numero_commande(),
+        articles=articles,
+        montant_total=sum(article.prix_total for article in articles),
+        adresse_livraison=adresse_livraison,
+        notes_client=notes_client,
+        cle_idempotence=cle,
+    )
+    commande.calculer_montant_final()
+    try:
+        commande.save()
+    except NotUniqueError:
+        liberer_stock(reservees)
+        existante = Commande.objects(cle_idempotence=cle).first() if cle else None
+        if existante is None:
+            raise
+        # Même clé envoyée deux fois en parallèle: l'autre requête a gagné
+        return existante
+    except Exception:
+        liberer_stock(reservees)
+        raise
+
+    panier_services.retirer_articles(
+        client_id, {ligne['produit_id']: ligne['quantite'] for ligne in lignes}
+    )
+    return commande
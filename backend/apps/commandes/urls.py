@@ -2,9 +2,11 @@
 URLs pour les commandes.
 """
 from django.urls import path
+from . import views
 
 app_name = 'commandes'
 
 urlpatterns = [
-    # À implémenter: créer commande, liste commandes, détail commande, etc.
+    path('', views.commandes, name='commandes'),
+    path('<str:numero_commande>/', views.detail_commande, name='detail_commande'),
 ]
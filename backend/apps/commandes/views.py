@@ -1,5 +1,78 @@
+"""
+Views pour les commandes.
+"""
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-# Views à implémenter
+from apps.taches.file import enfiler
+from .models import Commande
+from .serializers import CommandeSerializer, PasserCommandeSerializer
+from .services import passer_commande, ErreurCommande, PrixModifies, StockInsuffisant
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def commandes(request):
+    """
+    Commandes de l'utilisateur connecté, ou passage d'une commande
+    à partir de son panier.
+    GET /api/commandes/
+    POST /api/commandes/  Body: { "adresse_livraison": {...}, "notes_client": "" }
+    En-tête optionnel `Idempotency-Key`: une requête rejouée avec la même
+    clé renvoie la commande déjà passée.
+    """
+    client_id = str(request.user.id)
+
+    if request.method == 'GET':
+        liste = Commande.objects(client_id=client_id).order_by('-date_commande')
+        return Response(CommandeSerializer(liste, many=True).data)
+
+    serializer = PasserCommandeSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        commande = passer_commande(
+            client_id,
+            dict(serializer.validated_data['adresse_livraison']),
+            serializer.validated_data['notes_client'],
+            cle_idempotence=request.headers.get('Idempotency-Key'),
+        )
+    except (PrixModifies, StockInsuffisant) as e:
+        return Response(
+            {'error': e.message, **e.details},
+            status=status.HTTP_409_CONFLICT
+        )
+    except ErreurCommande as e:
+        return Response(
+            {'error': e.message, **e.details},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    enfiler('emails.confirmation_commande', str(commande.id))
+    return Response({
+        'message': 'Commande passée avec succès',
+        'commande': CommandeSerializer(commande).data
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def detail_commande(request, numero_commande):
+    """
+    Détail d'une commande de l'utilisateur connecté.
+    GET /api/commandes/<numero_commande>/
+    """
+    commande = Commande.objects(
+        numero_commande=numero_commande, client_id=str(request.user.id)
+    ).first()
+
+    if commande is None:
+        return Response(
+            {'error': 'Commande non trouvée'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    return Response(CommandeSerializer(commande).data)
@@ -0,0 +1 @@
+# Utilitaires partagés entre les applications Para-plus
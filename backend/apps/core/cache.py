@@ -0,0 +1,82 @@
+"""
+Cache mémoire local au processus, borné en taille et à durée de vie limitée.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+_ABSENT = object()
+
+
+class TTLCache:
+    """
+    Cache LRU thread-safe dont les entrées expirent après `ttl` secondes.
+
+    Utilisé pour les petites données de référence (catégories, vendeurs,
+    statut des utilisateurs) afin d'éviter un aller-retour MongoDB à chaque
+    requête. Chaque worker possède sa propre instance.
+    """
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._donnees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def __contains__(self, cle):
+        return self._lire(cle, _ABSENT) is not _ABSENT
+
+    def __len__(self):
+        return len(self._donnees)
+
+    def _lire(self, cle, defaut):
+        entree = self._donnees.get(cle)
+        if entree is None:
+            return defaut
+        expiration, valeur = entree
+        if expiration < time.monotonic():
+            self._donnees.pop(cle, None)
+            return defaut
+        self._donnees.move_to_end(cle)
+        return valeur
+
+    def get(self, cle, defaut=None):
+        """Retourner la valeur en cache ou `defaut` si absente/expirée."""
+        with self._verrou:
+            return self._lire(cle, defaut)
+
+    def get_many(self, cles):
+        """Retourner un dict des valeurs présentes en cache."""
+        resultat = {}
+        with self._verrou:
+            for cle in cles:
+                valeur = self._lire(cle, _ABSENT)
+                if valeur is not _ABSENT:
+                    resultat[cle] = valeur
+        return resultat
+
+    def set(self, cle, valeur):
+        """Ajouter ou remplacer une entrée."""
+        self.set_many({cle: valeur})
+
+    def set_many(self, valeurs):
+        """Ajouter ou remplacer plusieurs entrées."""
+        expiration = time.monotonic() + self.ttl
+        with self._verrou:
+            for cle, valeur in valeurs.items():
+                self._donnees[cle] = (expiration, valeur)
+                self._donnees.move_to_end(cle)
+            while len(self._donnees) > self.maxsize:
+                self._donnees.popitem(last=False)
+
+    def delete(self, cle):
+        """Supprimer une entrée (sans erreur si absente)."""
+        with self._verrou:
+            self._donnees.pop(cle, None)
+
+    def clear(self):
+        """Vider le cache."""
+        with self._verrou:
+            self._donnees.clear()
+
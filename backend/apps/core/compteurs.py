@@ -0,0 +1,52 @@
+"""
+Séquences numériques par jour, sans verrou ni collision.
+
+Chaque séquence a un compteur par jour dans la collection `counters`
+(`_id` = « nom:AAAAMMJJ »). Un processus réserve un bloc de `taille_bloc`
+numéros par un seul `$inc` atomique (upsert), puis les distribue depuis la
+mémoire : MongoDB n'est sollicité qu'une fois par bloc, et deux processus
+ne reçoivent jamais le même numéro.
+
+Les numéros non distribués d'un bloc sont perdus à l'arrêt du processus :
+la séquence est unique et croissante par processus, mais pas contiguë.
+"""
+import threading
+from datetime import datetime
+
+from mongoengine.connection import get_db
+from pymongo import ReturnDocument
+
+COLLECTION_COMPTEURS = 'counters'
+
+
+class SequenceJournaliere:
+    """Distribue les numéros d'une séquence remise à zéro chaque jour."""
+
+    def __init__(self, nom, taille_bloc=20):
+        self.nom = nom
+        self.taille_bloc = taille_bloc
+        self._verrou = threading.Lock()
+        self._jour = None
+        self._prochain = 0
+        self._fin = -1
+
+    def _reserver_bloc(self, jour):
+        compteur = get_db()[COLLECTION_COMPTEURS].find_one_and_update(
+            {'_id': f'{self.nom}:{jour}'},
+            {'$inc': {'valeur': self.taille_bloc}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._jour = jour
+        self._fin = compteur['valeur']
+        self._prochain = self._fin - self.taille_bloc + 1
+
+    def suivant(self):
+        """Retourner (jour 'AAAAMMJJ', numéro du jour)."""
+        jour = datetime.utcnow().strftime('%Y%m%d')
+        with self._verrou:
+            if jour != self._jour or self._prochain > self._fin:
+                self._reserver_bloc(jour)
+            numero = self._prochain
+            self._prochain += 1
+        return jour, numero
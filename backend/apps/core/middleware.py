@@ -0,0 +1,32 @@
+"""
+En-têtes de cache des fichiers adressés par leur contenu.
+"""
+import re
+
+from django.conf import settings
+
+# Nom de fichier contenant l'empreinte SHA-256 du contenu (images produits
+# et leurs variantes): le contenu d'une telle URL ne change jamais
+FICHIER_ADRESSE_PAR_CONTENU = re.compile(r'/[0-9a-f]{64}(-\d+)?\.\w+$')
+
+CACHE_IMMUABLE = 'public, max-age=31536000, immutable'
+
+
+class CacheImmuableMiddleware:
+    """
+    Marque les réponses des médias adressés par leur contenu comme
+    immuables: navigateurs et CDN les gardent un an sans revalidation.
+    Développement seulement: il n'agit que sur les médias servis par Django
+    (DEBUG); en production, ils sont servis directement par le stockage.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.status_code == 200
+                and request.path.startswith(settings.MEDIA_URL)
+                and FICHIER_ADRESSE_PAR_CONTENU.search(request.path)):
+            response['Cache-Control'] = CACHE_IMMUABLE
+        return response
@@ -0,0 +1,17 @@
+"""
+Outils communs aux tests (`python manage.py test`).
+
+Pendant les tests, MongoEngine est connecté à une base mongomock en
+mémoire (voir `paraplus/settings.py`): ni serveur MongoDB ni réseau.
+"""
+from django.test import SimpleTestCase
+from mongoengine.connection import get_db
+
+
+class MongoTestCase(SimpleTestCase):
+    """Cas de test qui vide la base MongoDB (mongomock) après chaque test."""
+
+    def tearDown(self):
+        base = get_db()
+        base.client.drop_database(base.name)
+        super().tearDown()
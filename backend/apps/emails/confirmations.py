@@ -0,0 +1,63 @@
+"""
+E-mails de confirmation des commandes et des locations.
+
+Exécutés en tâche de fond: la vue ne met en file que l'id de la commande
+ou de la location. Chaque confirmation porte une clé unique et n'est donc
+envoyée qu'une fois, même si la tâche est rejouée.
+"""
+from apps.authentication.models import User
+from apps.commandes.models import Commande
+from apps.locations.models import Location
+from .envoi import envoyer_email
+
+
+def _client(client_id):
+    return User.objects(id=client_id).only('email', 'prenom').first()
+
+
+def confirmation_commande(commande_id):
+    commande = Commande.objects(id=commande_id).first()
+    client = commande and _client(commande.client_id)
+    if client is None:
+        return
+
+    lignes = '\n'.join(
+        f"- {a.nom_produit} x{a.quantite}: {a.prix_total:.2f} TND" for a in commande.articles
+    )
+    texte = (
+        f"Bonjour {client.prenom},\n\n"
+        f"Nous avons bien reçu votre commande {commande.numero_commande}.\n\n"
+        f"{lignes}\n\n"
+        f"Livraison: {commande.frais_livraison:.2f} TND\n"
+        f"Total: {commande.montant_final:.2f} TND\n\n"
+        f"Merci pour votre confiance,\nL'équipe Para-Plus"
+    )
+    envoyer_email(
+        client.email,
+        f"Confirmation de votre commande {commande.numero_commande}",
+        texte,
+        cle=f'commande:{commande.id}',
+    )
+
+
+def confirmation_location(location_id):
+    location = Location.objects(id=location_id).first()
+    client = location and _client(location.client_id)
+    if client is None:
+        return
+
+    texte = (
+        f"Bonjour {client.prenom},\n\n"
+        f"Votre location de « {location.nom_produit} » est réservée "
+        f"du {location.date_debut:%d/%m/%Y} au {location.date_fin:%d/%m/%Y} "
+        f"({location.nombre_jours} jour(s)).\n\n"
+        f"Prix: {location.prix_total:.2f} TND\n"
+        f"Caution: {location.caution:.2f} TND\n\n"
+        f"Merci pour votre confiance,\nL'équipe Para-Plus"
+    )
+    envoyer_email(
+        client.email,
+        f"Confirmation de votre location: {location.nom_produit}",
+        texte,
+        cle=f'location:{location.id}',
+    )
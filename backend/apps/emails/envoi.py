@@ -0,0 +1,318 @@
+"""
+Envoi des e-mails transactionnels.
+
+`envoyer_email()` enregistre le message dans la collection `emails` et met
+son envoi en file (tâche `emails.envoyer`) : la requête HTTP n'attend
+jamais le serveur SMTP.
+
+Côté worker:
+- Les connexions SMTP (et leur négociation TLS) sont gardées ouvertes dans
+  un pool de `EMAIL_CONNEXIONS_SMTP` connexions et réutilisées d'un envoi
+  à l'autre ; une connexion inactive depuis `EMAIL_INACTIVITE_SMTP`
+  secondes est fermée plutôt que réutilisée (les serveurs les coupent).
+- Le débit est limité par fournisseur (domaine du destinataire) pour
+  ne pas être ralenti ou rejeté par gmail.com, outlook.com... :
+  `EMAIL_DEBIT_FOURNISSEUR` messages par seconde, surchargeable par
+  domaine dans `EMAIL_DEBITS_FOURNISSEURS`. La limite s'applique par
+  processus worker.
+- Le limiteur attribue à chaque envoi un créneau, éventuellement futur :
+  un envoi retardé est remis en file une seule fois, pour son créneau,
+  plutôt que d'attendre dans le worker.
+- La file est seule à gérer les reprises : un envoi en échec lève
+  l'exception, la tâche est reprogrammée puis abandonnée après
+  `TENTATIVES_MAX` essais ; un e-mail dont la tâche est abandonnée est
+  compté « échoué ». Avant l'envoi, l'e-mail est réservé atomiquement
+  (« en cours ») : deux tâches pour le même e-mail ne l'envoient qu'une fois.
+- Chaque e-mail envoyé enregistre sa latence (mise en file -> envoi) et
+  la durée de l'échange SMTP (`statistiques()`).
+
+En local, un serveur SMTP factice suffit:
+    python -m aiosmtpd -n -l localhost:8025
+    EMAIL_HOST=localhost EMAIL_PORT=8025 EMAIL_USE_TLS=False
+"""
+import logging
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from mongoengine import NotUniqueError
+from pymongo import ReturnDocument
+
+from apps.taches.file import enfiler
+from apps.taches.models import Tache
+from .models import Email
+
+logger = logging.getLogger(__name__)
+
+# Tentatives de la tâche `emails.envoyer` avant abandon
+TENTATIVES_MAX = 5
+# Durée de réservation d'un e-mail pendant son envoi (secondes)
+DUREE_RESERVATION = 120
+# Statut calculé: e-mail non envoyé dont la tâche est abandonnée
+STATUT_ECHOUE = 'echoue'
+
+
+class PoolSMTP:
+    """Connexions SMTP ouvertes, réutilisées entre les envois."""
+
+    def __init__(self, taille, inactivite):
+        self.inactivite = inactivite
+        self._places = threading.BoundedSemaphore(taille)
+        self._verrou = threading.Lock()
+        self._libres = []  # (connexion, dernière utilisation)
+        self._stats = {'ouvertures': 0, 'envois': 0}
+
+    def _prendre(self):
+        with self._verrou:
+            while self._libres:
+                connexion, derniere = self._libres.pop()
+                if time.monotonic() - derniere < self.inactivite:
+                    return connexion
+                connexion.close()
+        connexion = get_connection(fail_silently=False)
+        connexion.open()
+        with self._verrou:
+            self._stats['ouvertures'] += 1
+        return connexion
+
+    @contextmanager
+    def connexion(self):
+        """Connexion ouverte, rendue au pool après usage (fermée en cas d'erreur)."""
+        self._places.acquire()
+        connexion = None
+        try:
+            connexion = self._prendre()
+            yield connexion
+        except Exception:
+            if connexion is not None:
+                connexion.close()
+                connexion = None
+            raise
+        finally:
+            if connexion is not None:
+                with self._verrou:
+                    self._libres.append((connexion, time.monotonic()))
+                    self._stats['envois'] += 1
+            self._places.release()
+
+    def fermer(self):
+        with self._verrou:
+            libres, self._libres = self._libres, []
+        for connexion, _ in libres:
+            connexion.close()
+
+    def statistiques(self):
+        with self._verrou:
+            return dict(self._stats, libres=len(self._libres))
+
+
+class LimiteurDebit:
+    """
+    Seau à jetons par fournisseur: `debit` messages par seconde. Le solde
+    peut devenir négatif: chaque réservation prend le créneau suivant.
+    """
+
+    def __init__(self, debit_defaut, debits=None):
+        self.debit_defaut = debit_defaut
+        self.debits = debits or {}
+        self._verrou = threading.Lock()
+        self._seaux = {}  # fournisseur -> [jetons, dernier remplissage]
+
+    def reserver(self, fournisseur):
+        """
+        Réserver un envoi vers `fournisseur`. Retourne l'attente (secondes)
+        jusqu'au créneau réservé, 0 s'il est immédiat.
+        """
+        debit = self.debits.get(fournisseur, self.debit_defaut)
+        maintenant = time.monotonic()
+        with self._verrou:
+            jetons, dernier = self._seaux.get(fournisseur, (debit, maintenant))
+            jetons = min(debit, jetons + (maintenant - dernier) * debit) - 1
+            self._seaux[fournisseur] = (jetons, maintenant)
+        return max(0.0, -jetons / debit)
+
+
+_pool = None
+_limiteur = None
+_verrou = threading.Lock()
+
+
+def pool():
+    """Pool SMTP partagé du processus."""
+    global _pool
+    if _pool is None:
+        with _verrou:
+            if _pool is None:
+                _pool = PoolSMTP(settings.EMAIL_CONNEXIONS_SMTP, settings.EMAIL_INACTIVITE_SMTP)
+    return _pool
+
+
+def limiteur():
+    """Limiteur de débit partagé du processus."""
+    global _limiteur
+    if _limiteur is None:
+        with _verrou:
+            if _limiteur is None:
+                _limiteur = LimiteurDebit(
+                    settings.EMAIL_DEBIT_FOURNISSEUR, settings.EMAIL_DEBITS_FOURNISSEURS
+                )
+    return _limiteur
+
+
+def fournisseur(adresse):
+    return adresse.rsplit('@', 1)[-1].lower()
+
+
+def envoyer_email(destinataire, sujet, texte, html=None, cle=None):
+    """
+    Mettre un e-mail en file. Avec une `cle`, un même e-mail n'est mis en
+    file qu'une fois (retourne None s'il l'était déjà).
+    """
+    email = Email(
+        id=ObjectId(),
+        destinataire=destinataire,
+        fournisseur=fournisseur(destinataire),
+        sujet=sujet,
+        texte=texte,
+        html=html,
+        cle=cle,
+    )
+    try:
+        email.save(force_insert=True)
+    except NotUniqueError:
+        return None
+    enfiler('emails.envoyer', str(email.id))
+    return email
+
+
+def _envoyer_message(message):
+    """Envoyer sur une connexion du pool; une connexion coupée par le serveur est remplacée une fois."""
+    try:
+        with pool().connexion() as connexion:
+            connexion.send_messages([message])
+    except smtplib.SMTPServerDisconnected:
+        with pool().connexion() as connexion:
+            connexion.send_messages([message])
+
+
+def _a_envoyer(maintenant):
+    """Filtre des e-mails réservables: en attente, ou réservation expirée."""
+    return {'$or': [
+        {'statut': Email.STATUT_EN_ATTENTE},
+        {'statut': Email.STATUT_EN_COURS, 'reserve_jusqu_a': {'$lte': maintenant}},
+    ]}
+
+
+def reserver_email(email_id):
+    """Passer l'e-mail « en cours » s'il est à envoyer. Retourne l'Email ou None."""
+    maintenant = datetime.utcnow()
+    doc = Email._get_collection().find_one_and_update(
+        {'_id': ObjectId(str(email_id)), **_a_envoyer(maintenant)},
+        {'$set': {
+            'statut': Email.STATUT_EN_COURS,
+            'reserve_jusqu_a': maintenant + timedelta(seconds=DUREE_RESERVATION),
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+    return Email._from_son(doc) if doc else None
+
+
+def envoyer(email_id, creneau_reserve=False):
+    """
+    Envoyer un e-mail en file (tâche `emails.envoyer`). `creneau_reserve`:
+    remis en file pour un créneau déjà attribué par le limiteur.
+    """
+    maintenant = datetime.utcnow()
+    email = Email.objects(
+        __raw__={'_id': ObjectId(str(email_id)), **_a_envoyer(maintenant)}
+    ).only('fournisseur').first()
+    if email is None:
+        return  # Déjà envoyé, ou en cours d'envoi par un autre worker
+
+    if not creneau_reserve:
+        attente = limiteur().reserver(email.fournisseur)
+        if attente > 0:
+            enfiler('emails.envoyer', email_id, creneau_reserve=True, delai=attente)
+            return
+
+    email = reserver_email(email_id)
+    if email is None:
+        return
+
+    message = EmailMultiAlternatives(
+        email.sujet, email.texte, settings.DEFAULT_FROM_EMAIL, [email.destinataire]
+    )
+    if email.html:
+        message.attach_alternative(email.html, 'text/html')
+
+    debut = time.monotonic()
+    try:
+        _envoyer_message(message)
+    except Exception as e:
+        # La file reprogramme la tâche (ou l'abandonne)
+        Email.objects(id=email.id, statut=Email.STATUT_EN_COURS).update_one(
+            set__statut=Email.STATUT_EN_ATTENTE, set__erreur=str(e), unset__reserve_jusqu_a=True
+        )
+        raise
+
+    duree_smtp = time.monotonic() - debut
+    maintenant = datetime.utcnow()
+    latence = (maintenant - email.date_creation).total_seconds()
+    Email.objects(id=email.id).update_one(
+        set__statut=Email.STATUT_ENVOYE,
+        set__date_envoi=maintenant,
+        set__latence=latence,
+        set__duree_smtp=duree_smtp,
+        unset__reserve_jusqu_a=True,
+    )
+    logger.info("E-mail %s envoyé à %s en %.2fs (SMTP %.3fs)",
+                email.id, email.fournisseur, latence, duree_smtp)
+
+
+def _centile(valeurs, centile):
+    if not valeurs:
+        return None
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * centile))]
+
+
+def statistiques(heures=24):
+    """
+    Par fournisseur, sur les dernières `heures`: nombre d'e-mails envoyés,
+    en attente et échoués (tâche abandonnée), et latence d'envoi (moyenne,
+    médiane, 95e centile).
+    """
+    depuis = datetime.utcnow() - timedelta(hours=heures)
+    abandonnes = set(Tache.objects(
+        nom='emails.envoyer', statut=Tache.STATUT_ABANDONNEE, date_creation__gte=depuis
+    ).distinct('args'))
+    par_fournisseur = {}
+    for email in Email.objects(date_creation__gte=depuis).only(
+            'fournisseur', 'statut', 'latence', 'duree_smtp').as_pymongo():
+        stats = par_fournisseur.setdefault(email['fournisseur'], {
+            Email.STATUT_EN_ATTENTE: 0, Email.STATUT_ENVOYE: 0, STATUT_ECHOUE: 0,
+            'latences': [], 'durees_smtp': [],
+        })
+        if email['statut'] == Email.STATUT_ENVOYE:
+            stats[Email.STATUT_ENVOYE] += 1
+        elif str(email['_id']) in abandonnes:
+            stats[STATUT_ECHOUE] += 1
+        else:
+            stats[Email.STATUT_EN_ATTENTE] += 1
+        if email.get('latence') is not None:
+            stats['latences'].append(email['latence'])
+            stats['durees_smtp'].append(email['duree_smtp'])
+
+    for stats in par_fournisseur.values():
+        latences = stats.pop('latences')
+        durees = stats.pop('durees_smtp')
+        stats['latence_moyenne'] = sum(latences) / len(latences) if latences else None
+        stats['latence_mediane'] = _centile(latences, 0.5)
+        stats['latence_p95'] = _centile(latences, 0.95)
+        stats['duree_smtp_moyenne'] = sum(durees) / len(durees) if durees else None
+    return par_fournisseur
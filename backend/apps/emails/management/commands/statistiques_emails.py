@@ -0,0 +1,32 @@
+"""
+Statistiques d'envoi des e-mails par fournisseur.
+
+Usage: python manage.py statistiques_emails [--heures 24]
+"""
+from django.core.management.base import BaseCommand
+
+from apps.emails.envoi import statistiques
+
+
+def _secondes(valeur):
+    return '-' if valeur is None else f'{valeur:.2f}s'
+
+
+class Command(BaseCommand):
+    help = "Affiche les volumes et latences d'envoi des e-mails par fournisseur."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--heures', type=int, default=24, help="Période observée.")
+
+    def handle(self, *args, **options):
+        stats = statistiques(options['heures'])
+        if not stats:
+            self.stdout.write("Aucun e-mail sur la période.")
+            return
+        for fournisseur, s in sorted(stats.items()):
+            self.stdout.write(
+                f"{fournisseur}: {s['envoye']} envoyé(s), {s['en_attente']} en attente, "
+                f"{s['echoue']} échoué(s) | latence moyenne {_secondes(s['latence_moyenne'])}, "
+                f"médiane {_secondes(s['latence_mediane'])}, p95 {_secondes(s['latence_p95'])} | "
+                f"SMTP {_secondes(s['duree_smtp_moyenne'])}"
+            )
@@ -0,0 +1,57 @@
+"""
+Modèle MongoDB pour les e-mails transactionnels.
+Collection: emails
+"""
+from mongoengine import (
+    Document, StringField, DateTimeField, FloatField, EmailField
+)
+from datetime import datetime
+
+
+class Email(Document):
+    """
+    E-mail mis en file, envoyé par le worker de tâches de fond.
+    Collection: emails
+    """
+    # Statuts d'envoi (les reprises et l'abandon relèvent de la tâche
+    # `emails.envoyer` dans la file)
+    STATUT_EN_ATTENTE = 'en_attente'
+    STATUT_EN_COURS = 'en_cours'  # Réservé par un worker pendant l'envoi
+    STATUT_ENVOYE = 'envoye'
+
+    STATUT_CHOICES = [
+        (STATUT_EN_ATTENTE, 'En attente'),
+        (STATUT_EN_COURS, 'En cours'),
+        (STATUT_ENVOYE, 'Envoyé'),
+    ]
+
+    destinataire = EmailField(required=True)
+    fournisseur = StringField(required=True)  # Domaine du destinataire (gmail.com...)
+    sujet = StringField(required=True, max_length=200)
+    texte = StringField(required=True)
+    html = StringField()
+    # Identifie un e-mail à n'envoyer qu'une fois (ex: 'commande:<id>')
+    cle = StringField()
+
+    statut = StringField(choices=STATUT_CHOICES, default=STATUT_EN_ATTENTE)
+    # En cours: fin de la réservation (reprise possible au-delà, worker arrêté)
+    reserve_jusqu_a = DateTimeField()
+    erreur = StringField()  # Dernière erreur d'envoi
+
+    # Dates et mesures
+    date_creation = DateTimeField(default=datetime.utcnow)
+    date_envoi = DateTimeField()
+    latence = FloatField()  # Secondes entre la mise en file et l'envoi
+    duree_smtp = FloatField()  # Secondes passées dans l'échange SMTP
+
+    meta = {
+        'collection': 'emails',
+        'indexes': [
+            ('statut', 'date_creation'),
+            ('fournisseur', 'date_creation'),
+            {'fields': ['cle'], 'unique': True, 'sparse': True},
+        ]
+    }
+
+    def __str__(self):
+        return f"E-mail à {self.destinataire} ({self.statut})"
@@ -0,0 +1,21 @@
+"""
+Tâches de fond des e-mails.
+"""
+from apps.taches.file import tache
+
+from . import confirmations, envoi
+
+
+@tache('emails.envoyer', tentatives_max=envoi.TENTATIVES_MAX)
+def envoyer(email_id, creneau_reserve=False):
+    envoi.envoyer(email_id, creneau_reserve)
+
+
+@tache('emails.confirmation_commande')
+def confirmation_commande(commande_id):
+    confirmations.confirmation_commande(commande_id)
+
+
+@tache('emails.confirmation_location')
+def confirmation_location(location_id):
+    confirmations.confirmation_location(location_id)
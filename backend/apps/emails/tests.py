@@ -0,0 +1,113 @@
+"""
+Tests de l'envoi des e-mails vers un serveur SMTP local (aiosmtpd).
+"""
+import socket
+from datetime import datetime, timedelta
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.handlers import Sink
+from django.test import override_settings
+
+from apps.core.testing import MongoTestCase
+from apps.taches.models import Tache
+from . import envoi
+from .envoi import LimiteurDebit, PoolSMTP
+from .models import Email
+
+
+class Boite(Sink):
+    """Serveur SMTP qui garde les messages reçus."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+def port_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class EnvoiSMTPTests(MongoTestCase):
+
+    def setUp(self):
+        self.boite = Boite()
+        port = port_libre()
+        self.serveur = Controller(self.boite, hostname='127.0.0.1', port=port)
+        self.serveur.start()
+        self.addCleanup(self.serveur.stop)
+
+        reglages = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=port, EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+            TACHES_SYNCHRONES=False,
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+        envoi._pool = PoolSMTP(taille=2, inactivite=60)
+        envoi._limiteur = LimiteurDebit(debit_defaut=2)
+        self.addCleanup(self.reinitialiser)
+
+    def reinitialiser(self):
+        envoi._pool.fermer()
+        envoi._pool = envoi._limiteur = None
+
+    def mettre_en_file(self, destinataire):
+        email = envoi.envoyer_email(destinataire, 'Commande confirmée', 'Merci !')
+        Tache.objects(args=[str(email.id)]).delete()  # Exécutée à la main ici
+        return email
+
+    def test_envois_sur_connexions_reutilisees(self):
+        emails = [self.mettre_en_file(f'client{i}@gmail.com') for i in range(2)]
+        emails += [self.mettre_en_file(f'client{i}@yahoo.fr') for i in range(2)]
+        for email in emails:
+            envoi.envoyer(str(email.id))
+
+        self.assertEqual(len(self.boite.messages), 4)
+        self.assertEqual(Email.objects(statut=Email.STATUT_ENVOYE).count(), 4)
+        statistiques = envoi.pool().statistiques()
+        self.assertEqual(statistiques['envois'], 4)
+        self.assertEqual(statistiques['ouvertures'], 1)
+
+    def test_envoi_unique(self):
+        email = self.mettre_en_file('client@gmail.com')
+        envoi.envoyer(str(email.id))
+        envoi.envoyer(str(email.id))  # Tâche en double
+        self.assertEqual(len(self.boite.messages), 1)
+
+    def test_limite_de_debit(self):
+        emails = [self.mettre_en_file(f'client{i}@gmail.com') for i in range(4)]
+        debut = datetime.utcnow()
+        for email in emails:
+            envoi.envoyer(str(email.id))
+
+        # 2 messages/s: les deux premiers partent, les suivants sont remis
+        # en file une fois chacun, pour leur créneau (0,5 s puis 1 s)
+        self.assertEqual(len(self.boite.messages), 2)
+        reprises = list(Tache.objects(nom='emails.envoyer').order_by('executer_apres'))
+        self.assertEqual([t.args[0] for t in reprises], [str(e.id) for e in emails[2:]])
+        self.assertTrue(all(t.kwargs == {'creneau_reserve': True} for t in reprises))
+        self.assertAlmostEqual(
+            (reprises[0].executer_apres - debut) / timedelta(seconds=1), 0.5, delta=0.2
+        )
+        self.assertAlmostEqual(
+            (reprises[1].executer_apres - debut) / timedelta(seconds=1), 1.0, delta=0.2
+        )
+
+        # À leur créneau, elles partent sans repasser par le limiteur
+        for tache in reprises:
+            envoi.envoyer(*tache.args, **tache.kwargs)
+        self.assertEqual(len(self.boite.messages), 4)
+        self.assertEqual(Tache.objects(nom='emails.envoyer').count(), 2)
+
+    def test_autre_fournisseur_non_limite(self):
+        for i in range(3):
+            envoi.envoyer(str(self.mettre_en_file(f'client{i}@gmail.com').id))
+        envoi.envoyer(str(self.mettre_en_file('client@outlook.com').id))
+        self.assertEqual(len(self.boite.messages), 3)
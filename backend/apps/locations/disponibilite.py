@@ -0,0 +1,200 @@
+"""
+Disponibilité et réservation du matériel en location.
+
+Les périodes sont semi-ouvertes : [date_debut, date_fin), date_fin étant le
+jour du retour. Deux périodes se chevauchent si chacune commence avant la
+fin de l'autre.
+
+- Réservation: le créneau est ajouté au `CalendrierLocation` du produit
+  par un `$push` conditionné à l'absence de chevauchement (`$elemMatch`).
+  MongoDB applique la condition et l'ajout atomiquement : deux demandes
+  simultanées sur la même période ne peuvent pas réussir toutes les deux.
+- Lecture: les créneaux d'un produit ne se chevauchent jamais, on les garde
+  triés en mémoire (`Intervalles`) ; « libre entre X et Y ? » et « prochaine
+  fenêtre libre » se résolvent par recherche dichotomique. Les calendriers
+  des produits consultés sont gardés dans un cache LRU à courte durée de
+  vie, invalidé localement à chaque réservation ou annulation.
+- Les créneaux terminés sont retirés du calendrier à chaque écriture
+  (`$pull`) : sa taille reste celle des locations à venir.
+"""
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from apps.core.cache import TTLCache
+from .models import Location, CalendrierLocation
+
+
+class PeriodeIndisponible(Exception):
+    """La période demandée chevauche une réservation existante."""
+
+
+class Intervalles:
+    """Créneaux occupés d'un produit, disjoints et triés par début."""
+
+    def __init__(self, creneaux):
+        creneaux = sorted(creneaux, key=lambda c: c[0])
+        self.debuts = [debut for debut, _ in creneaux]
+        self.fins = [fin for _, fin in creneaux]
+
+    def _premier_apres(self, instant):
+        # Premier créneau qui se termine après `instant` (les fins sont
+        # triées car les créneaux sont disjoints)
+        return bisect_right(self.fins, instant)
+
+    def est_libre(self, debut, fin):
+        """Vrai si aucun créneau ne chevauche [debut, fin)."""
+        i = self._premier_apres(debut)
+        return i == len(self.debuts) or self.debuts[i] >= fin
+
+    def prochaine_fenetre(self, a_partir_de, duree):
+        """Début de la première fenêtre libre de `duree` après `a_partir_de`."""
+        candidat = a_partir_de
+        for i in range(self._premier_apres(a_partir_de), len(self.debuts)):
+            if self.debuts[i] >= candidat + duree:
+                break
+            candidat = max(candidat, self.fins[i])
+        return candidat
+
+
+_calendriers = TTLCache(ttl=30, maxsize=500)
+
+
+def locations_chevauchantes(produit_id, debut, fin):
+    """Locations actives du produit qui chevauchent [debut, fin) (index composé)."""
+    return Location.objects(
+        produit_id=produit_id,
+        date_debut__lt=fin,
+        date_fin__gt=debut,
+        statut__in=Location.STATUTS_ACTIFS,
+    )
+
+
+def _creer_calendrier(produit_id):
+    """Créer le calendrier du produit à partir des locations existantes."""
+    maintenant = datetime.utcnow()
+    creneaux = [
+        {'debut': l['date_debut'], 'fin': l['date_fin'], 'location_id': str(l['_id'])}
+        for l in locations_chevauchantes(produit_id, maintenant, datetime.max)
+        .only('date_debut', 'date_fin').as_pymongo()
+    ]
+    try:
+        CalendrierLocation._get_collection().update_one(
+            {'produit_id': produit_id},
+            {'$setOnInsert': {'creneaux': creneaux, 'version': 0}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        pass  # Créé en même temps par une autre requête
+
+
+def intervalles(produit_id):
+    """Créneaux occupés du produit (cache mémoire, une requête sinon)."""
+    resultat = _calendriers.get(produit_id)
+    if resultat is None:
+        calendrier = CalendrierLocation._get_collection().find_one(
+            {'produit_id': produit_id}, {'creneaux.debut': 1, 'creneaux.fin': 1}
+        )
+        if calendrier is None:
+            creneaux = [
+                (l['date_debut'], l['date_fin'])
+                for l in locations_chevauchantes(produit_id, datetime.utcnow(), datetime.max)
+                .only('date_debut', 'date_fin').as_pymongo()
+            ]
+        else:
+            creneaux = [(c['debut'], c['fin']) for c in calendrier.get('creneaux', [])]
+        resultat = Intervalles(creneaux)
+        _calendriers.set(produit_id, resultat)
+    return resultat
+
+
+def est_disponible(produit_id, debut, fin):
+    """Le produit est-il libre sur [debut, fin) ?"""
+    return intervalles(produit_id).est_libre(debut, fin)
+
+
+def prochaine_fenetre(produit_id, a_partir_de, nombre_jours):
+    """Début de la prochaine période libre de `nombre_jours` jours."""
+    return intervalles(produit_id).prochaine_fenetre(
+        a_partir_de, timedelta(days=nombre_jours)
+    )
+
+
+def _purger(produit_id):
+    """Retirer les créneaux terminés (un $push et un $pull du même tableau ne peuvent pas être combinés)."""
+    maintenant = datetime.utcnow()
+    CalendrierLocation._get_collection().update_one(
+        {'produit_id': produit_id, 'creneaux.fin': {'$lte': maintenant}},
+        {'$pull': {'creneaux': {'fin': {'$lte': maintenant}}}, '$inc': {'version': 1}}
+    )
+
+
+def _occuper(produit_id, debut, fin, location_id):
+    """$push du créneau s'il ne chevauche aucun créneau existant."""
+    resultat = CalendrierLocation._get_collection().update_one(
+        {
+            'produit_id': produit_id,
+            'creneaux': {'$not': {'$elemMatch': {'debut': {'$lt': fin}, 'fin': {'$gt': debut}}}},
+        },
+        {
+            '$push': {'creneaux': {'debut': debut, 'fin': fin, 'location_id': location_id}},
+            '$inc': {'version': 1},
+        }
+    )
+    return resultat.modified_count == 1
+
+
+def liberer(produit_id, location_id):
+    """Retirer le créneau d'une location (annulation, échec d'enregistrement)."""
+    CalendrierLocation._get_collection().update_one(
+        {'produit_id': produit_id},
+        {'$pull': {'creneaux': {'location_id': location_id}}, '$inc': {'version': 1}}
+    )
+    _purger(produit_id)
+    _calendriers.delete(produit_id)
+
+
+def reserver(location):
+    """
+    Réserver la période de `location` (non encore sauvegardée) puis
+    l'enregistrer. Lève PeriodeIndisponible en cas de chevauchement.
+    """
+    if location.id is None:
+        location.id = ObjectId()
+    location_id = str(location.id)
+    produit_id = location.produit_id
+
+    _purger(produit_id)
+    reserve = _occuper(produit_id, location.date_debut, location.date_fin, location_id)
+    if not reserve and not CalendrierLocation.objects(produit_id=produit_id).count():
+        _creer_calendrier(produit_id)
+        reserve = _occuper(produit_id, location.date_debut, location.date_fin, location_id)
+    _calendriers.delete(produit_id)
+    if not reserve:
+        raise PeriodeIndisponible()
+
+    try:
+        location.save(force_insert=True)
+    except Exception:
+        liberer(produit_id, location_id)
+        raise
+    return location
+
+
+def annuler(location):
+    """
+    Annuler une location réservée qui n'a pas commencé et libérer sa
+    période. Retourne None si elle a changé de statut ou commencé entre-temps.
+    """
+    annulee = Location.objects(
+        id=location.id,
+        statut=Location.STATUT_RESERVEE,
+        date_debut__gt=datetime.utcnow(),
+    ).update_one(set__statut=Location.STATUT_ANNULEE)
+    if not annulee:
+        return None
+    location.statut = Location.STATUT_ANNULEE
+    liberer(location.produit_id, str(location.id))
+    return location
@@ -4,7 +4,7 @@ Collection: rentals
 """
 from mongoengine import (
     Document, StringField, FloatField, IntField, DateTimeField,
-    BooleanField, DictField
+    BooleanField, DictField, EmbeddedDocument, EmbeddedDocumentListField
 )
 from datetime import datetime
 
@@ -27,6 +27,9 @@ class Location(Document):
         (STATUT_ANNULEE, 'Annulée'),
     ]
 
+    # Statuts qui occupent le matériel
+    STATUTS_ACTIFS = (STATUT_RESERVEE, STATUT_EN_COURS)
+
     # Références
     produit_id = StringField(required=True)  # ID du produit loué
     nom_produit = StringField(required=True)
@@ -72,7 +75,9 @@ class Location(Document):
             'statut',
             'date_debut',
             'date_fin',
-            'date_reservation'
+            'date_reservation',
+            # Recherche des locations d'un produit qui chevauchent une période
+            ('produit_id', 'date_debut', 'date_fin'),
         ]
     }
 
@@ -91,3 +96,30 @@ class Location(Document):
             self.statut == self.STATUT_EN_COURS and
             self.date_debut <= now <= self.date_fin
         )
+
+
+class Creneau(EmbeddedDocument):
+    """Période occupée [debut, fin) dans le calendrier d'un produit."""
+    debut = DateTimeField(required=True)
+    fin = DateTimeField(required=True)
+    location_id = StringField(required=True)
+
+
+class CalendrierLocation(Document):
+    """
+    Périodes réservées d'un produit en location (un document par produit).
+    Les réservations y sont ajoutées par un $push conditionnel, qui échoue
+    si la période chevauche un créneau existant: pas de double réservation.
+    Collection: rental_calendars
+    """
+    produit_id = StringField(required=True, unique=True)
+    creneaux = EmbeddedDocumentListField(Creneau, default=list)
+    version = IntField(default=0)
+
+    meta = {
+        'collection': 'rental_calendars',
+        'indexes': ['produit_id']
+    }
+
+    def __str__(self):
+        return f"Calendrier produit {self.produit_id}"
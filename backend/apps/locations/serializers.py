@@ -0,0 +1,55 @@
+"""
+Serializers pour les locations de matériel.
+"""
+from datetime import date
+
+from rest_framework import serializers
+
+
+class LocationSerializer(serializers.Serializer):
+    """Location (lecture)."""
+    id = serializers.SerializerMethodField()
+    produit_id = serializers.CharField()
+    nom_produit = serializers.CharField()
+    client_id = serializers.CharField()
+    vendeur_id = serializers.CharField()
+    date_debut = serializers.DateTimeField()
+    date_fin = serializers.DateTimeField()
+    nombre_jours = serializers.IntegerField()
+    prix_par_jour = serializers.FloatField()
+    prix_total = serializers.FloatField()
+    caution = serializers.FloatField()
+    statut = serializers.CharField()
+    adresse_livraison = serializers.DictField()
+    notes_client = serializers.CharField(allow_null=True)
+    est_payee = serializers.BooleanField()
+    date_reservation = serializers.DateTimeField()
+
+    def get_id(self, obj):
+        """Convertir ObjectId MongoDB en string."""
+        return str(obj.id)
+
+
+class PeriodeSerializer(serializers.Serializer):
+    """Période de location: du jour de début (inclus) au jour de retour (exclu)."""
+    date_debut = serializers.DateField()
+    date_fin = serializers.DateField()
+
+    def validate(self, data):
+        if data['date_fin'] <= data['date_debut']:
+            raise serializers.ValidationError({
+                'date_fin': 'La date de fin doit être postérieure à la date de début.'
+            })
+        return data
+
+
+class ReservationSerializer(PeriodeSerializer):
+    """Demande de location d'un produit."""
+    produit_id = serializers.CharField()
+    adresse_livraison = serializers.DictField(required=False, default=dict)
+    notes_client = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate_date_debut(self, value):
+        if value < date.today():
+            raise serializers.ValidationError('La date de début est passée.')
+        return value
@@ -2,9 +2,12 @@
 URLs pour les locations de matériel.
 """
 from django.urls import path
+from . import views
 
 app_name = 'locations'
 
 urlpatterns = [
-    # À implémenter: créer location, vérifier disponibilité, liste locations, etc.
+    path('', views.locations, name='locations'),
+    path('disponibilite/<str:produit_id>/', views.disponibilite_produit, name='disponibilite_produit'),
+    path('<str:location_id>/annuler/', views.annuler_location, name='annuler_location'),
 ]
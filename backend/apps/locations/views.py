@@ -1,5 +1,163 @@
+"""
+Views pour les locations de matériel.
+"""
+from datetime import datetime, time, timedelta
+
+from bson import ObjectId
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 
-# Views à implémenter
+from apps.produits.models import Produit
+from apps.taches.file import enfiler
+from . import disponibilite
+from .models import Location
+from .serializers import LocationSerializer, PeriodeSerializer, ReservationSerializer
+
+
+def debut_du_jour(jour):
+    """Date (jour) -> datetime à minuit, comme stocké dans les locations."""
+    return datetime.combine(jour, time.min)
+
+
+def produit_louable(produit_id):
+    """Produit actif proposé à la location, ou None."""
+    if not ObjectId.is_valid(produit_id):
+        return None
+    return Produit.objects(
+        id=produit_id, est_actif=True, disponible_location=True
+    ).only('nom', 'vendeur_id', 'prix_location_jour', 'prix').first()
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def disponibilite_produit(request, produit_id):
+    """
+    Disponibilité d'un produit en location sur une période.
+    GET /api/locations/disponibilite/<produit_id>/?date_debut=2025-01-10&date_fin=2025-01-15
+    Si la période est occupée, `prochaine_date_debut` indique le premier
+    jour à partir duquel le produit est libre pour la même durée.
+    """
+    serializer = PeriodeSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    if produit_louable(produit_id) is None:
+        return Response(
+            {'error': 'Produit non disponible à la location'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    debut = debut_du_jour(serializer.validated_data['date_debut'])
+    fin = debut_du_jour(serializer.validated_data['date_fin'])
+    disponible = disponibilite.est_disponible(produit_id, debut, fin)
+
+    reponse = {'produit_id': produit_id, 'disponible': disponible}
+    if not disponible:
+        jours = (fin - debut).days
+        prochain = disponibilite.prochaine_fenetre(produit_id, debut, jours)
+        # Locations réservées en journées entières: partir d'un minuit
+        while prochain.time() != time.min:
+            prochain = disponibilite.prochaine_fenetre(
+                produit_id, debut_du_jour(prochain.date() + timedelta(days=1)), jours
+            )
+        reponse['prochaine_date_debut'] = prochain.date()
+    return Response(reponse)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def locations(request):
+    """
+    Locations de l'utilisateur connecté, ou nouvelle réservation.
+    GET /api/locations/
+    POST /api/locations/  Body: { "produit_id", "date_debut", "date_fin", "adresse_livraison", "notes_client" }
+    """
+    client_id = str(request.user.id)
+
+    if request.method == 'GET':
+        liste = Location.objects(client_id=client_id).order_by('-date_reservation')
+        return Response(LocationSerializer(liste, many=True).data)
+
+    serializer = ReservationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+
+    produit = produit_louable(data['produit_id'])
+    if produit is None:
+        return Response(
+            {'error': 'Produit non disponible à la location'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    debut = debut_du_jour(data['date_debut'])
+    fin = debut_du_jour(data['date_fin'])
+    location = Location(
+        produit_id=data['produit_id'],
+        nom_produit=produit.nom,
+        client_id=client_id,
+        vendeur_id=produit.vendeur_id,
+        date_debut=debut,
+        date_fin=fin,
+        nombre_jours=(fin - debut).days,
+        prix_par_jour=produit.prix_location_jour or 0,
+        adresse_livraison=data['adresse_livraison'],
+        notes_client=data['notes_client'],
+    )
+    location.calculer_prix_total()
+
+    try:
+        disponibilite.reserver(location)
+    except disponibilite.PeriodeIndisponible:
+        return Response(
+            {'error': 'Le produit est déjà réservé sur cette période'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    enfiler('emails.confirmation_location', str(location.id))
+    return Response({
+        'message': 'Location réservée avec succès',
+        'location': LocationSerializer(location).data
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def annuler_location(request, location_id):
+    """
+    Annuler une location réservée (non commencée).
+    POST /api/locations/<location_id>/annuler/
+    """
+    location = None
+    if ObjectId.is_valid(location_id):
+        location = Location.objects(id=location_id, client_id=str(request.user.id)).first()
+
+    if location is None:
+        return Response(
+            {'error': 'Location non trouvée'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    if location.statut != Location.STATUT_RESERVEE:
+        return Response(
+            {'error': 'Seule une location réservée peut être annulée'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if location.date_debut <= datetime.utcnow():
+        return Response(
+            {'error': 'Une location déjà commencée ne peut pas être annulée'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if disponibilite.annuler(location) is None:
+        return Response(
+            {'error': 'La location a changé entre-temps, veuillez réessayer'},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response({
+        'message': 'Location annulée',
+        'location': LocationSerializer(location).data
+    })
@@ -0,0 +1,34 @@
+"""
+Traitement des notifications du processeur de paiement mises en file.
+
+Usage: python manage.py traiter_evenements_paiement [--boucle] [--intervalle 5]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.paiements.services import traiter_evenements
+
+
+class Command(BaseCommand):
+    help = "Traite les événements de paiement (webhooks) en attente."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--boucle', action='store_true',
+            help="Continuer à traiter les nouveaux événements jusqu'à interruption."
+        )
+        parser.add_argument(
+            '--intervalle', type=float, default=5,
+            help="Attente (secondes) quand la file est vide, avec --boucle."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            traites = traiter_evenements()
+            if traites:
+                self.stdout.write(f"{traites} événement(s) traité(s).")
+            if not options['boucle']:
+                break
+            if not traites:
+                time.sleep(options['intervalle'])
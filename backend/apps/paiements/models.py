@@ -4,7 +4,7 @@ Collection: payments
 """
 from mongoengine import (
     Document, StringField, FloatField, DateTimeField,
-    BooleanField, DictField
+    BooleanField, DictField, IntField
 )
 from datetime import datetime
 
@@ -31,15 +31,19 @@ class Paiement(Document):
 
     # Statuts de paiement
     STATUT_EN_ATTENTE = 'en_attente'
+    STATUT_EN_COURS = 'en_cours'
     STATUT_REUSSI = 'reussi'
     STATUT_ECHOUE = 'echoue'
+    STATUT_REMBOURSEMENT_EN_COURS = 'remboursement_en_cours'
     STATUT_REMBOURSE = 'rembourse'
     STATUT_ANNULE = 'annule'
 
     STATUT_CHOICES = [
         (STATUT_EN_ATTENTE, 'En attente'),
+        (STATUT_EN_COURS, 'En cours de traitement'),
         (STATUT_REUSSI, 'Réussi'),
         (STATUT_ECHOUE, 'Échoué'),
+        (STATUT_REMBOURSEMENT_EN_COURS, 'Remboursement en cours'),
         (STATUT_REMBOURSE, 'Remboursé'),
         (STATUT_ANNULE, 'Annulé'),
     ]
@@ -75,6 +79,11 @@ class Paiement(Document):
     description = StringField()
     message_erreur = StringField()  # Message si échec
 
+    # Clés d'idempotence (préfixées par client_id): une requête rejouée
+    # retrouve le paiement déjà créé / la confirmation déjà demandée
+    cle_idempotence = StringField()
+    cle_confirmation = StringField()
+
     meta = {
         'collection': 'payments',
         'indexes': [
@@ -84,7 +93,8 @@ class Paiement(Document):
             'transaction_id',
             'statut',
             'date_paiement',
-            'methode_paiement'
+            'methode_paiement',
+            {'fields': ['cle_idempotence'], 'unique': True, 'sparse': True},
         ]
     }
 
@@ -115,3 +125,46 @@ class Paiement(Document):
     def est_reussi(self):
         """Vérifier si le paiement est réussi."""
         return self.statut == self.STATUT_REUSSI
+
+
+class EvenementPaiement(Document):
+    """
+    Notification (webhook) du processeur de paiement, en file d'attente.
+    Enregistrée telle quelle à la réception, traitée ensuite par la tâche
+    `paiements.traiter_evenement` (ou `traiter_evenements_paiement`). L'identifiant de l'événement est unique:
+    une notification répétée n'est enregistrée qu'une fois.
+    Collection: payment_events
+    """
+    STATUT_A_TRAITER = 'a_traiter'
+    STATUT_EN_TRAITEMENT = 'en_traitement'
+    STATUT_TRAITE = 'traite'
+    STATUT_ECHOUE = 'echoue'
+
+    STATUT_CHOICES = [
+        (STATUT_A_TRAITER, 'À traiter'),
+        (STATUT_EN_TRAITEMENT, 'En traitement'),
+        (STATUT_TRAITE, 'Traité'),
+        (STATUT_ECHOUE, 'Échoué'),
+    ]
+
+    evenement_id = StringField(required=True, unique=True)  # ID chez le processeur
+    type_evenement = StringField(required=True)
+    donnees = DictField()
+    statut = StringField(choices=STATUT_CHOICES, default=STATUT_A_TRAITER)
+    tentatives = IntField(default=0)
+    erreur = StringField()
+
+    date_reception = DateTimeField(default=datetime.utcnow)
+    prochaine_tentative = DateTimeField(default=datetime.utcnow)
+    date_traitement = DateTimeField()
+
+    meta = {
+        'collection': 'payment_events',
+        'indexes': [
+            'evenement_id',
+            ('statut', 'prochaine_tentative'),
+        ]
+    }
+
+    def __str__(self):
+        return f"Événement {self.type_evenement} {self.evenement_id}"
@@ -0,0 +1,109 @@
+"""
+Processeurs de paiement.
+
+Le processeur utilisé est choisi par `PAIEMENT_PROCESSEUR` (chemin
+d'import). Chaque appel porte une clé d'idempotence : un appel répété avec
+la même clé renvoie le résultat du premier sans débiter ni rembourser une
+seconde fois, comme le font les API des processeurs réels.
+
+`ProcesseurFactice` simule un processeur en mémoire pour le développement
+et les tests, y compris l'envoi de notifications signées.
+"""
+import hashlib
+import hmac
+import json
+import threading
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+RESULTAT_REUSSI = 'reussi'
+RESULTAT_ECHOUE = 'echoue'
+
+
+def signer(corps, secret):
+    """Signature HMAC-SHA256 (hexadécimale) du corps d'une notification."""
+    return hmac.new(secret.encode('utf-8'), corps, hashlib.sha256).hexdigest()
+
+
+def signature_valide(corps, signature, secret):
+    """Comparer la signature reçue (« sha256=<hex> ») à celle attendue."""
+    if not secret or not signature:
+        return False
+    attendue = 'sha256=' + signer(corps, secret)
+    return hmac.compare_digest(attendue, signature)
+
+
+class Processeur:
+    """Interface d'un processeur de paiement."""
+
+    def creer(self, paiement, cle):
+        """Ouvrir une transaction; retourne son identifiant."""
+        raise NotImplementedError
+
+    def debiter(self, paiement, cle):
+        """Débiter le client: {'statut', 'transaction_id', 'message'}."""
+        raise NotImplementedError
+
+    def rembourser(self, paiement, cle):
+        """Rembourser la transaction: {'statut', 'message'}."""
+        raise NotImplementedError
+
+
+class ProcesseurFactice(Processeur):
+    """
+    Processeur en mémoire. Les montants au-delà de `plafond` sont refusés.
+    `debits` et `remboursements` comptent les opérations réellement
+    effectuées (hors rejeux idempotents).
+    """
+    plafond = 10000
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._operations = {}
+        self.debits = 0
+        self.remboursements = 0
+
+    def _idempotent(self, cle, operation):
+        with self._verrou:
+            if cle not in self._operations:
+                self._operations[cle] = operation()
+            return dict(self._operations[cle])
+
+    def creer(self, paiement, cle):
+        return self._idempotent(cle, lambda: {'transaction_id': f'fx_{uuid.uuid4().hex}'})['transaction_id']
+
+    def debiter(self, paiement, cle):
+        def debit():
+            if paiement.montant > self.plafond:
+                return {'statut': RESULTAT_ECHOUE, 'message': 'Plafond dépassé'}
+            self.debits += 1
+            return {'statut': RESULTAT_REUSSI, 'transaction_id': paiement.transaction_id}
+        return self._idempotent(cle, debit)
+
+    def rembourser(self, paiement, cle):
+        def remboursement():
+            self.remboursements += 1
+            return {'statut': RESULTAT_REUSSI}
+        return self._idempotent(cle, remboursement)
+
+    def notification(self, type_evenement, paiement, evenement_id=None):
+        """Corps et en-tête de signature d'un webhook, comme envoyés par le processeur."""
+        corps = json.dumps({
+            'id': evenement_id or f'evt_{uuid.uuid4().hex}',
+            'type': type_evenement,
+            'donnees': {'transaction_id': paiement.transaction_id},
+        }).encode('utf-8')
+        return corps, 'sha256=' + signer(corps, settings.PAIEMENT_WEBHOOK_SECRET)
+
+
+_processeur = None
+
+
+def processeur():
+    """Instance partagée du processeur configuré."""
+    global _processeur
+    if _processeur is None:
+        _processeur = import_string(settings.PAIEMENT_PROCESSEUR)()
+    return _processeur
@@ -0,0 +1,42 @@
+"""
+Serializers pour les paiements.
+"""
+from rest_framework import serializers
+
+from .models import Paiement
+
+
+class PaiementSerializer(serializers.Serializer):
+    """Paiement (lecture)."""
+    id = serializers.SerializerMethodField()
+    client_id = serializers.CharField()
+    commande_id = serializers.CharField(allow_null=True)
+    location_id = serializers.CharField(allow_null=True)
+    montant = serializers.FloatField()
+    devise = serializers.CharField()
+    methode_paiement = serializers.CharField()
+    statut = serializers.CharField()
+    transaction_id = serializers.CharField(allow_null=True)
+    description = serializers.CharField(allow_null=True)
+    message_erreur = serializers.CharField(allow_null=True)
+    date_paiement = serializers.DateTimeField()
+    date_validation = serializers.DateTimeField(allow_null=True)
+    date_remboursement = serializers.DateTimeField(allow_null=True)
+
+    def get_id(self, obj):
+        """Convertir ObjectId MongoDB en string."""
+        return str(obj.id)
+
+
+class CreationPaiementSerializer(serializers.Serializer):
+    """Demande de paiement d'une commande ou d'une location."""
+    commande_id = serializers.CharField(required=False)
+    location_id = serializers.CharField(required=False)
+    methode_paiement = serializers.ChoiceField(choices=Paiement.METHODE_CHOICES)
+
+    def validate(self, data):
+        if bool(data.get('commande_id')) == bool(data.get('location_id')):
+            raise serializers.ValidationError(
+                'Indiquer soit commande_id, soit location_id.'
+            )
+        return data
@@ -0,0 +1,472 @@
+"""
+Cycle de vie des paiements.
+
+Chaque changement de statut est une mise à jour conditionnelle
+(`find_one_and_update` sur le statut attendu) : deux requêtes concurrentes
+ou un webhook rejoué ne peuvent pas appliquer deux fois la même
+transition.
+
+    en_attente -> en_cours -> reussi -> remboursement_en_cours -> rembourse
+                          \\-> echoue
+
+Une commande ou location n'est débitée qu'une fois : avant l'appel au
+processeur, le paiement se réserve la cible (`paiement_id`) par une mise
+à jour conditionnelle ; un second paiement de la même cible échoue sans
+débit. Un remboursement libère la cible (`est_payee` faux) et l'annule
+si elle n'a pas encore été expédiée ou commencée.
+
+Le débit et le remboursement passent par un état intermédiaire et
+appellent le processeur avec une clé d'idempotence dérivée de l'id du
+paiement : après une erreur ou un crash entre l'appel et l'enregistrement
+du résultat, une nouvelle tentative rejoue l'appel sans double débit ni
+double remboursement.
+
+Les webhooks sont enregistrés dans `payment_events` puis traités à part,
+un par tâche `paiements.traiter_evenement` : un événement en échec (par
+exemple reçu avant que le paiement ne porte son `transaction_id`) lève
+l'erreur, et la file le reprend avec un délai croissant puis l'abandonne.
+`traiter_evenements` traite en lot ce qui reste à traiter (commande
+`traiter_evenements_paiement`).
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from mongoengine import NotUniqueError, ValidationError
+from pymongo import ReturnDocument
+
+from apps.commandes.models import Commande
+from apps.commandes.services import liberer_stock
+from apps.locations import disponibilite
+from apps.locations.models import Location
+from apps.produits.models import Produit
+from .models import Paiement, EvenementPaiement
+from .processeurs import processeur, RESULTAT_REUSSI
+
+logger = logging.getLogger(__name__)
+
+# Traitement des webhooks: durée pendant laquelle un événement réservé
+# est invisible aux autres workers, et nombre maximal de tentatives
+VISIBILITE_EVENEMENT = timedelta(minutes=5)
+TENTATIVES_MAX = 8
+
+
+class ErreurPaiement(Exception):
+    """Opération de paiement impossible."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def transition(paiement_id, depuis, vers, **champs):
+    """
+    Passer le paiement au statut `vers` s'il est dans l'un des statuts
+    `depuis`. Retourne le Paiement mis à jour, ou None si le statut
+    courant ne le permet pas.
+    """
+    doc = Paiement._get_collection().find_one_and_update(
+        {'_id': ObjectId(str(paiement_id)), 'statut': {'$in': list(depuis)}},
+        {'$set': {'statut': vers, **champs}},
+        return_document=ReturnDocument.AFTER
+    )
+    return Paiement._from_son(doc) if doc else None
+
+
+def recharger(paiement_id):
+    return Paiement.objects(id=paiement_id).first()
+
+
+# ---------------------------------------------------------------------------
+# Création
+# ---------------------------------------------------------------------------
+
+def _cible(client_id, commande_id=None, location_id=None):
+    """Montant et description de la commande ou location à payer."""
+    if commande_id:
+        commande = Commande.objects(id=commande_id, client_id=client_id).first() \
+            if ObjectId.is_valid(commande_id) else None
+        if commande is None:
+            raise ErreurPaiement('Commande non trouvée', 404)
+        if commande.statut == Commande.STATUT_ANNULEE:
+            raise ErreurPaiement('Commande annulée', 409)
+        if commande.est_payee:
+            raise ErreurPaiement('Commande déjà payée', 409)
+        return commande.montant_final, f'Commande {commande.numero_commande}'
+    if location_id:
+        location = Location.objects(id=location_id, client_id=client_id).first() \
+            if ObjectId.is_valid(location_id) else None
+        if location is None:
+            raise ErreurPaiement('Location non trouvée', 404)
+        if location.statut == Location.STATUT_ANNULEE:
+            raise ErreurPaiement('Location annulée', 409)
+        if location.est_payee:
+            raise ErreurPaiement('Location déjà payée', 409)
+        return location.prix_total + location.caution, f'Location {location.nom_produit}'
+    raise ErreurPaiement('commande_id ou location_id requis')
+
+
+def creer_paiement(client_id, methode_paiement, commande_id=None,
+                   location_id=None, cle_idempotence=None):
+    """
+    Créer un paiement en attente pour une commande ou une location. Avec
+    une clé d'idempotence, une requête rejouée retourne le même paiement.
+    """
+    cle = f'{client_id}:{cle_idempotence}' if cle_idempotence else None
+    if cle:
+        existant = Paiement.objects(cle_idempotence=cle).first()
+        if existant:
+            return _meme_demande(existant, commande_id, location_id)
+
+    montant, description = _cible(client_id, commande_id, location_id)
+    paiement = Paiement(
+        id=ObjectId(),
+        client_id=client_id,
+        commande_id=commande_id,
+        location_id=location_id,
+        montant=montant,
+        methode_paiement=methode_paiement,
+        description=description,
+        cle_idempotence=cle,
+    )
+    # Enregistré (avec sa clé) avant l'appel au processeur: une requête
+    # rejouée le retrouve, même si l'appel échoue
+    try:
+        paiement.save(force_insert=True)
+    except NotUniqueError:
+        # Même clé envoyée deux fois en parallèle: l'autre requête a gagné
+        return _meme_demande(Paiement.objects.get(cle_idempotence=cle), commande_id, location_id)
+    return _ouvrir_transaction(paiement)
+
+
+def _ouvrir_transaction(paiement):
+    """Ouvrir la transaction chez le processeur (clé idempotente) si ce n'est déjà fait."""
+    if paiement.transaction_id is None:
+        paiement.transaction_id = processeur().creer(paiement, f'creer-{paiement.id}')
+        Paiement.objects(id=paiement.id).update_one(set__transaction_id=paiement.transaction_id)
+    return paiement
+
+
+def _meme_demande(paiement, commande_id, location_id):
+    if paiement.commande_id != commande_id or paiement.location_id != location_id:
+        raise ErreurPaiement("Clé d'idempotence déjà utilisée pour une autre demande", 422)
+    return _ouvrir_transaction(paiement)
+
+
+# ---------------------------------------------------------------------------
+# Débit et remboursement
+# ---------------------------------------------------------------------------
+
+# Statuts dans lesquels une cible remboursée est encore annulable
+COMMANDE_ANNULABLE = (
+    Commande.STATUT_EN_ATTENTE, Commande.STATUT_CONFIRMEE, Commande.STATUT_EN_PREPARATION
+)
+
+
+def _cible_du_paiement(paiement):
+    """QuerySet de la commande ou de la location du paiement."""
+    if paiement.commande_id:
+        return Commande.objects(id=paiement.commande_id)
+    return Location.objects(id=paiement.location_id)
+
+
+def _reserver_cible(paiement):
+    """
+    Réserver la cible pour ce paiement avant le débit: vrai si elle n'est
+    ni payée, ni annulée, ni réservée par un autre paiement.
+    """
+    statut_annule = Commande.STATUT_ANNULEE if paiement.commande_id else Location.STATUT_ANNULEE
+    return bool(_cible_du_paiement(paiement).filter(
+        est_payee=False,
+        statut__ne=statut_annule,
+        paiement_id__in=[None, str(paiement.id)],
+    ).update_one(set__paiement_id=str(paiement.id)))
+
+
+def _liberer_cible(paiement):
+    """Rendre la cible payable par un autre paiement (débit refusé)."""
+    _cible_du_paiement(paiement).filter(
+        paiement_id=str(paiement.id), est_payee=False
+    ).update_one(unset__paiement_id=True)
+
+
+def _marquer_cible_payee(paiement):
+    """Reporter le paiement réussi sur la commande ou la location."""
+    _cible_du_paiement(paiement).filter(
+        paiement_id__in=[None, str(paiement.id)]
+    ).update_one(set__est_payee=True, set__paiement_id=str(paiement.id))
+    if paiement.commande_id:
+        Commande.objects(id=paiement.commande_id, statut=Commande.STATUT_EN_ATTENTE).update_one(
+            set__statut=Commande.STATUT_CONFIRMEE
+        )
+
+
+def _annuler_cible(paiement):
+    """
+    Après remboursement: la cible n'est plus payée, et elle est annulée si
+    elle n'a pas encore été expédiée (commande) ou commencée (location).
+    Sinon elle reste en l'état, non payée, à traiter par le vendeur.
+    """
+    liberee = _cible_du_paiement(paiement).filter(
+        paiement_id=str(paiement.id)
+    ).update_one(set__est_payee=False, unset__paiement_id=True)
+    if not liberee:
+        return
+    if paiement.commande_id:
+        commande = Commande.objects(id=paiement.commande_id).only('articles').first()
+        if Commande.objects(id=paiement.commande_id, statut__in=COMMANDE_ANNULABLE).update_one(
+                set__statut=Commande.STATUT_ANNULEE):
+            liberer_stock([(a.produit_id, a.quantite) for a in commande.articles])
+    else:
+        location = Location.objects(id=paiement.location_id).first()
+        if Location.objects(id=paiement.location_id, statut=Location.STATUT_RESERVEE).update_one(
+                set__statut=Location.STATUT_ANNULEE):
+            disponibilite.liberer(location.produit_id, str(location.id))
+
+
+def appliquer_resultat_debit(paiement, resultat):
+    """Enregistrer le résultat du débit (appel direct ou webhook)."""
+    depuis = (Paiement.STATUT_EN_ATTENTE, Paiement.STATUT_EN_COURS)
+    if resultat['statut'] == RESULTAT_REUSSI:
+        mis_a_jour = transition(
+            paiement.id, depuis, Paiement.STATUT_REUSSI,
+            date_validation=datetime.utcnow()
+        )
+        if mis_a_jour:
+            _marquer_cible_payee(mis_a_jour)
+    else:
+        mis_a_jour = transition(
+            paiement.id, depuis, Paiement.STATUT_ECHOUE,
+            message_erreur=resultat.get('message', '')
+        )
+        if mis_a_jour:
+            _liberer_cible(mis_a_jour)
+    return mis_a_jour or recharger(paiement.id)
+
+
+def confirmer_paiement(paiement, cle_idempotence=None):
+    """
+    Débiter le client. Rejouer la même confirmation (même clé, ou paiement
+    resté « en cours » après une erreur) ne débite pas une seconde fois.
+    """
+    cle = f'{paiement.client_id}:{cle_idempotence}' if cle_idempotence else None
+    if paiement.statut == Paiement.STATUT_EN_ATTENTE:
+        champs = {'cle_confirmation': cle} if cle else {}
+        en_cours = transition(
+            paiement.id, [Paiement.STATUT_EN_ATTENTE], Paiement.STATUT_EN_COURS, **champs
+        )
+        paiement = en_cours or recharger(paiement.id)
+    elif cle and paiement.cle_confirmation and paiement.cle_confirmation != cle:
+        raise ErreurPaiement('Paiement déjà confirmé', 409)
+
+    if paiement.statut != Paiement.STATUT_EN_COURS:
+        # Déjà traité (par cette requête rejouée ou par un webhook)
+        return paiement
+
+    if not _reserver_cible(paiement):
+        transition(
+            paiement.id, [Paiement.STATUT_EN_COURS], Paiement.STATUT_ECHOUE,
+            message_erreur='Déjà payée ou annulée'
+        )
+        raise ErreurPaiement('Commande ou location déjà payée ou annulée', 409)
+
+    resultat = processeur().debiter(paiement, f'debit-{paiement.id}')
+    return appliquer_resultat_debit(paiement, resultat)
+
+
+def appliquer_remboursement(paiement):
+    """Enregistrer le remboursement effectué (appel direct ou webhook)."""
+    mis_a_jour = transition(
+        paiement.id,
+        (Paiement.STATUT_REUSSI, Paiement.STATUT_REMBOURSEMENT_EN_COURS),
+        Paiement.STATUT_REMBOURSE,
+        date_remboursement=datetime.utcnow()
+    )
+    if mis_a_jour:
+        _annuler_cible(mis_a_jour)
+    return mis_a_jour or recharger(paiement.id)
+
+
+def peut_rembourser(user, paiement):
+    """
+    Seul le vendeur de la cible rembourse: le vendeur de la location, ou
+    d'une commande dont il vend tous les produits.
+    """
+    if not user.est_vendeur():
+        return False
+    vendeur_id = str(user.id)
+    if paiement.location_id:
+        return Location.objects(id=paiement.location_id, vendeur_id=vendeur_id).count() > 0
+    commande = Commande.objects(id=paiement.commande_id).only('articles').first()
+    if commande is None:
+        return False
+    produit_ids = [a.produit_id for a in commande.articles if ObjectId.is_valid(a.produit_id)]
+    vendeurs = Produit.objects(id__in=produit_ids).distinct('vendeur_id')
+    return vendeurs == [vendeur_id]
+
+
+def rembourser_paiement(paiement):
+    """Rembourser un paiement réussi (une seule fois)."""
+    if paiement.statut == Paiement.STATUT_REUSSI:
+        paiement = transition(
+            paiement.id, [Paiement.STATUT_REUSSI], Paiement.STATUT_REMBOURSEMENT_EN_COURS
+        ) or recharger(paiement.id)
+
+    if paiement.statut == Paiement.STATUT_REMBOURSE:
+        return paiement
+    if paiement.statut != Paiement.STATUT_REMBOURSEMENT_EN_COURS:
+        raise ErreurPaiement('Seul un paiement réussi peut être remboursé', 409)
+
+    resultat = processeur().rembourser(paiement, f'remboursement-{paiement.id}')
+    if resultat['statut'] != RESULTAT_REUSSI:
+        raise ErreurPaiement(resultat.get('message') or 'Remboursement refusé', 502)
+    return appliquer_remboursement(paiement)
+
+
+# ---------------------------------------------------------------------------
+# Webhooks
+# ---------------------------------------------------------------------------
+
+def enregistrer_evenement(corps):
+    """
+    Enregistrer une notification (corps JSON déjà authentifié). Retourne
+    l'identifiant de l'événement, ou None s'il avait déjà été reçu. Lève
+    ValueError si le corps n'a pas la forme
+    {"id": str|int, "type": str, "donnees": {...}}.
+    """
+    donnees = json.loads(corps)
+    if not isinstance(donnees, dict):
+        raise ValueError('Le corps doit être un objet JSON')
+    if (not isinstance(donnees.get('id'), (str, int)) or isinstance(donnees['id'], bool)
+            or not isinstance(donnees.get('type'), str)
+            or not isinstance(donnees.get('donnees', {}), dict)):
+        raise ValueError('Champs id, type ou donnees invalides')
+    evenement_id = str(donnees['id'])
+    try:
+        EvenementPaiement(
+            evenement_id=evenement_id,
+            type_evenement=donnees['type'],
+            donnees=donnees.get('donnees', {}),
+        ).save(force_insert=True)
+    except NotUniqueError:
+        return None
+    except ValidationError as e:
+        raise ValueError(str(e))
+    return evenement_id
+
+
+def _appliquer_evenement(evenement):
+    transaction_id = evenement['donnees'].get('transaction_id')
+    paiement = Paiement.objects(transaction_id=transaction_id).first() if transaction_id else None
+    if paiement is None:
+        raise ValueError(f'Paiement inconnu pour la transaction {transaction_id}')
+
+    type_evenement = evenement['type_evenement']
+    if type_evenement == 'paiement.reussi':
+        appliquer_resultat_debit(paiement, {'statut': RESULTAT_REUSSI})
+    elif type_evenement == 'paiement.echoue':
+        appliquer_resultat_debit(paiement, {
+            'statut': 'echoue', 'message': evenement['donnees'].get('message', '')
+        })
+    elif type_evenement == 'remboursement.reussi':
+        appliquer_remboursement(paiement)
+    else:
+        logger.info("Événement de paiement ignoré: %s", type_evenement)
+
+
+def traiter_evenement(evenement_id):
+    """
+    Traiter un événement (tâche `paiements.traiter_evenement`). En cas
+    d'échec l'événement reste à traiter et l'erreur est levée : la file
+    reprogramme la tâche.
+    """
+    collection = EvenementPaiement._get_collection()
+    maintenant = datetime.utcnow()
+    evenement = collection.find_one_and_update(
+        {'evenement_id': evenement_id, '$or': [
+            {'statut': EvenementPaiement.STATUT_A_TRAITER},
+            # Réservé par un worker arrêté
+            {'statut': EvenementPaiement.STATUT_EN_TRAITEMENT,
+             'prochaine_tentative': {'$lte': maintenant}},
+        ]},
+        {
+            '$set': {
+                'statut': EvenementPaiement.STATUT_EN_TRAITEMENT,
+                'prochaine_tentative': maintenant + VISIBILITE_EVENEMENT,
+            },
+            '$inc': {'tentatives': 1},
+        },
+        return_document=ReturnDocument.AFTER
+    )
+    if evenement is None:
+        return  # Déjà traité, ou en cours de traitement ailleurs
+    try:
+        _appliquer_evenement(evenement)
+    except Exception as e:
+        collection.update_one({'_id': evenement['_id']}, {'$set': {
+            'statut': EvenementPaiement.STATUT_A_TRAITER,
+            'erreur': str(e),
+            'prochaine_tentative': datetime.utcnow(),
+        }})
+        raise
+    collection.update_one({'_id': evenement['_id']}, {'$set': {
+        'statut': EvenementPaiement.STATUT_TRAITE,
+        'date_traitement': datetime.utcnow(),
+    }})
+
+
+def reserver_evenement():
+    """
+    Réserver atomiquement le prochain événement à traiter. Un événement
+    réservé par un worker arrêté redevient visible après
+    VISIBILITE_EVENEMENT.
+    """
+    maintenant = datetime.utcnow()
+    return EvenementPaiement._get_collection().find_one_and_update(
+        {
+            'statut': {'$in': [EvenementPaiement.STATUT_A_TRAITER,
+                               EvenementPaiement.STATUT_EN_TRAITEMENT]},
+            'prochaine_tentative': {'$lte': maintenant},
+        },
+        {
+            '$set': {
+                'statut': EvenementPaiement.STATUT_EN_TRAITEMENT,
+                'prochaine_tentative': maintenant + VISIBILITE_EVENEMENT,
+            },
+            '$inc': {'tentatives': 1},
+        },
+        sort=[('prochaine_tentative', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def traiter_evenements(limite=100):
+    """Traiter les événements en attente; retourne le nombre traité."""
+    collection = EvenementPaiement._get_collection()
+    traites = 0
+    while traites < limite:
+        evenement = reserver_evenement()
+        if evenement is None:
+            break
+        traites += 1
+        try:
+            _appliquer_evenement(evenement)
+        except Exception as e:
+            logger.exception("Échec du traitement de l'événement %s", evenement['evenement_id'])
+            tentatives = evenement['tentatives']
+            abandon = tentatives >= TENTATIVES_MAX
+            collection.update_one({'_id': evenement['_id']}, {'$set': {
+                'statut': (EvenementPaiement.STATUT_ECHOUE if abandon
+                           else EvenementPaiement.STATUT_A_TRAITER),
+                'erreur': str(e),
+                # Reprises espacées: 2, 4, 8... minutes
+                'prochaine_tentative': datetime.utcnow() + timedelta(minutes=2 ** tentatives),
+            }})
+        else:
+            collection.update_one({'_id': evenement['_id']}, {'$set': {
+                'statut': EvenementPaiement.STATUT_TRAITE,
+                'date_traitement': datetime.utcnow(),
+            }})
+    return traites
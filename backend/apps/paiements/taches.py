@@ -0,0 +1,12 @@
+"""
+Tâches de fond des paiements.
+"""
+from apps.taches.file import tache
+
+from .services import TENTATIVES_MAX, traiter_evenement
+
+
+@tache('paiements.traiter_evenement', tentatives_max=TENTATIVES_MAX)
+def traiter_evenement_en_file(evenement_id):
+    """Traiter un webhook reçu; un échec est repris par la file."""
+    traiter_evenement(evenement_id)
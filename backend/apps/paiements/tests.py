@@ -0,0 +1,101 @@
+"""
+Tests des paiements contre le processeur factice (sans réseau).
+"""
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from apps.authentication.models import User
+from apps.commandes.models import Commande, ArticleCommande
+from apps.core.testing import MongoTestCase
+from . import processeurs, services, views
+from .models import Paiement, EvenementPaiement
+from .processeurs import ProcesseurFactice
+
+SECRET = 'secret-de-test'
+
+
+@override_settings(
+    PAIEMENT_PROCESSEUR='apps.paiements.processeurs.ProcesseurFactice',
+    PAIEMENT_WEBHOOK_SECRET=SECRET,
+    TACHES_SYNCHRONES=True,
+)
+class PaiementsTests(MongoTestCase):
+
+    def setUp(self):
+        processeurs._processeur = ProcesseurFactice()
+        self.client_id = str(User(email='client@para-plus.tn', nom='N', prenom='P').save().id)
+        self.commande = Commande(
+            client_id=self.client_id,
+            numero_commande='CMD-20260101-000001',
+            articles=[ArticleCommande(
+                produit_id='p1', nom_produit='Crème', quantite=1, prix_unitaire=20, prix_total=20
+            )],
+            montant_total=20,
+            montant_final=20,
+            adresse_livraison={'rue': 'r', 'ville': 'Tunis'},
+        ).save()
+        self.factory = APIRequestFactory()
+
+    def tearDown(self):
+        processeurs._processeur = None
+        super().tearDown()
+
+    def webhook(self, corps, signature):
+        requete = self.factory.post(
+            '/api/paiements/webhook/', corps,
+            content_type='application/json', HTTP_X_SIGNATURE=signature
+        )
+        return views.webhook(requete)
+
+    def test_creation_idempotente(self):
+        commande_id = str(self.commande.id)
+        premier = services.creer_paiement(self.client_id, 'carte', commande_id, cle_idempotence='k1')
+        rejeu = services.creer_paiement(self.client_id, 'carte', commande_id, cle_idempotence='k1')
+
+        self.assertEqual(rejeu.id, premier.id)
+        self.assertEqual(rejeu.transaction_id, premier.transaction_id)
+        self.assertEqual(Paiement.objects.count(), 1)
+
+        with self.assertRaises(services.ErreurPaiement) as erreur:
+            services.creer_paiement(self.client_id, 'carte', location_id=commande_id,
+                                    cle_idempotence='k1')
+        self.assertEqual(erreur.exception.status_code, 422)
+
+    def test_confirmation_rejouee_un_seul_debit(self):
+        paiement = services.creer_paiement(self.client_id, 'carte', str(self.commande.id))
+        services.confirmer_paiement(paiement, 'c1')
+        paiement = services.confirmer_paiement(services.recharger(paiement.id), 'c1')
+
+        self.assertEqual(paiement.statut, Paiement.STATUT_REUSSI)
+        self.assertEqual(processeurs.processeur().debits, 1)
+        self.assertTrue(Commande.objects.get(id=self.commande.id).est_payee)
+
+    def test_webhook_rejoue(self):
+        paiement = services.creer_paiement(self.client_id, 'carte', str(self.commande.id))
+        corps, signature = processeurs.processeur().notification(
+            'paiement.reussi', paiement, 'evt_1'
+        )
+
+        premiere = self.webhook(corps, signature)
+        rejeu = self.webhook(corps, signature)
+
+        self.assertEqual(premiere.data, {'recu': True, 'doublon': False})
+        self.assertEqual(rejeu.data, {'recu': True, 'doublon': True})
+        self.assertEqual(EvenementPaiement.objects.count(), 1)
+        self.assertEqual(EvenementPaiement.objects.get().statut, EvenementPaiement.STATUT_TRAITE)
+        self.assertEqual(services.recharger(paiement.id).statut, Paiement.STATUT_REUSSI)
+
+    def test_webhook_signature_invalide(self):
+        paiement = services.creer_paiement(self.client_id, 'carte', str(self.commande.id))
+        corps, _ = processeurs.processeur().notification('paiement.reussi', paiement, 'evt_2')
+
+        for signature in ('sha256=' + '0' * 64, None):
+            reponse = self.webhook(corps, signature)
+            self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(EvenementPaiement.objects.count(), 0)
+        self.assertEqual(services.recharger(paiement.id).statut, Paiement.STATUT_EN_ATTENTE)
+
+    def test_webhook_mal_forme(self):
+        corps = b'[1, 2]'
+        reponse = self.webhook(corps, 'sha256=' + processeurs.signer(corps, SECRET))
+        self.assertEqual(reponse.status_code, 400)
@@ -2,9 +2,14 @@
 URLs pour les paiements.
 """
 from django.urls import path
+from . import views
 
 app_name = 'paiements'
 
 urlpatterns = [
-    # À implémenter: créer paiement, vérifier statut, webhooks, etc.
+    path('', views.creer_paiement, name='creer_paiement'),
+    path('webhook/', views.webhook, name='webhook'),
+    path('<str:paiement_id>/', views.detail_paiement, name='detail_paiement'),
+    path('<str:paiement_id>/confirmer/', views.confirmer_paiement, name='confirmer_paiement'),
+    path('<str:paiement_id>/rembourser/', views.rembourser_paiement, name='rembourser_paiement'),
 ]
@@ -1,5 +1,134 @@
+"""
+Views pour les paiements.
+
+Les requêtes de création et de confirmation acceptent un en-tête
+`Idempotency-Key` : rejouées avec la même clé, elles renvoient le même
+résultat sans nouveau débit.
+"""
+from bson import ObjectId
+from django.conf import settings
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 
-# Views à implémenter
+from apps.taches.file import enfiler
+from . import services
+from .models import Paiement
+from .processeurs import signature_valide
+from .serializers import PaiementSerializer, CreationPaiementSerializer
+
+
+def paiement_du_client(request, paiement_id):
+    """Paiement de l'utilisateur connecté, ou None."""
+    if not ObjectId.is_valid(paiement_id):
+        return None
+    return Paiement.objects(id=paiement_id, client_id=str(request.user.id)).first()
+
+
+def reponse_erreur(erreur):
+    return Response({'error': erreur.message}, status=erreur.status_code)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def creer_paiement(request):
+    """
+    Créer un paiement pour une commande ou une location.
+    POST /api/paiements/  Body: { "commande_id" | "location_id", "methode_paiement" }
+    """
+    serializer = CreationPaiementSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        paiement = services.creer_paiement(
+            str(request.user.id),
+            serializer.validated_data['methode_paiement'],
+            commande_id=serializer.validated_data.get('commande_id'),
+            location_id=serializer.validated_data.get('location_id'),
+            cle_idempotence=request.headers.get('Idempotency-Key'),
+        )
+    except services.ErreurPaiement as e:
+        return reponse_erreur(e)
+
+    return Response(PaiementSerializer(paiement).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def detail_paiement(request, paiement_id):
+    """
+    Statut d'un paiement.
+    GET /api/paiements/<paiement_id>/
+    """
+    paiement = paiement_du_client(request, paiement_id)
+    if paiement is None:
+        return Response({'error': 'Paiement non trouvé'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(PaiementSerializer(paiement).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def confirmer_paiement(request, paiement_id):
+    """
+    Débiter le paiement.
+    POST /api/paiements/<paiement_id>/confirmer/
+    """
+    paiement = paiement_du_client(request, paiement_id)
+    if paiement is None:
+        return Response({'error': 'Paiement non trouvé'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        paiement = services.confirmer_paiement(
+            paiement, request.headers.get('Idempotency-Key')
+        )
+    except services.ErreurPaiement as e:
+        return reponse_erreur(e)
+
+    return Response(PaiementSerializer(paiement).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def rembourser_paiement(request, paiement_id):
+    """
+    Rembourser un paiement réussi (vendeur de la commande ou de la location).
+    POST /api/paiements/<paiement_id>/rembourser/
+    """
+    paiement = Paiement.objects(id=paiement_id).first() if ObjectId.is_valid(paiement_id) else None
+    if paiement is None or not services.peut_rembourser(request.user, paiement):
+        return Response({'error': 'Paiement non trouvé'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        paiement = services.rembourser_paiement(paiement)
+    except services.ErreurPaiement as e:
+        return reponse_erreur(e)
+
+    return Response(PaiementSerializer(paiement).data)
+
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def webhook(request):
+    """
+    Notifications du processeur de paiement, signées par HMAC
+    (en-tête `X-Signature: sha256=<hex>`). L'événement est mis en file et
+    acquitté aussitôt; il est traité par une tâche de fond, reprise par la
+    file en cas d'échec.
+    POST /api/paiements/webhook/
+    """
+    corps = request.body
+    if not signature_valide(corps, request.headers.get('X-Signature'),
+                            settings.PAIEMENT_WEBHOOK_SECRET):
+        return Response({'error': 'Signature invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        evenement_id = services.enregistrer_evenement(corps)
+    except (ValueError, KeyError, TypeError):
+        return Response({'error': 'Événement invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if evenement_id:
+        enfiler('paiements.traiter_evenement', evenement_id)
+    return Response({'recu': True, 'doublon': evenement_id is None})
@@ -41,6 +41,9 @@ class Panier(Document):
     # Montant total
     montant_total = FloatField(default=0, min_value=0)
 
+    # Incrémentée à chaque modification (voir services.py)
+    version = IntField(default=0)
+
     # Dates
     date_creation = DateTimeField(default=datetime.utcnow)
     date_modification = DateTimeField(default=datetime.utcnow)
@@ -0,0 +1,98 @@
+"""
+Revalidation du panier contre le catalogue courant.
+
+Les lignes du panier gardent le nom et le prix du produit au moment de
+l'ajout. Avant l'affichage ou la commande, tous les produits référencés
+sont relus en une seule requête (`$in`, projection sur les champs utiles)
+pour signaler les écarts de prix, les stocks insuffisants et les produits
+retirés de la vente.
+
+Le résultat est mis en cache par (client, version du panier, génération
+du catalogue) : il reste valable tant que ni le panier ni aucun produit
+n'ont changé. Les mouvements de stock des commandes ne font pas avancer la
+génération : le stock affiché peut avoir jusqu'à une minute (TTL) de
+retard sur les autres commandes, sans conséquence puisque ce cache ne sert
+qu'à l'affichage et que la commande revalide toujours sans cache
+(`revalider`).
+"""
+from bson import ObjectId
+
+from apps.core.cache import TTLCache
+from apps.produits.cache import generation_catalogue
+from apps.produits.models import Produit
+
+# Problèmes signalés sur une ligne
+PRIX_MODIFIE = 'prix_modifie'
+STOCK_INSUFFISANT = 'stock_insuffisant'
+INDISPONIBLE = 'indisponible'
+
+_revalidations = TTLCache(ttl=60, maxsize=5000)
+
+
+def produits_du_panier(panier):
+    """Produits référencés par le panier (documents bruts, une requête)."""
+    ids = [
+        ObjectId(article['produit_id'])
+        for article in panier.get('articles', [])
+        if ObjectId.is_valid(article['produit_id'])
+    ]
+    if not ids:
+        return {}
+    produits = Produit.objects(id__in=ids).only(
+        'nom', 'prix', 'stock', 'est_actif'
+    ).as_pymongo()
+    return {str(produit['_id']): produit for produit in produits}
+
+
+def revalider(panier):
+    """
+    Comparer chaque ligne au produit courant. Retourne les lignes avec
+    leurs problèmes, le montant recalculé aux prix actuels et `valide`
+    (aucun problème).
+    """
+    produits = produits_du_panier(panier)
+    lignes = []
+    montant_actuel = 0
+    for article in panier.get('articles', []):
+        produit = produits.get(article['produit_id'])
+        problemes = []
+        prix_actuel = stock = None
+        if produit is None or not produit.get('est_actif', True):
+            problemes.append(INDISPONIBLE)
+        else:
+            prix_actuel = produit['prix']
+            stock = produit.get('stock', 0)
+            if prix_actuel != article['prix_unitaire']:
+                problemes.append(PRIX_MODIFIE)
+            if stock < article['quantite']:
+                problemes.append(STOCK_INSUFFISANT)
+            montant_actuel += prix_actuel * article['quantite']
+        lignes.append({
+            'produit_id': article['produit_id'],
+            'nom_produit': article['nom_produit'],
+            'quantite': article['quantite'],
+            'prix_panier': article['prix_unitaire'],
+            'prix_actuel': prix_actuel,
+            'stock': stock,
+            'problemes': problemes,
+        })
+
+    montant_panier = panier.get('montant_total', 0)
+    return {
+        'valide': not any(ligne['problemes'] for ligne in lignes),
+        'lignes': lignes,
+        'montant_panier': montant_panier,
+        'montant_actuel': montant_actuel,
+        'ecart': montant_actuel - montant_panier,
+        'version': panier.get('version', 0),
+    }
+
+
+def revalider_en_cache(panier):
+    """`revalider`, mis en cache par version du panier et du catalogue."""
+    cle = (panier['client_id'], panier.get('version', 0), generation_catalogue())
+    resultat = _revalidations.get(cle)
+    if resultat is None:
+        resultat = revalider(panier)
+        _revalidations.set(cle, resultat)
+    return resultat
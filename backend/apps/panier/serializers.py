@@ -0,0 +1,50 @@
+"""
+Serializers pour le panier d'achat.
+
+Les paniers sont lus et modifiés en documents bruts (pymongo, voir
+services.py) : les champs sont lus comme des clés de dictionnaire.
+"""
+from rest_framework import serializers
+
+from .services import QUANTITE_MAX
+
+
+class ArticlePanierSerializer(serializers.Serializer):
+    """Ligne du panier."""
+    produit_id = serializers.CharField()
+    nom_produit = serializers.CharField()
+    quantite = serializers.IntegerField()
+    prix_unitaire = serializers.FloatField()
+    image_url = serializers.CharField(allow_null=True, required=False)
+    prix_total = serializers.SerializerMethodField()
+
+    def get_prix_total(self, obj):
+        return obj['quantite'] * obj['prix_unitaire']
+
+
+class PanierSerializer(serializers.Serializer):
+    """Panier d'un client."""
+    client_id = serializers.CharField()
+    articles = ArticlePanierSerializer(many=True)
+    montant_total = serializers.FloatField()
+    nombre_articles = serializers.SerializerMethodField()
+    version = serializers.IntegerField()
+    date_modification = serializers.DateTimeField(allow_null=True)
+
+    def get_nombre_articles(self, obj):
+        return sum(article['quantite'] for article in obj.get('articles', []))
+
+    def to_representation(self, instance):
+        instance.setdefault('version', 0)
+        return super().to_representation(instance)
+
+
+class QuantiteSerializer(serializers.Serializer):
+    """Quantité demandée pour une ligne."""
+    quantite = serializers.IntegerField(min_value=1, max_value=QUANTITE_MAX)
+
+
+class AjoutPanierSerializer(QuantiteSerializer):
+    """Produit à ajouter au panier."""
+    produit_id = serializers.CharField()
+    quantite = serializers.IntegerField(min_value=1, max_value=QUANTITE_MAX, default=1)
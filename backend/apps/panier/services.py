@@ -0,0 +1,265 @@
+"""
+Opérations atomiques sur le panier.
+
+Chaque modification est une seule requête `find_one_and_update` avec un
+pipeline de mise à jour : la ligne est modifiée (ou ajoutée, ou retirée)
+et `montant_total` recalculé côté MongoDB, dans la même opération. Deux
+onglets qui modifient le panier en même temps ne perdent donc pas
+d'articles, contrairement à un lire-modifier-sauvegarder du Document.
+
+Chaque modification incrémente `version`, utilisée pour mettre en cache
+la revalidation du panier.
+
+Les valeurs venant du client passent par `$literal` : dans un pipeline,
+une chaîne commençant par « $ » serait lue comme un chemin de champ.
+"""
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .models import Panier
+
+# Quantité maximale d'un même produit dans le panier
+QUANTITE_MAX = 99
+
+# Étape finale commune: recalcul du montant total à partir des lignes
+_RECALCULER_TOTAL = {'$set': {'montant_total': {'$sum': {'$map': {
+    'input': '$articles',
+    'as': 'ligne',
+    'in': {'$multiply': ['$$ligne.quantite', '$$ligne.prix_unitaire']},
+}}}}}
+
+
+def _collection():
+    return Panier._get_collection()
+
+
+def _horodatage():
+    """Champs mis à jour par toute modification (dans une étape $set)."""
+    maintenant = datetime.utcnow()
+    return {
+        'date_creation': {'$ifNull': ['$date_creation', maintenant]},
+        'date_modification': maintenant,
+        'version': {'$add': [{'$ifNull': ['$version', 0]}, 1]},
+    }
+
+
+def _remplacer_ligne(produit_id, champs):
+    """Expression $map qui met à jour les champs de la ligne du produit."""
+    ligne = {
+        'produit_id': '$$ligne.produit_id',
+        'nom_produit': '$$ligne.nom_produit',
+        'quantite': '$$ligne.quantite',
+        'prix_unitaire': '$$ligne.prix_unitaire',
+        'image_url': '$$ligne.image_url',
+    }
+    ligne.update(champs)
+    return {'$map': {
+        'input': '$articles',
+        'as': 'ligne',
+        'in': {'$cond': [
+            {'$eq': ['$$ligne.produit_id', {'$literal': produit_id}]},
+            ligne,
+            '$$ligne',
+        ]},
+    }}
+
+
+def panier_vide(client_id):
+    """Représentation d'un panier qui n'existe pas encore."""
+    return {
+        'client_id': client_id,
+        'articles': [],
+        'montant_total': 0,
+        'version': 0,
+        'date_modification': None,
+    }
+
+
+def obtenir_panier(client_id):
+    """Panier du client (document brut), vide s'il n'existe pas."""
+    return _collection().find_one({'client_id': client_id}) or panier_vide(client_id)
+
+
+def quantite_article(client_id, produit_id):
+    """Quantité du produit déjà dans le panier (0 si absent)."""
+    panier = _collection().find_one(
+        {'client_id': client_id},
+        {'articles': {'$elemMatch': {'produit_id': produit_id}}}
+    )
+    articles = (panier or {}).get('articles') or []
+    return articles[0]['quantite'] if articles else 0
+
+
+def ajouter_article(client_id, produit, quantite):
+    """
+    Ajouter `quantite` exemplaires du produit: incrémente la ligne existante
+    (en rafraîchissant nom, prix et image) ou en ajoute une nouvelle. Le
+    panier est créé s'il n'existe pas (upsert). La quantité de la ligne est
+    plafonnée au stock lu avec le produit (deux ajouts simultanés).
+    """
+    produit_id = str(produit.id)
+    image_url = produit.images[0] if produit.images else None
+    ligne = {
+        'produit_id': produit_id,
+        'nom_produit': produit.nom,
+        'quantite': quantite,
+        'prix_unitaire': produit.prix,
+        'image_url': image_url,
+    }
+    pipeline = [
+        {'$set': {
+            'articles': {'$cond': [
+                {'$in': [{'$literal': produit_id}, {'$ifNull': ['$articles.produit_id', []]}]},
+                _remplacer_ligne(produit_id, {
+                    'nom_produit': {'$literal': produit.nom},
+                    'quantite': {'$min': [
+                        {'$add': ['$$ligne.quantite', quantite]},
+                        min(QUANTITE_MAX, produit.stock),
+                    ]},
+                    'prix_unitaire': {'$literal': produit.prix},
+                    'image_url': {'$literal': image_url},
+                }),
+                {'$concatArrays': [{'$ifNull': ['$articles', []]}, {'$literal': [ligne]}]},
+            ]},
+            **_horodatage(),
+        }},
+        _RECALCULER_TOTAL,
+    ]
+    try:
+        return _collection().find_one_and_update(
+            {'client_id': client_id}, pipeline,
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Deux upserts simultanés sur un panier inexistant: l'autre a créé
+        # le document, la nouvelle tentative le met à jour
+        return _collection().find_one_and_update(
+            {'client_id': client_id}, pipeline,
+            return_document=ReturnDocument.AFTER
+        )
+
+
+def modifier_quantite(client_id, produit_id, quantite):
+    """Fixer la quantité d'une ligne. None si la ligne n'existe pas."""
+    return _collection().find_one_and_update(
+        {'client_id': client_id, 'articles.produit_id': produit_id},
+        [
+            {'$set': {
+                'articles': _remplacer_ligne(produit_id, {'quantite': {'$literal': quantite}}),
+                **_horodatage(),
+            }},
+            _RECALCULER_TOTAL,
+        ],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def retirer_article(client_id, produit_id):
+    """Retirer une ligne du panier. None si la ligne n'existe pas."""
+    return _collection().find_one_and_update(
+        {'client_id': client_id, 'articles.produit_id': produit_id},
+        [
+            {'$set': {
+                'articles': {'$filter': {
+                    'input': '$articles',
+                    'as': 'ligne',
+                    'cond': {'$ne': ['$$ligne.produit_id', {'$literal': produit_id}]},
+                }},
+                **_horodatage(),
+            }},
+            _RECALCULER_TOTAL,
+        ],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _par_produit(valeurs, expression):
+    """
+    Expression $switch: `expression(valeur)` pour la ligne dont le produit
+    est une clé de `valeurs`, sinon None.
+    """
+    return {'$switch': {
+        'branches': [
+            {'case': {'$eq': ['$$ligne.produit_id', {'$literal': produit_id}]},
+             'then': expression(valeur)}
+            for produit_id, valeur in valeurs.items()
+        ],
+        'default': None,
+    }}
+
+
+def retirer_articles(client_id, quantites):
+    """
+    Retirer, en une opération, les quantités commandées {produit_id:
+    quantite}. Les articles ajoutés entre-temps restent dans le panier; une
+    ligne n'est supprimée que si elle ne contient plus rien.
+    """
+    ligne = {
+        'produit_id': '$$ligne.produit_id',
+        'nom_produit': '$$ligne.nom_produit',
+        'quantite': {'$ifNull': [
+            _par_produit(quantites, lambda q: {'$subtract': ['$$ligne.quantite', q]}),
+            '$$ligne.quantite',
+        ]},
+        'prix_unitaire': '$$ligne.prix_unitaire',
+        'image_url': '$$ligne.image_url',
+    }
+    return _collection().find_one_and_update(
+        {'client_id': client_id},
+        [
+            {'$set': {
+                'articles': {'$map': {'input': '$articles', 'as': 'ligne', 'in': ligne}},
+                **_horodatage(),
+            }},
+            {'$set': {'articles': {'$filter': {
+                'input': '$articles',
+                'as': 'ligne',
+                'cond': {'$gt': ['$$ligne.quantite', 0]},
+            }}}},
+            _RECALCULER_TOTAL,
+        ],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def actualiser_prix(client_id, prix):
+    """Reporter les prix courants {produit_id: prix} sur les lignes du panier."""
+    ligne = {
+        'produit_id': '$$ligne.produit_id',
+        'nom_produit': '$$ligne.nom_produit',
+        'quantite': '$$ligne.quantite',
+        'prix_unitaire': {'$ifNull': [
+            _par_produit(prix, lambda p: {'$literal': p}), '$$ligne.prix_unitaire'
+        ]},
+        'image_url': '$$ligne.image_url',
+    }
+    return _collection().find_one_and_update(
+        {'client_id': client_id},
+        [
+            {'$set': {
+                'articles': {'$map': {'input': '$articles', 'as': 'ligne', 'in': ligne}},
+                **_horodatage(),
+            }},
+            _RECALCULER_TOTAL,
+        ],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def vider_panier(client_id):
+    """Vider le panier (sans le supprimer)."""
+    panier = _collection().find_one_and_update(
+        {'client_id': client_id},
+        {
+            '$set': {
+                'articles': [],
+                'montant_total': 0,
+                'date_modification': datetime.utcnow(),
+            },
+            '$inc': {'version': 1},
+        },
+        return_document=ReturnDocument.AFTER
+    )
+    return panier or panier_vide(client_id)
@@ -2,9 +2,14 @@
 URLs pour le panier d'achat.
 """
 from django.urls import path
+from . import views
 
 app_name = 'panier'
 
 urlpatterns = [
-    # À implémenter: ajouter au panier, retirer, vider, voir panier, etc.
+    path('', views.voir_panier, name='voir_panier'),
+    path('revalider/', views.revalider_panier, name='revalider_panier'),
+    path('ajouter/', views.ajouter_au_panier, name='ajouter_au_panier'),
+    path('articles/<str:produit_id>/', views.article_panier, name='article_panier'),
+    path('vider/', views.vider_panier, name='vider_panier'),
 ]
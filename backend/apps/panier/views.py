@@ -1,5 +1,112 @@
+"""
+Views pour le panier d'achat.
+"""
+from bson import ObjectId
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-# Views à implémenter
+from apps.produits.models import Produit
+from . import services
+from .revalidation import revalider_en_cache
+from .serializers import PanierSerializer, QuantiteSerializer, AjoutPanierSerializer
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def voir_panier(request):
+    """
+    Panier de l'utilisateur connecté.
+    GET /api/panier/
+    """
+    panier = services.obtenir_panier(str(request.user.id))
+    return Response(PanierSerializer(panier).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def revalider_panier(request):
+    """
+    Vérifier les prix et les stocks actuels des articles du panier.
+    GET /api/panier/revalider/
+    """
+    panier = services.obtenir_panier(str(request.user.id))
+    return Response(revalider_en_cache(panier))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def ajouter_au_panier(request):
+    """
+    Ajouter un produit au panier (ou augmenter sa quantité).
+    POST /api/panier/ajouter/
+    Body: { "produit_id": "...", "quantite": 1 }
+    """
+    serializer = AjoutPanierSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    produit_id = serializer.validated_data['produit_id']
+    quantite = serializer.validated_data['quantite']
+    produit = None
+    if ObjectId.is_valid(produit_id):
+        produit = Produit.objects(id=produit_id, est_actif=True).only(
+            'nom', 'prix', 'stock', 'images'
+        ).first()
+    if produit is None:
+        return Response(
+            {'error': 'Produit non trouvé'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    # Quantité déjà dans le panier comprise
+    client_id = str(request.user.id)
+    dans_panier = services.quantite_article(client_id, str(produit.id))
+    if produit.stock < dans_panier + quantite:
+        return Response(
+            {'error': 'Stock insuffisant', 'stock': produit.stock, 'dans_panier': dans_panier},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    panier = services.ajouter_article(client_id, produit, quantite)
+    return Response(PanierSerializer(panier).data)
+
+
+@api_view(['PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def article_panier(request, produit_id):
+    """
+    Modifier la quantité d'une ligne ou la retirer du panier.
+    PATCH /api/panier/articles/<produit_id>/  Body: { "quantite": 2 }
+    DELETE /api/panier/articles/<produit_id>/
+    """
+    client_id = str(request.user.id)
+
+    if request.method == 'DELETE':
+        panier = services.retirer_article(client_id, produit_id)
+    else:
+        serializer = QuantiteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        panier = services.modifier_quantite(
+            client_id, produit_id, serializer.validated_data['quantite']
+        )
+
+    if panier is None:
+        return Response(
+            {'error': 'Article non trouvé dans le panier'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(PanierSerializer(panier).data)
+
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def vider_panier(request):
+    """
+    Vider le panier.
+    DELETE /api/panier/vider/
+    """
+    panier = services.vider_panier(str(request.user.id))
+    return Response(PanierSerializer(panier).data)
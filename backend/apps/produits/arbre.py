@@ -0,0 +1,168 @@
+"""
+Arbre des catégories en mémoire.
+
+La collection des catégories est petite : elle est chargée entièrement en
+une requête, puis parents, enfants, ancêtres, descendants et nombres de
+sous-catégories sont calculés en mémoire. Les descendants sont indexés à
+partir du chemin matérialisé (`Categorie.ancetres`). L'arbre est rechargé quand la
+génération des catégories change (écriture sur une catégorie, dans ce
+worker ou dans un autre via le cache partagé).
+"""
+import threading
+import time
+from collections import defaultdict
+
+from bson import ObjectId
+
+from .cache import generation_categories
+
+
+class NoeudCategorie:
+    """Catégorie chargée en mémoire (mêmes attributs que le Document)."""
+    __slots__ = ('id', 'nom', 'slug', 'description', 'image', 'parent_id',
+                 'ancetres', 'est_active', 'date_creation')
+
+    def __init__(self, doc):
+        self.id = doc['_id']
+        self.nom = doc.get('nom')
+        self.slug = doc.get('slug')
+        self.description = doc.get('description')
+        self.image = doc.get('image')
+        parent = doc.get('parent')
+        self.parent_id = getattr(parent, 'id', parent)  # ObjectId ou DBRef
+        self.ancetres = doc.get('ancetres') or []
+        self.est_active = doc.get('est_active', True)
+        self.date_creation = doc.get('date_creation')
+
+    def __str__(self):
+        return self.nom
+
+
+class ArbreCategories:
+    """
+    Index des catégories par id et par slug, avec la liste des enfants.
+
+    La génération partagée n'est relue qu'une fois toutes les
+    `intervalle_verification` secondes ; une écriture dans ce worker
+    invalide l'arbre immédiatement.
+    """
+
+    def __init__(self, intervalle_verification=5):
+        self.intervalle_verification = intervalle_verification
+        self._verrou = threading.Lock()
+        self._etat = None
+        self._generation = None
+        self._derniere_verification = 0
+
+    def _charger(self):
+        from .models import Categorie
+
+        noeuds, par_slug, enfants = {}, {}, defaultdict(list)
+        for doc in Categorie.objects.as_pymongo():
+            noeud = NoeudCategorie(doc)
+            noeuds[noeud.id] = noeud
+            par_slug[noeud.slug] = noeud
+        descendants = defaultdict(list)
+        for noeud in noeuds.values():
+            if noeud.parent_id is not None:
+                enfants[noeud.parent_id].append(noeud)
+                if not noeud.ancetres:
+                    # Catégorie sans chemin matérialisé (antérieure au champ)
+                    noeud.ancetres = self._remonter(noeud, noeuds)
+            for ancetre_id in noeud.ancetres:
+                descendants[ancetre_id].append(noeud)
+        for liste in enfants.values():
+            liste.sort(key=lambda n: n.nom or '')
+        return noeuds, par_slug, dict(enfants), dict(descendants)
+
+    @staticmethod
+    def _remonter(noeud, noeuds):
+        """Chemin des ancêtres calculé en remontant les parents."""
+        chemin, vus = [], {noeud.id}
+        parent = noeuds.get(noeud.parent_id)
+        while parent is not None and parent.id not in vus:
+            chemin.append(parent.id)
+            vus.add(parent.id)
+            parent = noeuds.get(parent.parent_id)
+        return list(reversed(chemin))
+
+    def _etat_courant(self):
+        maintenant = time.monotonic()
+        if (self._etat is not None
+                and maintenant - self._derniere_verification < self.intervalle_verification):
+            return self._etat
+        with self._verrou:
+            generation = generation_categories()
+            if self._etat is None or generation != self._generation:
+                self._etat = self._charger()
+                self._generation = generation
+            self._derniere_verification = maintenant
+            return self._etat
+
+    def invalider(self):
+        """Forcer le rechargement au prochain accès."""
+        self._etat = None
+
+    # ------------------------------------------------------------------
+    # Lectures
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _id(categorie_id):
+        if isinstance(categorie_id, ObjectId):
+            return categorie_id
+        if categorie_id and ObjectId.is_valid(str(categorie_id)):
+            return ObjectId(str(categorie_id))
+        return None
+
+    def noeud(self, categorie_id):
+        """Catégorie par id (ObjectId ou str), ou None."""
+        return self._etat_courant()[0].get(self._id(categorie_id))
+
+    def par_slug(self, slug):
+        """Catégorie par slug, ou None."""
+        return self._etat_courant()[1].get(slug)
+
+    def categories(self, actives=True):
+        """Toutes les catégories triées par nom."""
+        noeuds = self._etat_courant()[0].values()
+        return sorted(
+            (n for n in noeuds if n.est_active or not actives),
+            key=lambda n: n.nom or ''
+        )
+
+    def enfants(self, categorie_id, actives=True):
+        """Sous-catégories directes triées par nom."""
+        enfants = self._etat_courant()[2].get(self._id(categorie_id), [])
+        return [n for n in enfants if n.est_active or not actives]
+
+    def nombre_sous_categories(self, categorie_id):
+        """Nombre de sous-catégories directes (actives ou non)."""
+        return len(self._etat_courant()[2].get(self._id(categorie_id), []))
+
+    def ancetres(self, categorie_id):
+        """Ancêtres de la catégorie, de la racine au parent direct."""
+        noeuds = self._etat_courant()[0]
+        noeud = noeuds.get(self._id(categorie_id))
+        if noeud is None:
+            return []
+        return [noeuds[a] for a in noeud.ancetres if a in noeuds]
+
+    def descendants(self, categorie_id, actives=False):
+        """Tous les descendants (enfants, petits-enfants, ...)."""
+        descendants = self._etat_courant()[3].get(self._id(categorie_id), [])
+        return [n for n in descendants if n.est_active or not actives]
+
+    def ids_sous_arbre(self, categorie_id):
+        """Ids de la catégorie et de tous ses descendants."""
+        categorie_id = self._id(categorie_id)
+        if categorie_id is None:
+            return []
+        return [categorie_id] + [n.id for n in self.descendants(categorie_id)]
+
+    def racines(self, actives=True):
+        """Catégories sans parent, triées par nom."""
+        return [n for n in self.categories(actives) if n.parent_id is None]
+
+
+arbre = ArbreCategories()
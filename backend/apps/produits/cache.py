@@ -0,0 +1,170 @@
+"""
+Cache des réponses publiques du catalogue.
+
+Les réponses des endpoints anonymes (liste, détail, catégories) sont mises
+en cache dans le backend Django configuré (`CACHES`), sous une clé dérivée
+du chemin et des query params normalisés. Toutes les clés incluent une
+« génération » du catalogue : toute écriture sur un produit ou une
+catégorie l'incrémente, ce qui invalide d'un coup toutes les réponses sans
+avoir à les énumérer. Une génération propre aux catégories permet à
+l'arbre des catégories de ne se recharger que lorsqu'elles changent.
+
+Le stock n'est pas figé dans le cache : il bouge à chaque commande, et
+invalider tout le catalogue à chaque passage en caisse viderait le cache en
+période de forte affluence. Les fiches produit d'une réponse (détail ou
+`results` d'une liste) reçoivent donc leur stock courant, relu en une
+requête (`$in`, projection sur `stock` et `est_actif`), et l'ETag en tient
+compte.
+
+Chaque réponse porte un ETag ; un navigateur qui renvoie `If-None-Match`
+reçoit un 304 sans corps.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from bson import ObjectId
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+CLE_GENERATION = 'catalogue:generation'
+CLE_GENERATION_CATEGORIES = 'catalogue:generation:categories'
+
+
+def _generation(cle):
+    generation = cache.get(cle)
+    if generation is None:
+        cache.add(cle, 1, timeout=None)
+        generation = cache.get(cle, 1)
+    return generation
+
+
+def _incrementer(cle):
+    try:
+        cache.incr(cle)
+    except ValueError:
+        cache.set(cle, 2, timeout=None)
+
+
+def generation_catalogue():
+    """Génération courante du catalogue (change à chaque écriture)."""
+    return _generation(CLE_GENERATION)
+
+
+def generation_categories():
+    """Génération courante des catégories."""
+    return _generation(CLE_GENERATION_CATEGORIES)
+
+
+def invalider_catalogue():
+    """Invalider toutes les réponses et compteurs mis en cache."""
+    _incrementer(CLE_GENERATION)
+
+
+def invalider_categories():
+    """Invalider l'arbre des catégories et tout le catalogue."""
+    _incrementer(CLE_GENERATION_CATEGORIES)
+    invalider_catalogue()
+
+
+def cle_reponse(request):
+    """
+    Clé de cache: génération + hôte + chemin + query params triés (les
+    liens `next`/`previous` des réponses sont absolus).
+    """
+    params = sorted(
+        (cle, valeur)
+        for cle, valeurs in request.query_params.lists()
+        for valeur in valeurs
+    )
+    empreinte = hashlib.md5(
+        json.dumps([request.get_host(), request.path, params]).encode('utf-8')
+    ).hexdigest()
+    return f"catalogue:{generation_catalogue()}:reponse:{empreinte}"
+
+
+def etag_correspond(request, etag):
+    """Vrai si l'en-tête If-None-Match du client contient l'ETag."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    etags = [e.strip() for e in if_none_match.split(',')]
+    return etag in etags or '*' in etags
+
+
+def _fiches_produits(data):
+    """Fiches produit d'une réponse: le détail lui-même ou les `results`."""
+    if not isinstance(data, dict):
+        return []
+    fiches = data.get('results', [data])
+    return [
+        fiche for fiche in fiches
+        if isinstance(fiche, dict) and 'stock' in fiche and ObjectId.is_valid(fiche.get('id'))
+    ]
+
+
+def actualiser_stock(data):
+    """
+    Remplacer le stock (et `est_disponible`) des fiches produit de `data`
+    par les valeurs courantes. Retourne une empreinte des stocks lus, vide
+    si la réponse ne contient pas de produit.
+    """
+    from .models import Produit
+    fiches = _fiches_produits(data)
+    if not fiches:
+        return ''
+    courants = {
+        str(produit['_id']): produit
+        for produit in Produit._get_collection().find(
+            {'_id': {'$in': [ObjectId(fiche['id']) for fiche in fiches]}},
+            {'stock': 1, 'est_actif': 1}
+        )
+    }
+    for fiche in fiches:
+        produit = courants.get(fiche['id'])
+        if produit is None:
+            continue
+        fiche['stock'] = produit.get('stock', 0)
+        if 'est_disponible' in fiche:
+            fiche['est_disponible'] = bool(produit.get('est_actif')) and fiche['stock'] > 0
+    return ','.join(str(fiche['stock']) for fiche in fiches)
+
+
+def cache_catalogue(vue):
+    """
+    Décorateur de vue (sous @api_view) qui met en cache les réponses 200
+    des requêtes GET et gère la revalidation par ETag.
+    """
+    @wraps(vue)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return vue(request, *args, **kwargs)
+
+        cle = cle_reponse(request)
+        entree = cache.get(cle)
+        if entree is None:
+            response = vue(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            contenu = json.dumps(response.data, cls=JSONEncoder, sort_keys=True)
+            entree = {
+                'data': json.loads(contenu),
+                'etag': '"%s"' % hashlib.md5(contenu.encode('utf-8')).hexdigest(),
+            }
+            cache.set(cle, entree, settings.CACHE_CATALOGUE_TIMEOUT)
+
+        etag = entree['etag']
+        stocks = actualiser_stock(entree['data'])
+        if stocks:
+            etag = '"%s"' % hashlib.md5((etag + stocks).encode('utf-8')).hexdigest()
+
+        if etag_correspond(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(entree['data'])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+        return response
+
+    return wrapper
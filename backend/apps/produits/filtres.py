@@ -0,0 +1,70 @@
+"""
+Construction du QuerySet de la liste publique des produits.
+
+Partagé entre la vue `liste_produits` et la commande `analyser_index`,
+pour que l'analyse des index porte exactement sur les requêtes servies.
+"""
+from bson import ObjectId
+
+from .arbre import arbre
+from .models import Produit
+from .recherche import filtrer_recherche
+
+
+class FiltreInvalide(ValueError):
+    """Paramètre de filtre mal formé (réponse 400)."""
+
+
+def filtrer_produits(params):
+    """
+    Appliquer les filtres de la liste publique (query params) aux produits
+    actifs. Retourne le QuerySet non trié et le mode de recherche utilisé.
+    Lève FiltreInvalide pour un id de catégorie mal formé.
+    """
+    # Base query: seulement produits actifs
+    queryset = Produit.objects(est_actif=True)
+
+    # Filtres
+    search = params.get('search', '')
+    queryset, mode_recherche = filtrer_recherche(
+        queryset, search, params.get('search_mode')
+    )
+
+    type_produit = params.get('type')
+    if type_produit:
+        queryset = queryset.filter(type_produit=type_produit)
+
+    # Catégorie et toutes ses sous-catégories (un seul $in indexé)
+    categorie_id = params.get('categorie')
+    if categorie_id:
+        if not ObjectId.is_valid(categorie_id):
+            raise FiltreInvalide('Identifiant de catégorie invalide')
+        queryset = queryset.filter(categorie__in=arbre.ids_sous_arbre(categorie_id))
+
+    min_prix = params.get('min_prix')
+    if min_prix:
+        try:
+            queryset = queryset.filter(prix__gte=float(min_prix))
+        except ValueError:
+            pass
+
+    max_prix = params.get('max_prix')
+    if max_prix:
+        try:
+            queryset = queryset.filter(prix__lte=float(max_prix))
+        except ValueError:
+            pass
+
+    disponible_location = params.get('disponible_location')
+    if disponible_location and disponible_location.lower() == 'true':
+        queryset = queryset.filter(disponible_location=True)
+
+    est_en_vedette = params.get('est_en_vedette')
+    if est_en_vedette and est_en_vedette.lower() == 'true':
+        queryset = queryset.filter(est_en_vedette=True)
+
+    vendeur_id = params.get('vendeur_id')
+    if vendeur_id:
+        queryset = queryset.filter(vendeur_id=vendeur_id)
+
+    return queryset, mode_recherche
@@ -0,0 +1,287 @@
+"""
+Upload et variantes redimensionnées des images produits.
+
+- Upload: le fichier n'est jamais lu en entier en mémoire. Au-delà de
+  `FILE_UPLOAD_MAX_MEMORY_SIZE`, Django l'écrit par morceaux dans un
+  fichier temporaire ; il est ensuite copié morceau par morceau vers le
+  stockage. Seul l'en-tête est décodé pour valider l'image.
+- Adressage par contenu: l'empreinte SHA-256 est calculée pendant la
+  réception (`EmpreinteUpload`) et sert de nom de fichier. Un contenu déjà
+  connu (index `product_images`) n'est ni réécrit ni retraité : la même
+  photo uploadée pour plusieurs produits est stockée et servie une fois,
+  sous une URL qui ne change jamais de contenu. Un contenu déjà refusé
+  (illisible) est refusé à nouveau. Les fichiers que plus aucun produit
+  ne référence sont supprimés par `nettoyer_images`.
+- Variantes: une tâche de fond (`produits.generer_variantes`) produit les
+  tailles `TAILLES` en WebP, et en AVIF si Pillow sait l'encoder
+  (greffon `pillow-avif-plugin`). Les JPEG sont décodés directement à
+  taille réduite (`draft`), chaque taille est calculée à partir de la
+  précédente.
+- Lecture: `image_responsive()` donne la miniature et les `srcset` par
+  format, prêts pour un élément <picture>.
+"""
+import hashlib
+import io
+import logging
+from datetime import datetime
+from urllib.parse import urljoin
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+from mongoengine import NotUniqueError
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from apps.taches.file import enfiler
+from .cache import invalider_catalogue
+from .models import ImageProduit, VarianteImage
+
+try:
+    import pillow_avif  # noqa: F401  (enregistre l'encodeur AVIF)
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+TYPES_AUTORISES = ['image/jpeg', 'image/png', 'image/jpg', 'image/webp']
+TAILLE_MAX = 5 * 1024 * 1024  # 5MB
+PIXELS_MAX = 40_000_000  # Refuser les images « bombes » de décompression
+
+# Largeurs des variantes (pixels), de la plus grande à la plus petite
+TAILLES = [('grande', 1600), ('moyenne', 800), ('miniature', 320)]
+QUALITE = {'webp': 80, 'avif': 55}
+TYPES_MIME = {'webp': 'image/webp', 'avif': 'image/avif'}
+# Extension des originaux selon le format détecté (pas le nom envoyé):
+# un même contenu a toujours le même nom
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+class ImageInvalide(Exception):
+    """Fichier refusé (type, taille ou contenu)."""
+
+
+def formats():
+    """Formats des variantes, du plus compact au plus compatible."""
+    if '.avif' in Image.registered_extensions():
+        return ['avif', 'webp']
+    return ['webp']
+
+
+class EmpreinteUpload(FileUploadHandler):
+    """
+    Gestionnaire d'upload qui calcule le SHA-256 de chaque fichier au fil
+    de la réception; le fichier lui-même est produit par les gestionnaires
+    suivants. À placer en tête de `request.upload_handlers`.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.empreintes = {}
+        self._hachage = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._hachage = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hachage.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.empreintes[self.field_name] = self._hachage.hexdigest()
+        return None
+
+
+def empreinte_fichier(fichier):
+    """SHA-256 d'un fichier déjà reçu, lu par morceaux."""
+    hachage = hashlib.sha256()
+    for morceau in fichier.chunks():
+        hachage.update(morceau)
+    fichier.seek(0)
+    return hachage.hexdigest()
+
+
+def enregistrer_upload(fichier, vendeur_id, url_absolue, empreinte=None):
+    """
+    Valider et enregistrer une image uploadée, puis mettre en file la
+    génération de ses variantes. Un contenu déjà connu retourne l'image
+    existante sans rien réécrire. `url_absolue` complète l'URL du stockage
+    (request.build_absolute_uri). Lève ImageInvalide.
+    """
+    if fichier.content_type not in TYPES_AUTORISES:
+        raise ImageInvalide('Type de fichier non autorisé. Utilisez JPEG, PNG ou WebP.')
+    if fichier.size > TAILLE_MAX:
+        raise ImageInvalide('Image trop volumineuse. Taille maximale: 5MB.')
+
+    empreinte = empreinte or empreinte_fichier(fichier)
+    existante = ImageProduit.objects(empreinte=empreinte).first()
+    if existante is not None:
+        if existante.statut == ImageProduit.STATUT_ECHOUEE:
+            raise ImageInvalide("Le fichier n'est pas une image valide.")
+        ImageProduit.objects(id=existante.id).update_one(set__date_dernier_upload=datetime.utcnow())
+        return existante
+
+    try:
+        # Lecture de l'en-tête seulement (dimensions, format)
+        with Image.open(fichier) as image:
+            largeur, hauteur = image.size
+            format_ = image.format
+    except Image.DecompressionBombError:
+        raise ImageInvalide('Image trop grande (dimensions).')
+    except (UnidentifiedImageError, OSError):
+        raise ImageInvalide("Le fichier n'est pas une image valide.")
+    if format_ not in EXTENSIONS:
+        raise ImageInvalide('Type de fichier non autorisé. Utilisez JPEG, PNG ou WebP.')
+    if largeur * hauteur > PIXELS_MAX:
+        raise ImageInvalide('Image trop grande (dimensions).')
+    fichier.seek(0)
+
+    nom = f"produits/{empreinte}{EXTENSIONS[format_]}"
+    chemin = nom if default_storage.exists(nom) else default_storage.save(nom, fichier)
+
+    image = ImageProduit(
+        vendeur_id=vendeur_id,
+        empreinte=empreinte,
+        chemin=chemin,
+        url=url_absolue(default_storage.url(chemin)),
+        largeur=largeur,
+        hauteur=hauteur,
+    )
+    try:
+        image.save(force_insert=True)
+    except NotUniqueError:
+        # Même contenu uploadé en parallèle: l'autre requête l'a indexé
+        if chemin != nom:
+            default_storage.delete(chemin)  # Copie renommée par le stockage
+        return ImageProduit.objects.get(empreinte=empreinte)
+    enfiler('produits.generer_variantes', str(image.id))
+    return image
+
+
+ORIENTATION_EXIF = 0x0112
+# Orientations EXIF qui échangent largeur et hauteur (rotation de 90°/270°)
+ORIENTATIONS_PIVOTEES = (5, 6, 7, 8)
+
+
+def _ouvrir(chemin, largeur_max):
+    """
+    Décoder l'original, réduit dès le décodage si le format le permet, et
+    redressé selon l'EXIF. Retourne l'image et les dimensions de l'original
+    redressé (lues dans l'en-tête, pas celles du décodage réduit).
+    """
+    with default_storage.open(chemin, 'rb') as fichier:
+        image = Image.open(fichier)
+        largeur, hauteur = image.size
+        pivotee = image.getexif().get(ORIENTATION_EXIF) in ORIENTATIONS_PIVOTEES
+        if pivotee:
+            largeur, hauteur = hauteur, largeur
+        if largeur > largeur_max:
+            # Cible en largeur affichée, ramenée au sens des pixels stockés
+            cible = (largeur_max, hauteur * largeur_max // largeur)
+            image.draft('RGB', cible[::-1] if pivotee else cible)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    transparente = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    return image.convert('RGBA' if transparente else 'RGB'), (largeur, hauteur)
+
+
+def _enregistrer_variante(image, chemin, format_):
+    tampon = io.BytesIO()
+    image.save(tampon, format_.upper(), quality=QUALITE[format_])
+    if default_storage.exists(chemin):
+        default_storage.delete(chemin)  # Tâche rejouée
+    return default_storage.save(chemin, ContentFile(tampon.getvalue()))
+
+
+def generer_variantes(image_id):
+    """Produire les variantes d'une image (tâche `produits.generer_variantes`)."""
+    image = ImageProduit.objects(id=image_id).first()
+    if image is None or image.statut == ImageProduit.STATUT_PRETE:
+        return
+
+    try:
+        source, (largeur_originale, hauteur_originale) = _ouvrir(image.chemin, TAILLES[0][1])
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        # Un nouvel essai n'y changera rien
+        logger.warning("Image %s illisible: %s", image_id, e)
+        ImageProduit.objects(id=image.id).update_one(
+            set__statut=ImageProduit.STATUT_ECHOUEE, set__erreur=str(e)
+        )
+        return
+
+    variantes = []
+    courante = source
+    precedentes = {}  # largeur -> variantes déjà produites à cette largeur
+    for taille, largeur_cible in TAILLES:
+        largeur = min(largeur_cible, source.width)
+        if largeur not in precedentes:
+            hauteur = max(1, round(courante.height * largeur / courante.width))
+            if largeur != courante.width:
+                courante = courante.resize((largeur, hauteur), Image.LANCZOS, reducing_gap=3.0)
+            precedentes[largeur] = {}
+            for format_ in formats():
+                chemin = _enregistrer_variante(
+                    courante, f"produits/variantes/{image.empreinte or image.id}-{largeur}.{format_}",
+                    format_
+                )
+                precedentes[largeur][format_] = (
+                    chemin, urljoin(image.url, default_storage.url(chemin)), courante.height
+                )
+        # Original plus petit que la taille demandée: même fichier
+        for format_, (chemin, url, hauteur) in precedentes[largeur].items():
+            variantes.append(VarianteImage(
+                taille=taille, format=format_, chemin=chemin, url=url,
+                largeur=largeur, hauteur=hauteur
+            ))
+
+    ImageProduit.objects(id=image.id).update_one(
+        set__variantes=variantes,
+        set__largeur=largeur_originale,
+        set__hauteur=hauteur_originale,
+        set__statut=ImageProduit.STATUT_PRETE,
+        unset__erreur=True,
+    )
+    # Les réponses du catalogue en cache portent encore l'original
+    invalider_catalogue()
+
+
+def image_responsive(url, image=None):
+    """
+    Représentation d'une image pour l'affichage:
+    {url, miniature, largeur, hauteur, sources: [{type, srcset}]}.
+    `image` est le document brut de ses variantes (None si pas encore prêtes:
+    la miniature est alors l'original).
+    """
+    if not url:
+        return None
+    if not image or not image.get('variantes'):
+        return {'url': url, 'miniature': url, 'largeur': None, 'hauteur': None, 'sources': []}
+
+    variantes = image['variantes']
+    miniature = next(
+        (v['url'] for v in variantes if v['taille'] == 'miniature' and v['format'] == 'webp'),
+        url
+    )
+    sources = []
+    for format_ in formats_presents(variantes):
+        largeurs = {}
+        for v in variantes:
+            if v['format'] == format_:
+                largeurs[v['largeur']] = v['url']
+        sources.append({
+            'type': TYPES_MIME[format_],
+            'srcset': ', '.join(f"{u} {l}w" for l, u in sorted(largeurs.items())),
+        })
+    return {
+        'url': url,
+        'miniature': miniature,
+        'largeur': image.get('largeur'),
+        'hauteur': image.get('hauteur'),
+        'sources': sources,
+    }
+
+
+def formats_presents(variantes):
+    """Formats des variantes, AVIF en premier (le navigateur prend la première source reconnue)."""
+    presents = {v['format'] for v in variantes}
+    return [f for f in ('avif', 'webp') if f in presents]
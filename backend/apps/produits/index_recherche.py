@@ -0,0 +1,343 @@
+"""
+Index inversé en mémoire pour l'autocomplétion du catalogue.
+
+L'index est construit depuis MongoDB (nom, description, nom de catégorie
+et type des produits actifs), puis tenu à jour de façon incrémentale :
+- directement par les vues qui créent, modifient ou suppriment un produit ;
+- par une synchronisation périodique sur `date_modification`, qui rattrape
+  les modifications faites par les autres workers.
+
+La recherche tolère les mots incomplets (préfixe du dernier mot) et une
+faute de frappe par mot (distance d'édition 1, via un index des variantes
+par suppression d'un caractère).
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from .resolvers import reference_id
+
+logger = logging.getLogger(__name__)
+
+LONGUEUR_MIN_TOKEN = 2
+LONGUEUR_MIN_FAUTE = 4  # pas de tolérance aux fautes sur les mots courts
+MAX_TOKENS_PREFIXE = 50
+# Marge de la synchronisation pour absorber le décalage d'horloge entre workers
+MARGE_SYNCHRO = timedelta(seconds=5)
+
+# Poids des correspondances dans le score
+POIDS_EXACT = 3
+POIDS_PREFIXE = 2
+POIDS_FAUTE = 1
+BONUS_NOM = 2
+
+
+def normaliser(texte):
+    """Minuscules sans accents."""
+    decompose = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in decompose if not unicodedata.combining(c)).lower()
+
+
+def tokeniser(texte):
+    """Découper un texte en mots normalisés."""
+    return [
+        mot for mot in re.findall(r'[a-z0-9]+', normaliser(texte))
+        if len(mot) >= LONGUEUR_MIN_TOKEN
+    ]
+
+
+def variantes(mot):
+    """Le mot et toutes ses variantes privées d'un caractère."""
+    return {mot} | {mot[:i] + mot[i + 1:] for i in range(len(mot))}
+
+
+def distance_max_un(a, b):
+    """Vrai si la distance de Damerau-Levenshtein entre a et b est <= 1."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return (len(diff) == 2 and diff[1] == diff[0] + 1
+                and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]])
+    if la > lb:
+        a, b = b, a
+    # b a un caractère de plus que a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class IndexInverse:
+    """
+    Index inversé mot -> ids de produits, avec les métadonnées nécessaires
+    aux filtres (type, catégorie, prix) et à l'affichage des suggestions.
+    """
+
+    def __init__(self, intervalle_synchro=30):
+        self.intervalle_synchro = intervalle_synchro
+        self._verrou = threading.RLock()
+        self._reinitialiser()
+
+    def _reinitialiser(self):
+        self._postings = defaultdict(set)      # mot -> ids
+        self._postings_nom = defaultdict(set)  # mot -> ids (mots du nom)
+        self._variantes = defaultdict(set)     # variante -> mots
+        self._mots_tries = []
+        self._documents = {}                   # id -> métadonnées
+        self._construit = False
+        self._derniere_modification = None
+        self._derniere_synchro = 0
+
+    @property
+    def est_construit(self):
+        return self._construit
+
+    # ------------------------------------------------------------------
+    # Construction et mises à jour
+    # ------------------------------------------------------------------
+
+    def construire(self):
+        """(Re)construire l'index complet depuis MongoDB."""
+        from .arbre import arbre
+        from .models import Produit
+
+        champs = ('nom', 'slug', 'description', 'type_produit', 'prix',
+                  'categorie', 'images', 'date_modification')
+        debut = time.monotonic()
+        horodatage = datetime.utcnow()
+        documents = list(Produit.objects(est_actif=True).only(*champs).as_pymongo())
+        with self._verrou:
+            self._reinitialiser()
+            for doc in documents:
+                categorie = arbre.noeud(doc.get('categorie'))
+                self._ajouter(doc, categorie.nom if categorie else '')
+                self._noter_modification(doc.get('date_modification'))
+            self._noter_modification(horodatage)
+            self._construit = True
+            self._derniere_synchro = time.monotonic()
+        logger.info(
+            "Index de recherche construit: %d produits en %.0f ms",
+            len(self._documents), (time.monotonic() - debut) * 1000
+        )
+
+    def construire_si_necessaire(self):
+        """Construire l'index au premier usage, sinon le synchroniser."""
+        if not self._construit:
+            with self._verrou:
+                if not self._construit:
+                    self.construire()
+                    return
+        if time.monotonic() - self._derniere_synchro > self.intervalle_synchro:
+            self.synchroniser()
+
+    def synchroniser(self):
+        """Réindexer les produits modifiés depuis la dernière synchronisation."""
+        from .models import Produit
+
+        with self._verrou:
+            self._derniere_synchro = time.monotonic()
+            depuis = self._derniere_modification
+        for produit in Produit.objects(date_modification__gt=depuis - MARGE_SYNCHRO):
+            self.indexer(produit)
+
+    def indexer(self, produit):
+        """Ajouter, mettre à jour ou retirer un produit (document MongoEngine)."""
+        if not self._construit:
+            return
+        from .arbre import arbre
+
+        categorie = arbre.noeud(reference_id(produit, 'categorie'))
+        doc = {
+            '_id': produit.id,
+            'nom': produit.nom,
+            'slug': produit.slug,
+            'description': produit.description,
+            'type_produit': produit.type_produit,
+            'prix': produit.prix,
+            'categorie': reference_id(produit, 'categorie'),
+            'images': list(produit.images or []),
+        }
+        with self._verrou:
+            self._retirer(str(produit.id))
+            if produit.est_actif:
+                self._ajouter(doc, categorie.nom if categorie else '')
+            self._noter_modification(produit.date_modification)
+
+    def retirer(self, produit_id):
+        """Retirer un produit de l'index."""
+        with self._verrou:
+            self._retirer(str(produit_id))
+
+    def _noter_modification(self, date):
+        if date and (self._derniere_modification is None
+                     or date > self._derniere_modification):
+            self._derniere_modification = date
+
+    def _ajouter(self, doc, nom_categorie):
+        produit_id = str(doc['_id'])
+        mots_nom = set(tokeniser(doc.get('nom')))
+        mots = mots_nom | set(tokeniser(doc.get('description')))
+        mots |= set(tokeniser(nom_categorie)) | set(tokeniser(doc.get('type_produit')))
+
+        images = doc.get('images') or []
+        categorie = doc.get('categorie')
+        self._documents[produit_id] = {
+            'id': produit_id,
+            'nom': doc.get('nom'),
+            'slug': doc.get('slug'),
+            'type_produit': doc.get('type_produit'),
+            'prix': doc.get('prix'),
+            'categorie': str(categorie) if categorie else None,
+            'image_principale': images[0] if images else None,
+            '_mots': mots,
+            '_mots_nom': mots_nom,
+        }
+        for mot in mots:
+            if mot not in self._postings:
+                self._ajouter_mot(mot)
+            self._postings[mot].add(produit_id)
+        for mot in mots_nom:
+            self._postings_nom[mot].add(produit_id)
+
+    def _retirer(self, produit_id):
+        document = self._documents.pop(produit_id, None)
+        if document is None:
+            return
+        for mot in document['_mots_nom']:
+            self._postings_nom[mot].discard(produit_id)
+            if not self._postings_nom[mot]:
+                del self._postings_nom[mot]
+        for mot in document['_mots']:
+            self._postings[mot].discard(produit_id)
+            if not self._postings[mot]:
+                del self._postings[mot]
+                self._retirer_mot(mot)
+
+    def _ajouter_mot(self, mot):
+        bisect.insort(self._mots_tries, mot)
+        for variante in variantes(mot):
+            self._variantes[variante].add(mot)
+
+    def _retirer_mot(self, mot):
+        position = bisect.bisect_left(self._mots_tries, mot)
+        if position < len(self._mots_tries) and self._mots_tries[position] == mot:
+            del self._mots_tries[position]
+        for variante in variantes(mot):
+            self._variantes[variante].discard(mot)
+            if not self._variantes[variante]:
+                del self._variantes[variante]
+
+    # ------------------------------------------------------------------
+    # Recherche
+    # ------------------------------------------------------------------
+
+    def _correspondances(self, mot, prefixe):
+        """Mots de l'index correspondant à `mot`, avec leur poids."""
+        poids = {}
+        if len(mot) >= LONGUEUR_MIN_FAUTE:
+            for variante in variantes(mot):
+                for candidat in self._variantes.get(variante, ()):
+                    if distance_max_un(mot, candidat):
+                        poids[candidat] = POIDS_FAUTE
+        if prefixe:
+            debut = bisect.bisect_left(self._mots_tries, mot)
+            for candidat in self._mots_tries[debut:debut + MAX_TOKENS_PREFIXE]:
+                if not candidat.startswith(mot):
+                    break
+                poids[candidat] = POIDS_PREFIXE
+        if mot in self._postings:
+            poids[mot] = POIDS_EXACT
+        return poids
+
+    def rechercher(self, requete, type_produit=None, categories=None,
+                   min_prix=None, max_prix=None, limite=10):
+        """
+        Retourner les produits correspondant à tous les mots de la requête
+        (le dernier mot peut être incomplet), filtrés puis triés par score.
+        """
+        mots = tokeniser(requete)
+        if not mots:
+            return []
+
+        with self._verrou:
+            scores = None
+            for position, mot in enumerate(mots):
+                dernier = position == len(mots) - 1
+                scores_mot = defaultdict(int)
+                for candidat, poids in self._correspondances(mot, dernier).items():
+                    for produit_id in self._postings[candidat]:
+                        bonus = BONUS_NOM if produit_id in self._postings_nom.get(candidat, ()) else 0
+                        scores_mot[produit_id] = max(scores_mot[produit_id], poids + bonus)
+                if scores is None:
+                    scores = scores_mot
+                else:
+                    scores = {
+                        produit_id: score + scores_mot[produit_id]
+                        for produit_id, score in scores.items()
+                        if produit_id in scores_mot
+                    }
+                if not scores:
+                    return []
+
+            resultats = []
+            for produit_id, score in scores.items():
+                document = self._documents[produit_id]
+                if type_produit and document['type_produit'] != type_produit:
+                    continue
+                if categories is not None and document['categorie'] not in categories:
+                    continue
+                if min_prix is not None and document['prix'] < min_prix:
+                    continue
+                if max_prix is not None and document['prix'] > max_prix:
+                    continue
+                resultats.append((score, document))
+
+        resultats.sort(key=lambda r: (-r[0], r[1]['nom'] or ''))
+        return [
+            {cle: valeur for cle, valeur in document.items() if not cle.startswith('_')}
+            for _, document in resultats[:limite]
+        ]
+
+
+index_produits = IndexInverse()
+
+
+_construction_lancee = False
+_construction_verrou = threading.Lock()
+
+
+def demarrer_construction():
+    """
+    Construire l'index en arrière-plan au démarrage du serveur (appelé par
+    `paraplus.wsgi`, pas par les commandes de gestion), si
+    INDEX_RECHERCHE_AU_DEMARRAGE. Un seul thread par processus ; il passe
+    par `construire_si_necessaire` pour ne pas doubler une construction
+    déjà lancée par une première requête.
+    """
+    global _construction_lancee
+    from django.conf import settings
+    if not settings.INDEX_RECHERCHE_AU_DEMARRAGE:
+        return
+    with _construction_verrou:
+        if _construction_lancee:
+            return
+        _construction_lancee = True
+
+    def construire():
+        try:
+            index_produits.construire_si_necessaire()
+        except Exception:
+            logger.exception("Échec de la construction de l'index de recherche")
+
+    threading.Thread(target=construire, name='index-recherche', daemon=True).start()
@@ -0,0 +1,127 @@
+"""
+Analyse de la couverture des requêtes du catalogue par les index MongoDB.
+
+Usage: python manage.py analyser_index [--cursor] [--strict]
+
+Pour chaque forme de requête de `liste_produits` (combinaison de filtres et
+de tri), la commande exécute `explain()` et signale les plans qui
+parcourent toute la collection (COLLSCAN) ou trient en mémoire (SORT).
+"""
+from itertools import product
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.produits.filtres import filtrer_produits
+from apps.produits.models import Produit, Categorie
+from apps.produits.views import ORDERINGS_PRODUITS
+
+
+# Combinaisons de filtres réellement envoyées par le frontend
+FORMES_FILTRES = [
+    (),
+    ('type',),
+    ('categorie',),
+    ('prix',),
+    ('type', 'prix'),
+    ('categorie', 'prix'),
+    ('categorie', 'type'),
+    ('vendeur_id',),
+    ('disponible_location',),
+    ('est_en_vedette',),
+]
+
+
+def etapes(plan):
+    """Parcourir récursivement les étapes d'un plan d'exécution."""
+    yield plan
+    for cle in ('inputStage', 'queryPlan'):
+        if cle in plan:
+            yield from etapes(plan[cle])
+    for sous_plan in plan.get('inputStages', []):
+        yield from etapes(sous_plan)
+
+
+def analyser_plan(explication):
+    """Retourner (problèmes, index utilisés) du plan gagnant."""
+    plan = explication.get('queryPlanner', {}).get('winningPlan', {})
+    problemes, index = [], []
+    for etape in etapes(plan):
+        nom = etape.get('stage')
+        if nom == 'COLLSCAN':
+            problemes.append('COLLSCAN')
+        elif nom == 'SORT':
+            problemes.append('SORT en mémoire')
+        if etape.get('indexName'):
+            index.append(etape['indexName'])
+    return problemes, index
+
+
+class Command(BaseCommand):
+    help = "Signale les formes de requêtes du catalogue non couvertes par un index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cursor', action='store_true',
+            help="Analyser le tri de la pagination par curseur (tri + _id)."
+        )
+        parser.add_argument(
+            '--strict', action='store_true',
+            help="Terminer en erreur si une forme n'est pas couverte."
+        )
+
+    def handle(self, *args, **options):
+        categorie = Categorie.objects.only('id').first()
+        produit = Produit.objects.only('vendeur_id').first()
+        valeurs = {
+            'type': {'type': Produit.TYPE_PARAPHARMACIE},
+            'categorie': {'categorie': str(categorie.id if categorie else ObjectId())},
+            'prix': {'min_prix': '10', 'max_prix': '100'},
+            'vendeur_id': {'vendeur_id': produit.vendeur_id if produit else 'vendeur'},
+            'disponible_location': {'disponible_location': 'true'},
+            'est_en_vedette': {'est_en_vedette': 'true'},
+        }
+
+        formes = []
+        for filtres, ordering in product(FORMES_FILTRES, ORDERINGS_PRODUITS):
+            params = {}
+            for filtre in filtres:
+                params.update(valeurs[filtre])
+            queryset, _ = filtrer_produits(params)
+            tri = [ordering]
+            if options['cursor']:
+                tri.append(('-' if ordering.startswith('-') else '') + 'id')
+            libelle = f"liste_produits [{', '.join(filtres) or 'aucun filtre'}] tri={ordering}"
+            formes.append((libelle, queryset.order_by(*tri)))
+
+        vendeur_id = valeurs['vendeur_id']['vendeur_id']
+        formes.append((
+            'mes_produits tri=-date_creation',
+            Produit.objects(vendeur_id=vendeur_id).order_by('-date_creation')
+        ))
+        if categorie:
+            formes.append((
+                'produits_similaires',
+                Produit.objects(categorie=categorie.id, est_actif=True,
+                                type_produit=Produit.TYPE_PARAPHARMACIE)
+            ))
+
+        non_couvertes = 0
+        for libelle, queryset in formes:
+            problemes, index = analyser_plan(queryset.explain())
+            if problemes:
+                non_couvertes += 1
+                self.stdout.write(self.style.WARNING(
+                    f"NON COUVERT  {libelle}: {', '.join(problemes)}"
+                    f" (index: {', '.join(index) or 'aucun'})"
+                ))
+            elif options['verbosity'] > 1:
+                self.stdout.write(f"OK           {libelle} (index: {', '.join(index)})")
+
+        resume = f"{len(formes) - non_couvertes}/{len(formes)} formes de requêtes couvertes par un index."
+        if non_couvertes:
+            if options['strict']:
+                raise CommandError(resume)
+            self.stdout.write(self.style.WARNING(resume))
+        else:
+            self.stdout.write(self.style.SUCCESS(resume))
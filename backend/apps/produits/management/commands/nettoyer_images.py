@@ -0,0 +1,73 @@
+"""
+Suppression des images que plus aucun produit ne référence.
+
+Usage: python manage.py nettoyer_images [--delai-heures 24] [--simulation]
+"""
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.produits.models import Produit, ImageProduit
+
+
+class Command(BaseCommand):
+    help = "Supprime les images (originaux et variantes) qu'aucun produit ne référence."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delai-heures', type=float, default=24,
+            help="Ne pas toucher aux images uploadées plus récemment (pas encore rattachées)."
+        )
+        parser.add_argument(
+            '--simulation', action='store_true',
+            help="Lister les images à supprimer sans rien supprimer."
+        )
+
+    @staticmethod
+    def chemins_references():
+        """Chemins des URLs référencées par au moins un produit (une requête distinct)."""
+        return {urlparse(url).path for url in Produit._get_collection().distinct('images')}
+
+    def handle(self, *args, **options):
+        # Chemins comparés sans le domaine, qui dépend de l'hôte d'upload
+        referencees = self.chemins_references()
+        limite = datetime.utcnow() - timedelta(hours=options['delai_heures'])
+
+        orphelines = [
+            image for image in ImageProduit.objects(date_dernier_upload__lt=limite)
+            .only('url', 'chemin', 'variantes.chemin').as_pymongo()
+            if urlparse(image['url']).path not in referencees
+        ]
+
+        # Relues juste avant de supprimer: une image rattachée à un produit
+        # depuis la première lecture est conservée
+        if not options['simulation']:
+            referencees = self.chemins_references()
+
+        supprimees = fichiers = 0
+        for image in orphelines:
+            chemins = {image['chemin']} | {
+                v['chemin'] for v in image.get('variantes', []) if v.get('chemin')
+            }
+            if options['simulation']:
+                self.stdout.write(f"{image['url']} ({len(chemins)} fichier(s))")
+                continue
+            if urlparse(image['url']).path in referencees:
+                continue
+            # Uploadée à nouveau entre-temps: conservée
+            if not ImageProduit.objects(id=image['_id'], date_dernier_upload__lt=limite).delete():
+                continue
+            supprimees += 1
+            for chemin in chemins:
+                if default_storage.exists(chemin):
+                    default_storage.delete(chemin)
+                    fichiers += 1
+
+        if options['simulation']:
+            self.stdout.write(f"{len(orphelines)} image(s) seraient supprimée(s).")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{supprimees} image(s) supprimée(s), {fichiers} fichier(s)."
+            ))
@@ -0,0 +1,38 @@
+"""
+Recalcul du chemin matérialisé (`ancetres`) de toutes les catégories.
+
+Usage: python manage.py reconstruire_chemins_categories
+
+À lancer une fois après l'ajout du champ, ou après des modifications de
+`parent` faites directement dans MongoDB sans passer par `Categorie.save()`.
+"""
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from apps.produits.arbre import ArbreCategories, NoeudCategorie
+from apps.produits.cache import invalider_categories
+from apps.produits.models import Categorie
+
+
+class Command(BaseCommand):
+    help = "Recalcule le chemin des ancêtres de toutes les catégories."
+
+    def handle(self, *args, **options):
+        noeuds = {
+            doc['_id']: NoeudCategorie(doc)
+            for doc in Categorie.objects.only('parent', 'ancetres').as_pymongo()
+        }
+        operations = []
+        for noeud in noeuds.values():
+            chemin = ArbreCategories._remonter(noeud, noeuds)
+            if chemin != noeud.ancetres:
+                operations.append(UpdateOne(
+                    {'_id': noeud.id}, {'$set': {'ancetres': chemin}}
+                ))
+
+        if operations:
+            Categorie._get_collection().bulk_write(operations, ordered=False)
+            invalider_categories()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(operations)}/{len(noeuds)} chemins de catégories mis à jour."
+        ))
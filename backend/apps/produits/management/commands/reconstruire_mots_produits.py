@@ -0,0 +1,34 @@
+"""
+Recalcul des mots normalisés du nom (`mots_nom`) de tous les produits.
+
+Usage: python manage.py reconstruire_mots_produits
+
+À lancer une fois après l'ajout du champ, ou après des modifications de
+`nom` faites directement dans MongoDB sans passer par `Produit.save()`.
+"""
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from apps.produits.cache import invalider_catalogue
+from apps.produits.index_recherche import tokeniser
+from apps.produits.models import Produit
+
+
+class Command(BaseCommand):
+    help = "Recalcule les mots normalisés du nom de tous les produits (recherche par préfixe)."
+
+    def handle(self, *args, **options):
+        operations = []
+        total = 0
+        for doc in Produit.objects.only('nom', 'mots_nom').as_pymongo():
+            total += 1
+            mots = sorted(set(tokeniser(doc.get('nom'))))
+            if mots != doc.get('mots_nom'):
+                operations.append(UpdateOne({'_id': doc['_id']}, {'$set': {'mots_nom': mots}}))
+
+        if operations:
+            Produit._get_collection().bulk_write(operations, ordered=False)
+            invalider_catalogue()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(operations)}/{total} produits mis à jour."
+        ))
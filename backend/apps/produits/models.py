@@ -1,12 +1,13 @@
 """
 Modèles MongoDB pour les produits et catégories.
-Collections: products, categories
+Collections: products, categories, product_images
 """
 from mongoengine import (
-    Document, StringField, FloatField, IntField,
-    BooleanField, DateTimeField, ReferenceField,
-    ListField, URLField
+    Document, EmbeddedDocument, StringField, FloatField, IntField,
+    BooleanField, DateTimeField, ReferenceField, EmbeddedDocumentListField,
+    ListField, URLField, ObjectIdField, ValidationError
 )
+from pymongo import UpdateOne
 from datetime import datetime
 
 
@@ -20,17 +21,77 @@ class Categorie(Document):
     description = StringField()
     image = URLField()  # URL de l'image de la catégorie
     parent = ReferenceField('self', null=True)  # Pour catégories imbriquées
+    # Chemin matérialisé: ids des ancêtres, de la racine au parent direct
+    ancetres = ListField(ObjectIdField(), default=list)
     est_active = BooleanField(default=True)
     date_creation = DateTimeField(default=datetime.utcnow)
 
     meta = {
         'collection': 'Categorie',
-        'indexes': ['slug', 'est_active']
+        'indexes': ['slug', 'est_active', 'ancetres']
     }
 
     def __str__(self):
         return self.nom
 
+    @property
+    def parent_id(self):
+        """ObjectId du parent, sans déréférencer la référence."""
+        from .resolvers import reference_id
+        return reference_id(self, 'parent')
+
+    def calculer_ancetres(self):
+        """Chemin des ancêtres déduit de celui du parent."""
+        parent_id = self.parent_id
+        if parent_id is None:
+            return []
+        parent = Categorie.objects(id=parent_id).only('ancetres').first()
+        chemin = list(parent.ancetres or []) if parent else []
+        chemin.append(parent_id)
+        if self.id is not None and self.id in chemin:
+            raise ValidationError('Une catégorie ne peut pas être son propre ancêtre.')
+        return chemin
+
+    def save(self, *args, **kwargs):
+        """
+        Sauvegarder en tenant à jour le chemin des ancêtres (et celui des
+        descendants si la catégorie change de parent), puis invalider
+        l'arbre et le cache du catalogue.
+        """
+        from .arbre import arbre
+        from .cache import invalider_categories
+        ancien_chemin = list(self.ancetres or [])
+        self.ancetres = self.calculer_ancetres()
+        deplacee = self.id is not None and ancien_chemin != self.ancetres
+        resultat = super(Categorie, self).save(*args, **kwargs)
+        if deplacee:
+            self._deplacer_descendants()
+        arbre.invalider()
+        invalider_categories()
+        return resultat
+
+    def _deplacer_descendants(self):
+        """Réécrire le chemin des descendants après un changement de parent."""
+        prefixe = list(self.ancetres)
+        operations = []
+        for doc in Categorie.objects(ancetres=self.id).only('ancetres').as_pymongo():
+            chemin = doc['ancetres']
+            suffixe = chemin[chemin.index(self.id):]
+            operations.append(UpdateOne(
+                {'_id': doc['_id']}, {'$set': {'ancetres': prefixe + suffixe}}
+            ))
+        if operations:
+            Categorie._get_collection().bulk_write(operations, ordered=False)
+
+    def delete(self, *args, **kwargs):
+        """Supprimer et invalider l'arbre et le cache du catalogue."""
+        from .arbre import arbre
+        from .cache import invalider_categories
+        resultat = super(Categorie, self).delete(*args, **kwargs)
+        arbre.invalider()
+        invalider_categories()
+        return resultat
+
 
 class Produit(Document):
     """
@@ -61,6 +122,9 @@ class Produit(Document):
     categorie = ReferenceField(Categorie, required=True)
     vendeur_id = StringField(required=True)  # ID du vendeur (User)
 
+    # Mots du nom, minuscules sans accents (recherche par préfixe)
+    mots_nom = ListField(StringField())
+
     # Images
     images = ListField(URLField())  # Liste des URLs d'images
 
@@ -82,9 +146,31 @@ class Produit(Document):
             'slug',
             'type_produit',
             'categorie',
-            'vendeur_id',
-            'est_actif',
-            'date_creation'
+            'date_creation',
+            'date_modification',
+            # Index composés alignés sur les requêtes de liste_produits:
+            # égalité (est_actif + filtre) puis tri, `_id` départage les
+            # ex aequo de la pagination par curseur.
+            ('est_actif', 'date_creation', 'id'),
+            ('est_actif', 'prix', 'id'),
+            ('est_actif', 'nom', 'id'),
+            ('est_actif', 'type_produit', 'date_creation', 'id'),
+            ('est_actif', 'type_produit', 'prix', 'id'),
+            ('est_actif', 'categorie', 'date_creation', 'id'),
+            ('est_actif', 'categorie', 'prix', 'id'),
+            ('est_actif', 'categorie', 'type_produit'),
+            # Produits d'un vendeur (mes_produits, filtre vendeur_id)
+            ('vendeur_id', 'date_creation'),
+            ('est_actif', 'vendeur_id', 'date_creation', 'id'),
+            # Recherche par préfixe d'un mot du nom (regex ancrée, sensible à la casse)
+            ('est_actif', 'mots_nom'),
+            # Index texte pour la recherche (français, accents ignorés)
+            {
+                'fields': ['$nom', '$description'],
+                'default_language': 'french',
+                'weights': {'nom': 10, 'description': 2},
+                'name': 'recherche_texte',
+            },
         ]
     }
 
@@ -92,10 +178,78 @@ class Produit(Document):
         return self.nom
 
     def save(self, *args, **kwargs):
-        """Mettre à jour la date de modification."""
+        """Mettre à jour la date de modification et invalider le cache."""
+        from .cache import invalider_catalogue
+        from .index_recherche import tokeniser
         self.date_modification = datetime.utcnow()
-        return super(Produit, self).save(*args, **kwargs)
+        self.mots_nom = sorted(set(tokeniser(self.nom)))
+        resultat = super(Produit, self).save(*args, **kwargs)
+        invalider_catalogue()
+        return resultat
+
+    def delete(self, *args, **kwargs):
+        """Supprimer et invalider le cache du catalogue."""
+        from .cache import invalider_catalogue
+        resultat = super(Produit, self).delete(*args, **kwargs)
+        invalider_catalogue()
+        return resultat
 
     def est_disponible(self):
         """Vérifier si le produit est disponible."""
         return self.est_actif and self.stock > 0
+
+
+class VarianteImage(EmbeddedDocument):
+    """
+    Version redimensionnée d'une image (embedded).
+    """
+    taille = StringField(required=True)  # miniature, moyenne, grande
+    format = StringField(required=True)  # webp, avif
+    chemin = StringField()  # Nom du fichier dans le stockage
+    url = StringField(required=True)
+    largeur = IntField(required=True)
+    hauteur = IntField(required=True)
+
+
+class ImageProduit(Document):
+    """
+    Image uploadée par un vendeur et ses variantes redimensionnées,
+    générées en tâche de fond.
+    Collection: product_images
+    """
+    STATUT_EN_ATTENTE = 'en_attente'
+    STATUT_PRETE = 'prete'
+    STATUT_ECHOUEE = 'echouee'
+
+    STATUT_CHOICES = [
+        (STATUT_EN_ATTENTE, 'En attente'),
+        (STATUT_PRETE, 'Prête'),
+        (STATUT_ECHOUEE, 'Échouée'),
+    ]
+
+    vendeur_id = StringField(required=True)  # Premier vendeur à l'avoir uploadée
+    empreinte = StringField()  # SHA-256 du contenu (nom du fichier dans le stockage)
+    chemin = StringField(required=True)  # Nom du fichier original dans le stockage
+    url = StringField(required=True, unique=True)  # URL de l'original (Produit.images)
+    largeur = IntField()
+    hauteur = IntField()
+
+    variantes = EmbeddedDocumentListField(VarianteImage)
+    statut = StringField(choices=STATUT_CHOICES, default=STATUT_EN_ATTENTE)
+    erreur = StringField()
+
+    date_creation = DateTimeField(default=datetime.utcnow)
+    # Dernier upload de ce contenu: protège du nettoyage une image pas
+    # encore rattachée à un produit
+    date_dernier_upload = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'product_images',
+        'indexes': [
+            'vendeur_id',
+            {'fields': ['empreinte'], 'unique': True, 'sparse': True},
+        ]
+    }
+
+    def __str__(self):
+        return f"Image {self.chemin} ({self.statut})"
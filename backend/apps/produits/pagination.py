@@ -0,0 +1,213 @@
+"""
+Pagination adaptée aux QuerySets MongoEngine.
+
+La pagination DRF standard travaille sur une liste Python : il faut donc
+matérialiser tout le QuerySet avant de découper une page. Ici la page est
+récupérée directement dans MongoDB avec skip/limit et le nombre total de
+documents est obtenu par un count mis en cache.
+
+Pour le défilement infini, la pagination par curseur (keyset) évite même
+le skip : chaque page reprend après la dernière clé de tri vue.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from bson import ObjectId
+from django.core.cache import cache
+from mongoengine.fields import DateTimeField, FloatField, IntField, StringField
+from mongoengine.queryset.visitor import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cache import generation_catalogue
+
+
+class MongoPagination(PageNumberPagination):
+    """
+    Pagination par numéro de page exécutée côté MongoDB.
+
+    Le coût d'une page est O(page_size) : seuls les documents de la page
+    sont hydratés. Le total (`count`) est mis en cache jusqu'à la prochaine
+    écriture du catalogue, clé calculée à partir du filtre MongoDB.
+    """
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_cache_timeout = 300  # secondes, invalidé à chaque écriture
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.count = self.get_count(queryset)
+        self.num_pages = max(1, -(-self.count // page_size))
+
+        page_number = request.query_params.get(self.page_query_param, 1)
+        if page_number in self.last_page_strings:
+            page_number = self.num_pages
+        try:
+            page_number = int(page_number)
+        except (TypeError, ValueError):
+            raise NotFound('Page invalide.')
+        if page_number < 1 or page_number > self.num_pages:
+            raise NotFound('Page invalide.')
+        self.page_number = page_number
+
+        offset = (page_number - 1) * page_size
+        return list(queryset.skip(offset).limit(page_size))
+
+    def get_count(self, queryset):
+        """Nombre total de documents du QuerySet (mis en cache)."""
+        cle = self.get_count_cache_key(queryset)
+        count = cache.get(cle)
+        if count is None:
+            count = queryset.count()
+            cache.set(cle, count, self.count_cache_timeout)
+        return count
+
+    def get_count_cache_key(self, queryset):
+        """Clé dérivée de la collection, du filtre et de la génération."""
+        filtre = json.dumps(queryset._query, sort_keys=True, default=str)
+        empreinte = hashlib.md5(
+            f"{queryset._document._get_collection_name()}:{filtre}".encode('utf-8')
+        ).hexdigest()
+        return f"catalogue:{generation_catalogue()}:count:{empreinte}"
+
+    def get_next_link(self):
+        if self.page_number >= self.num_pages:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class MongoCursorPagination(BasePagination):
+    """
+    Pagination par curseur (keyset) exécutée côté MongoDB.
+
+    Le curseur est opaque pour le client : il encode la valeur du champ de
+    tri et l'`_id` du dernier document de la page. La page suivante est
+    obtenue par un filtre `(tri, _id) > curseur` qui utilise l'index de tri,
+    son coût est donc constant quelle que soit la profondeur.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def __init__(self, ordering='-date_creation'):
+        self.ordering = ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        champ = self.ordering.lstrip('-')
+        signe = '-' if self.ordering.startswith('-') else ''
+        operateur = 'lt' if signe else 'gt'
+        queryset = queryset.order_by(f'{signe}{champ}', f'{signe}id')
+
+        position = self.decode_cursor(request, queryset._document._fields[champ])
+        if position is not None:
+            valeur, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{champ}__{operateur}': valeur}) |
+                Q(**{champ: valeur, f'id__{operateur}': pk})
+            )
+
+        # Un document de plus pour savoir s'il existe une page suivante
+        resultats = list(queryset.limit(page_size + 1))
+        page = resultats[:page_size]
+
+        self.next_position = None
+        if len(resultats) > page_size:
+            dernier = page[-1]
+            self.next_position = (getattr(dernier, champ), dernier.id)
+        return page
+
+    def decode_cursor(self, request, champ):
+        """
+        Décoder le curseur de la requête en (valeur de tri, ObjectId). La
+        valeur doit avoir le type du champ de tri `champ` : le curseur vient
+        du client, un dict y glisserait des opérateurs MongoDB dans le filtre.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            brut = base64.urlsafe_b64decode(encoded.encode('ascii'))
+            contenu = json.loads(brut.decode('utf-8'))
+            valeur = self.valeur_de_tri(contenu['v'], champ)
+            pk = contenu['id']
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound('Curseur invalide.')
+        if not isinstance(pk, str) or not ObjectId.is_valid(pk):
+            raise NotFound('Curseur invalide.')
+        return valeur, ObjectId(pk)
+
+    @staticmethod
+    def valeur_de_tri(valeur, champ):
+        """Valeur du curseur convertie au type de `champ` (ValueError sinon)."""
+        if isinstance(champ, DateTimeField) and isinstance(valeur, str):
+            return datetime.fromisoformat(valeur)
+        if isinstance(champ, StringField) and isinstance(valeur, str):
+            return valeur
+        if (isinstance(champ, (IntField, FloatField))
+                and isinstance(valeur, (int, float)) and not isinstance(valeur, bool)):
+            return valeur
+        raise ValueError(f'Valeur de curseur invalide pour {champ.name}')
+
+    def encode_cursor(self, position):
+        """Encoder (valeur de tri, ObjectId) en curseur opaque."""
+        valeur, pk = position
+        contenu = {'v': valeur, 'id': str(pk)}
+        if isinstance(valeur, datetime):
+            contenu = {'v': valeur.isoformat(), 't': 'date', 'id': str(pk)}
+        brut = json.dumps(contenu, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(brut).decode('ascii')
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,81 @@
+"""
+Recherche de produits dans MongoDB.
+
+La recherche principale utilise l'index texte de `Produit` (langue
+française : racinisation, mots vides, accents ignorés par les index texte
+v3) et permet un tri par pertinence. L'index texte ne trouve que des mots
+entiers : le dernier mot, souvent en cours de frappe (« hydra »), est donc
+cherché par préfixe sur `mots_nom` (mots du nom normalisés), avec une
+expression régulière ancrée et sensible à la casse qui donne des bornes
+d'index serrées. Une saisie d'un seul mot que l'index texte ne trouve pas
+est aussi cherchée par préfixe. La saisie utilisateur est toujours
+échappée avant d'être utilisée dans une expression régulière.
+"""
+import re
+
+from .index_recherche import normaliser
+
+# En dessous de cette longueur, la saisie est toujours un début de mot :
+# on bascule sur la recherche par préfixe.
+LONGUEUR_MIN_TEXTE = 3
+LONGUEUR_MAX_RECHERCHE = 100
+
+MODE_TEXTE = 'texte'
+MODE_PREFIXE = 'prefixe'
+
+
+def normaliser_recherche(search):
+    """Nettoyer la saisie: espaces superflus et longueur bornée."""
+    return ' '.join(search.split())[:LONGUEUR_MAX_RECHERCHE]
+
+
+def mode_recherche(search, mode=None):
+    """Choisir le mode de recherche adapté à la saisie."""
+    if mode in (MODE_TEXTE, MODE_PREFIXE):
+        return mode
+    if len(search) < LONGUEUR_MIN_TEXTE:
+        return MODE_PREFIXE
+    return MODE_TEXTE
+
+
+def mots_recherche(search):
+    """Mots de la saisie, normalisés comme `Produit.mots_nom`."""
+    return re.findall(r'[a-z0-9]+', normaliser(search))
+
+
+def filtre_prefixe(mots):
+    """Chaque mot doit commencer un mot du nom (regex ancrées sur `mots_nom`)."""
+    return {'$and': [{'mots_nom': {'$regex': '^' + re.escape(mot)}} for mot in mots]}
+
+
+def filtrer_recherche(queryset, search, mode=None):
+    """
+    Appliquer la recherche au QuerySet.
+
+    Retourne le QuerySet filtré et le mode utilisé ; seul le mode texte
+    permet le tri par pertinence (`$text_score`).
+    """
+    search = normaliser_recherche(search)
+    mots = mots_recherche(search)
+    if not search or not mots:
+        return queryset, None
+
+    mode_force = mode in (MODE_TEXTE, MODE_PREFIXE)
+    mode = mode_recherche(search, mode)
+    if mode == MODE_PREFIXE:
+        return queryset.filter(__raw__=filtre_prefixe(mots)), MODE_PREFIXE
+
+    if mode_force:
+        return queryset.search_text(search, language='french'), MODE_TEXTE
+
+    if len(mots) > 1:
+        # Mots complets par l'index texte, dernier mot (partiel) par préfixe
+        complets = ' '.join(mots[:-1])
+        return queryset.search_text(complets, language='french').filter(
+            __raw__=filtre_prefixe(mots[-1:])
+        ), MODE_TEXTE
+
+    texte = queryset.search_text(search, language='french')
+    if texte.only('id').first() is not None:
+        return texte, MODE_TEXTE
+    return queryset.filter(__raw__=filtre_prefixe(mots)), MODE_PREFIXE
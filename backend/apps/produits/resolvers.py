@@ -0,0 +1,109 @@
+"""
+Résolution groupée des références des produits.
+
+Les serializers ne doivent pas déréférencer `Produit.categorie` ni charger
+le vendeur ligne par ligne (une requête MongoDB par produit). Les catégories
+sont servies par l'arbre en mémoire (`arbre.py`) ; les autres résolveurs
+chargent toutes les références d'une page avec une seule requête `$in`
+projetée et gardent le résultat dans un cache mémoire local au processus.
+"""
+from bson import ObjectId
+
+from apps.core.cache import TTLCache
+
+
+def reference_id(document, champ):
+    """
+    Retourner l'ObjectId d'un ReferenceField sans le déréférencer.
+
+    MongoEngine déréférence la référence à l'accès de l'attribut ; la valeur
+    brute (DBRef ou Document déjà chargé) est lue dans `_data`.
+    """
+    reference = document._data.get(champ)
+    if reference is None:
+        return None
+    return getattr(reference, 'id', reference)
+
+
+class Resolver:
+    """
+    Résolveur générique id -> données, avec préchargement par lot.
+
+    Les sous-classes implémentent `charger(ids)` qui retourne un dict
+    {id: valeur} en une seule requête. Les ids introuvables sont aussi mis
+    en cache pour ne pas être redemandés à chaque page.
+    """
+    ttl = 300
+    maxsize = 2048
+
+    def __init__(self):
+        self._cache = TTLCache(self.ttl, self.maxsize)
+
+    def charger(self, ids):
+        raise NotImplementedError
+
+    def cle_valide(self, id_):
+        return ObjectId.is_valid(id_)
+
+    def prefetch(self, ids):
+        """Charger en une requête toutes les valeurs absentes du cache."""
+        ids = {str(i) for i in ids if i}
+        manquants = ids - set(self._cache.get_many(ids))
+        if manquants:
+            valides = [i for i in manquants if self.cle_valide(i)]
+            valeurs = self.charger(valides) if valides else {}
+            self._cache.set_many({i: valeurs.get(i) for i in manquants})
+
+    def get(self, id_):
+        """Retourner la valeur pour un id (une requête au plus si absent)."""
+        if not id_:
+            return None
+        id_ = str(id_)
+        if id_ not in self._cache:
+            self.prefetch([id_])
+        return self._cache.get(id_)
+
+    def invalider(self, id_=None):
+        """Oublier une entrée, ou tout le cache si `id_` est None."""
+        if id_ is None:
+            self._cache.clear()
+        else:
+            self._cache.delete(str(id_))
+
+
+class VendeurResolver(Resolver):
+    """Profil public des vendeurs par id (projection prénom/nom)."""
+    ttl = 120
+
+    def charger(self, ids):
+        from apps.authentication.models import User
+        return {
+            str(doc['_id']): {
+                'id': str(doc['_id']),
+                'nom_complet': f"{doc.get('prenom', '')} {doc.get('nom', '')}".strip(),
+            }
+            for doc in User.objects(id__in=ids).only('prenom', 'nom').as_pymongo()
+        }
+
+
+vendeurs = VendeurResolver()
+
+
+class ImageResolver(Resolver):
+    """Variantes redimensionnées des images par URL de l'original."""
+    ttl = 60  # Les variantes apparaissent quand le worker a fini
+
+    def cle_valide(self, url):
+        return True
+
+    def charger(self, urls):
+        from .models import ImageProduit
+        return {
+            doc['url']: doc
+            for doc in ImageProduit.objects(
+                url__in=urls, statut=ImageProduit.STATUT_PRETE
+            ).only('url', 'largeur', 'hauteur', 'variantes').as_pymongo()
+        }
+
+
+images = ImageResolver()
@@ -4,11 +4,15 @@ Utilise les serializers standards DRF (compatible toutes versions Python).
 """
 from rest_framework import serializers
 from .models import Produit, Categorie
+from .arbre import arbre
+from .images import image_responsive
+from .resolvers import vendeurs, images, reference_id
 
 
 class CategorieSerializer(serializers.Serializer):
     """
-    Serializer pour les catégories.
+    Serializer pour les catégories (Document ou noeud de l'arbre en mémoire).
+    Parent et sous-catégories sont lus dans l'arbre, sans requête.
     """
     id = serializers.SerializerMethodField()
     nom = serializers.CharField(max_length=100)
@@ -25,15 +29,38 @@ class CategorieSerializer(serializers.Serializer):
         return str(obj.id)
 
     def get_parent(self, obj):
-        return str(obj.parent.id) if obj.parent else None
+        return str(obj.parent_id) if obj.parent_id else None
 
     def get_parent_nom(self, obj):
         """Retourne le nom de la catégorie parente."""
-        return obj.parent.nom if obj.parent else None
+        parent = arbre.noeud(obj.parent_id)
+        return parent.nom if parent else None
 
     def get_sous_categories_count(self, obj):
         """Retourne le nombre de sous-catégories."""
-        return Categorie.objects(parent=obj).count()
+        return arbre.nombre_sous_categories(obj.id)
+
+
+class CategorieArbreSerializer(CategorieSerializer):
+    """
+    Catégorie avec ses sous-catégories actives imbriquées (arbre complet).
+    """
+    sous_categories = serializers.SerializerMethodField()
+
+    def get_sous_categories(self, obj):
+        return CategorieArbreSerializer(arbre.enfants(obj.id), many=True).data
+
+
+class ProduitListeSerializer(serializers.ListSerializer):
+    """
+    Serializer de liste qui précharge les variantes des images principales
+    de tous les produits en une seule requête.
+    """
+
+    def to_representation(self, data):
+        produits = list(data)
+        images.prefetch(p.images[0] for p in produits if p.images)
+        return super().to_representation(produits)
 
 
 class ProduitListSerializer(serializers.Serializer):
@@ -58,25 +85,47 @@ class ProduitListSerializer(serializers.Serializer):
     date_creation = serializers.DateTimeField()
     date_modification = serializers.DateTimeField()
 
+    class Meta:
+        list_serializer_class = ProduitListeSerializer
+
     def get_id(self, obj):
         return str(obj.id)
 
     def get_categorie(self, obj):
-        return str(obj.categorie.id) if obj.categorie else None
+        categorie_id = reference_id(obj, 'categorie')
+        return str(categorie_id) if categorie_id else None
 
     def get_categorie_nom(self, obj):
-        """Retourne le nom de la catégorie."""
-        return obj.categorie.nom if obj.categorie else None
+        """Retourne le nom de la catégorie (arbre en mémoire)."""
+        categorie = arbre.noeud(reference_id(obj, 'categorie'))
+        return categorie.nom if categorie else None
 
     def get_image_principale(self, obj):
-        """Retourne la première image ou None."""
-        return obj.images[0] if obj.images else None
+        """
+        Première image: miniature et `sources` (srcset par format) pour un
+        élément <picture>, ou None.
+        """
+        if not obj.images:
+            return None
+        return image_responsive(obj.images[0], images.get(obj.images[0]))
 
     def get_est_disponible(self, obj):
         """Retourne si le produit est disponible."""
         return obj.est_disponible()
 
 
+class ProduitDetailListeSerializer(serializers.ListSerializer):
+    """
+    Serializer de liste qui précharge les vendeurs de tous les produits
+    en une seule requête avant de sérialiser chaque produit.
+    """
+
+    def to_representation(self, data):
+        produits = list(data)
+        vendeurs.prefetch(p.vendeur_id for p in produits)
+        return super().to_representation(produits)
+
+
 class ProduitDetailSerializer(serializers.Serializer):
     """
     Serializer pour le détail d'un produit (version complète).
@@ -101,26 +150,27 @@ class ProduitDetailSerializer(serializers.Serializer):
     date_creation = serializers.DateTimeField()
     date_modification = serializers.DateTimeField()
 
+    class Meta:
+        list_serializer_class = ProduitDetailListeSerializer
+
     def get_id(self, obj):
         return str(obj.id)
 
     def get_categorie(self, obj):
-        return str(obj.categorie.id) if obj.categorie else None
+        categorie_id = reference_id(obj, 'categorie')
+        return str(categorie_id) if categorie_id else None
 
     def get_categorie_info(self, obj):
         """Retourne les infos complètes de la catégorie."""
-        if obj.categorie:
-            return CategorieSerializer(obj.categorie).data
+        categorie = arbre.noeud(reference_id(obj, 'categorie'))
+        if categorie:
+            return CategorieSerializer(categorie).data
         return None
 
     def get_vendeur_nom(self, obj):
-        """Retourne le nom du vendeur."""
-        from apps.authentication.models import User
-        try:
-            vendeur = User.objects.get(id=obj.vendeur_id)
-            return f"{vendeur.prenom} {vendeur.nom}"
-        except User.DoesNotExist:
-            return "Vendeur inconnu"
+        """Retourne le nom du vendeur (via le cache des vendeurs)."""
+        vendeur = vendeurs.get(obj.vendeur_id)
+        return vendeur['nom_complet'] if vendeur else "Vendeur inconnu"
 
     def get_est_disponible(self, obj):
         """Retourne si le produit est disponible."""
@@ -0,0 +1,11 @@
+"""
+Tâches de fond des produits.
+"""
+from apps.taches.file import tache
+
+from . import images
+
+
+@tache('produits.generer_variantes', tentatives_max=3)
+def generer_variantes(image_id):
+    images.generer_variantes(image_id)
@@ -11,6 +11,7 @@ urlpatterns = [
 
     # Liste et recherche
     path('', views.liste_produits, name='liste'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
 
     # Gestion vendeur
     path('creer/', views.creer_produit, name='creer'),
@@ -20,6 +21,7 @@ urlpatterns = [
     # ========== CATÉGORIES ==========
 
     path('categories/', views.liste_categories, name='categories'),
+    path('categories/arbre/', views.arbre_categories, name='arbre_categories'),
     path('categories/<str:slug>/', views.detail_categorie, name='detail_categorie'),
     path('categories/<str:categorie_id>/sous-categories/', views.sous_categories, name='sous_categories'),
 
@@ -5,111 +5,92 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from django.utils.text import slugify
-from .models import Produit, Categorie
+from .models import Produit
+from .index_recherche import index_produits
+from .pagination import MongoPagination, MongoCursorPagination
+from .arbre import arbre
+from .cache import cache_catalogue
+from .filtres import filtrer_produits, FiltreInvalide
+from .images import enregistrer_upload, EmpreinteUpload, ImageInvalide
+from .recherche import MODE_TEXTE
+from .resolvers import reference_id
 from .serializers import (
     ProduitListSerializer, ProduitDetailSerializer,
-    ProduitCreateUpdateSerializer, CategorieSerializer
+    ProduitCreateUpdateSerializer, CategorieSerializer, CategorieArbreSerializer
 )
 
 
-class ProduitPagination(PageNumberPagination):
-    """Pagination pour les produits."""
+class ProduitPagination(MongoPagination):
+    """Pagination pour les produits (skip/limit côté MongoDB)."""
     page_size = 12
     page_size_query_param = 'page_size'
     max_page_size = 100
 
 
+class ProduitCursorPagination(MongoCursorPagination):
+    """Pagination par curseur pour le défilement infini du catalogue."""
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+# Tris autorisés pour la liste des produits
+ORDERINGS_PRODUITS = ('nom', 'prix', '-prix', 'date_creation', '-date_creation')
+
+
 # ============================================================================
 # PRODUITS - LISTE ET DÉTAIL
 # ============================================================================
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_catalogue
 def liste_produits(request):
     """
     Liste des produits avec filtres et recherche.
 
     Query params:
-    - search: recherche dans nom et description
+    - search: recherche plein texte dans nom et description
+    - search_mode: forcer 'texte' ou 'prefixe' (choisi automatiquement sinon)
     - type: filtrer par type (parapharmacie, pharmacie, medical)
-    - categorie: filtrer par ID de catégorie
+    - categorie: filtrer par ID de catégorie (sous-catégories incluses)
     - min_prix: prix minimum
     - max_prix: prix maximum
     - disponible_location: filtrer produits disponibles en location (true/false)
     - est_en_vedette: filtrer produits en vedette (true/false)
     - vendeur_id: filtrer par vendeur
-    - ordering: trier par (nom, prix, -prix, date_creation, -date_creation)
+    - ordering: trier par (nom, prix, -prix, date_creation, -date_creation,
+      score = pertinence de la recherche plein texte)
+    - pagination: 'cursor' pour la pagination par curseur (défilement infini)
+    - cursor: curseur opaque renvoyé dans `next` (implique pagination=cursor)
     """
-    # Base query: seulement produits actifs
-    queryset = Produit.objects(est_actif=True)
-
-    # Filtres
-    search = request.query_params.get('search', '').strip()
-    if search:
-        queryset = queryset.filter(
-            __raw__={
-                '$or': [
-                    {'nom': {'$regex': search, '$options': 'i'}},
-                    {'description': {'$regex': search, '$options': 'i'}}
-                ]
-            }
-        )
-
-    type_produit = request.query_params.get('type')
-    if type_produit:
-        queryset = queryset.filter(type_produit=type_produit)
-
-    categorie_id = request.query_params.get('categorie')
-    if categorie_id:
-        try:
-            queryset = queryset.filter(categorie=categorie_id)
-        except:
-            pass
-
-    min_prix = request.query_params.get('min_prix')
-    if min_prix:
-        try:
-            queryset = queryset.filter(prix__gte=float(min_prix))
-        except ValueError:
-            pass
-
-    max_prix = request.query_params.get('max_prix')
-    if max_prix:
-        try:
-            queryset = queryset.filter(prix__lte=float(max_prix))
-        except ValueError:
-            pass
-
-    disponible_location = request.query_params.get('disponible_location')
-    if disponible_location and disponible_location.lower() == 'true':
-        queryset = queryset.filter(disponible_location=True)
-
-    est_en_vedette = request.query_params.get('est_en_vedette')
-    if est_en_vedette and est_en_vedette.lower() == 'true':
-        queryset = queryset.filter(est_en_vedette=True)
-
-    vendeur_id = request.query_params.get('vendeur_id')
-    if vendeur_id:
-        queryset = queryset.filter(vendeur_id=vendeur_id)
+    try:
+        queryset, mode_recherche = filtrer_produits(request.query_params)
+    except FiltreInvalide as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Tri
+    # Tri ('-date_creation' par défaut)
     ordering = request.query_params.get('ordering', '-date_creation')
-    if ordering == 'nom':
-        queryset = queryset.order_by('nom')
-    elif ordering == 'prix':
-        queryset = queryset.order_by('prix')
-    elif ordering == '-prix':
-        queryset = queryset.order_by('-prix')
-    elif ordering == 'date_creation':
-        queryset = queryset.order_by('date_creation')
-    else:  # '-date_creation' par défaut
-        queryset = queryset.order_by('-date_creation')
+    tri_pertinence = ordering == 'score' and mode_recherche == MODE_TEXTE
+    if ordering not in ORDERINGS_PRODUITS:
+        ordering = '-date_creation'
+
+    # Pagination par curseur: le tri est appliqué par le paginator
+    # (le tri par pertinence n'a pas de clé stable, il reste paginé par page)
+    if not tri_pertinence and (
+            request.query_params.get('pagination') == 'cursor'
+            or 'cursor' in request.query_params):
+        paginator = ProduitCursorPagination(ordering=ordering)
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = ProduitListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    queryset = queryset.order_by('$text_score' if tri_pertinence else ordering)
 
     # Pagination
     paginator = ProduitPagination()
-    page = paginator.paginate_queryset(list(queryset), request)
+    page = paginator.paginate_queryset(queryset, request)
 
     if page is not None:
         serializer = ProduitListSerializer(page, many=True)
@@ -121,6 +102,49 @@ def liste_produits(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+def autocomplete(request):
+    """
+    Suggestions de produits pour l'autocomplétion (index en mémoire).
+
+    Query params:
+    - q: texte saisi (le dernier mot peut être incomplet, fautes tolérées)
+    - type, categorie, min_prix, max_prix: mêmes filtres que la liste
+    - limit: nombre de suggestions (défaut 10, max 50)
+    """
+    q = request.query_params.get('q', '').strip()
+    if not q:
+        return Response([])
+
+    def nombre(valeur):
+        try:
+            return float(valeur) if valeur else None
+        except ValueError:
+            return None
+
+    try:
+        limite = min(int(request.query_params.get('limit', 10)), 50)
+    except ValueError:
+        limite = 10
+
+    categorie_id = request.query_params.get('categorie')
+    index_produits.construire_si_necessaire()
+    resultats = index_produits.rechercher(
+        q,
+        type_produit=request.query_params.get('type'),
+        categories=(
+            {str(i) for i in arbre.ids_sous_arbre(categorie_id)}
+            if categorie_id else None
+        ),
+        min_prix=nombre(request.query_params.get('min_prix')),
+        max_prix=nombre(request.query_params.get('max_prix')),
+        limite=max(limite, 1),
+    )
+    return Response(resultats)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@cache_catalogue
 def detail_produit(request, slug):
     """Détail d'un produit par slug."""
     try:
@@ -152,7 +176,7 @@ def produits_similaires(request, produit_id):
 
     # Produits de la même catégorie et type, sauf le produit actuel
     produits_similaires = Produit.objects(
-        categorie=produit.categorie,
+        categorie=reference_id(produit, 'categorie'),
         type_produit=produit.type_produit,
         est_actif=True,
         id__ne=produit.id
@@ -190,6 +214,7 @@ def creer_produit(request):
     serializer = ProduitCreateUpdateSerializer(data=data)
     if serializer.is_valid():
         produit = serializer.save()
+        index_produits.indexer(produit)
         # Retourner le détail complet
         detail_serializer = ProduitDetailSerializer(produit)
         return Response(detail_serializer.data, status=status.HTTP_201_CREATED)
@@ -226,6 +251,7 @@ def modifier_produit(request, produit_id):
     )
     if serializer.is_valid():
         produit = serializer.save()
+        index_produits.indexer(produit)
         detail_serializer = ProduitDetailSerializer(produit)
         return Response(detail_serializer.data)
 
@@ -257,6 +283,7 @@ def supprimer_produit(request, produit_id):
     # Soft delete
     produit.est_actif = False
     produit.save()
+    index_produits.retirer(produit.id)
 
     return Response(
         {'message': 'Produit supprimé avec succès'},
@@ -280,7 +307,7 @@ def mes_produits(request):
 
     # Pagination
     paginator = ProduitPagination()
-    page = paginator.paginate_queryset(list(produits), request)
+    page = paginator.paginate_queryset(produits, request)
 
     if page is not None:
         serializer = ProduitListSerializer(page, many=True)
@@ -296,22 +323,33 @@ def mes_produits(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_catalogue
 def liste_categories(request):
     """
     Liste toutes les catégories actives.
     """
-    categories = Categorie.objects(est_active=True).order_by('nom')
-    serializer = CategorieSerializer(categories, many=True)
+    serializer = CategorieSerializer(arbre.categories(), many=True)
     return Response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_catalogue
+def arbre_categories(request):
+    """
+    Arbre complet des catégories actives (racines et sous-catégories imbriquées).
+    """
+    serializer = CategorieArbreSerializer(arbre.racines(), many=True)
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@cache_catalogue
 def detail_categorie(request, slug):
     """Détail d'une catégorie par slug."""
-    try:
-        categorie = Categorie.objects.get(slug=slug, est_active=True)
-    except Categorie.DoesNotExist:
+    categorie = arbre.par_slug(slug)
+    if categorie is None or not categorie.est_active:
         return Response(
             {'error': 'Catégorie non trouvée'},
             status=status.HTTP_404_NOT_FOUND
@@ -323,20 +361,18 @@ def detail_categorie(request, slug):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_catalogue
 def sous_categories(request, categorie_id):
     """
     Retourne les sous-catégories d'une catégorie parente.
     """
-    try:
-        categorie_parent = Categorie.objects.get(id=categorie_id)
-    except Categorie.DoesNotExist:
+    if arbre.noeud(categorie_id) is None:
         return Response(
             {'error': 'Catégorie non trouvée'},
             status=status.HTTP_404_NOT_FOUND
         )
 
-    sous_cats = Categorie.objects(parent=categorie_parent, est_active=True).order_by('nom')
-    serializer = CategorieSerializer(sous_cats, many=True)
+    serializer = CategorieSerializer(arbre.enfants(categorie_id), many=True)
     return Response(serializer.data)
 
 
@@ -349,10 +385,12 @@ def sous_categories(request, categorie_id):
 def upload_image(request):
     """
     Upload une image pour un produit.
-    Retourne l'URL de l'image uploadée.
+    Retourne l'URL de l'image uploadée; ses variantes redimensionnées
+    (WebP/AVIF) sont générées en tâche de fond. Une image au contenu déjà
+    connu n'est pas stockée à nouveau: son URL existante est retournée.
 
     Request: multipart/form-data avec file dans 'image'
-    Response: { "url": "http://..." }
+    Response: { "url": "http://...", "image_id": "..." }
     """
     if request.user.role != 'vendeur':
         return Response(
@@ -360,6 +398,10 @@ def upload_image(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
+    # Empreinte du contenu calculée pendant la réception du fichier
+    empreinte = EmpreinteUpload(request)
+    request.upload_handlers.insert(0, empreinte)
+
     # Vérifier qu'un fichier image est présent
     if 'image' not in request.FILES:
         return Response(
@@ -367,47 +409,23 @@ def upload_image(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    image_file = request.FILES['image']
-
-    # Vérifier le type de fichier
-    allowed_types = ['image/jpeg', 'image/png', 'image/jpg', 'image/webp']
-    if image_file.content_type not in allowed_types:
-        return Response(
-            {'error': 'Type de fichier non autorisé. Utilisez JPEG, PNG ou WebP.'},
-            status=status.HTTP_400_BAD_REQUEST
+    try:
+        image = enregistrer_upload(
+            request.FILES['image'], str(request.user.id), request.build_absolute_uri,
+            empreinte.empreintes.get('image')
         )
-
-    # Vérifier la taille du fichier (max 5MB)
-    max_size = 5 * 1024 * 1024  # 5MB
-    if image_file.size > max_size:
+    except ImageInvalide as e:
         return Response(
-            {'error': 'Image trop volumineuse. Taille maximale: 5MB.'},
+            {'error': str(e)},
             status=status.HTTP_400_BAD_REQUEST
         )
-
-    # Importer les modules nécessaires
-    import os
-    from django.conf import settings
-    from django.core.files.storage import default_storage
-    from django.core.files.base import ContentFile
-    import uuid
-
-    # Générer un nom de fichier unique
-    ext = os.path.splitext(image_file.name)[1]
-    filename = f"produits/{uuid.uuid4()}{ext}"
-
-    # Sauvegarder le fichier
-    try:
-        path = default_storage.save(filename, ContentFile(image_file.read()))
-        # Construire l'URL complète
-        image_url = request.build_absolute_uri(settings.MEDIA_URL + path)
-
-        return Response(
-            {'url': image_url},
-            status=status.HTTP_201_CREATED
-        )
     except Exception as e:
         return Response(
             {'error': f'Erreur lors de l\'upload: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+    return Response(
+        {'url': image.url, 'image_id': str(image.id)},
+        status=status.HTTP_201_CREATED
+    )
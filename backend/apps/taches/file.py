@@ -0,0 +1,210 @@
+"""
+File de tâches de fond sur MongoDB.
+
+Déclarer une tâche dans le module `taches.py` d'une application:
+
+    from apps.taches.file import tache
+
+    @tache('commandes.envoyer_confirmation')
+    def envoyer_confirmation(commande_id):
+        ...
+
+puis la mettre en file depuis une vue: `enfiler('commandes.envoyer_confirmation', str(commande.id))`.
+Les arguments doivent être sérialisables en BSON (ids en chaînes).
+
+Les workers (`manage.py worker`) réservent les tâches par un
+`find_one_and_update` atomique : une tâche n'est exécutée que par un seul
+worker à la fois. Une tâche réservée reste invisible pendant son délai de
+visibilité ; si le worker s'arrête sans la terminer, elle redevient
+disponible. Une tâche en échec est reprogrammée avec un délai croissant,
+puis marquée « abandonnée » (dead-letter) après `tentatives_max` essais ;
+il en va de même d'une tâche qui a fait tomber son worker `tentatives_max`
+fois (elle n'est plus réservée). Les tâches terminées sont supprimées
+après `RETENTION_TERMINEES` (index TTL).
+
+Les tâches doivent donc être idempotentes : elles peuvent être exécutées
+plus d'une fois.
+"""
+import logging
+import random
+import traceback
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from pymongo import ReturnDocument
+
+from .models import Tache
+
+logger = logging.getLogger(__name__)
+
+# Délai entre deux tentatives: BASE * 2^(tentative - 1), plafonné
+DELAI_REPRISE_BASE = 10  # secondes
+DELAI_REPRISE_MAX = 3600
+# Délai de visibilité par défaut d'une tâche réservée
+DELAI_VISIBILITE = 300  # secondes
+
+_registre = {}
+
+
+def tache(nom, tentatives_max=5, delai_visibilite=DELAI_VISIBILITE, file='defaut'):
+    """Décorateur: enregistrer une fonction comme tâche de fond."""
+    def decorateur(fonction):
+        _registre[nom] = {
+            'fonction': fonction,
+            'tentatives_max': tentatives_max,
+            'delai_visibilite': delai_visibilite,
+            'file': file,
+        }
+        return fonction
+    return decorateur
+
+
+def taches_enregistrees():
+    """Noms des tâches connues de ce processus."""
+    return sorted(_registre)
+
+
+def enfiler(nom, *args, delai=0, **kwargs):
+    """
+    Mettre la tâche `nom` en file (exécution au plus tôt dans `delai`
+    secondes). Avec TACHES_SYNCHRONES (développement, tests), la tâche est
+    exécutée immédiatement dans le processus courant.
+    """
+    definition = _registre.get(nom)
+    if definition is None:
+        raise KeyError(f'Tâche inconnue: {nom}')
+
+    if settings.TACHES_SYNCHRONES:
+        # Comme avec un worker, une erreur de la tâche n'atteint pas l'appelant
+        try:
+            definition['fonction'](*args, **kwargs)
+        except Exception:
+            logger.exception("Tâche %s en échec (exécution synchrone)", nom)
+        return None
+
+    return Tache(
+        nom=nom,
+        args=list(args),
+        kwargs=kwargs,
+        file=definition['file'],
+        tentatives_max=definition['tentatives_max'],
+        delai_visibilite=definition['delai_visibilite'],
+        executer_apres=datetime.utcnow() + timedelta(seconds=delai),
+    ).save()
+
+
+def reserver(files, worker):
+    """
+    Réserver atomiquement la prochaine tâche exécutable des `files`:
+    en attente et arrivée à échéance, ou en cours mais dont le délai de
+    visibilité a expiré (worker arrêté). Une tâche dont les tentatives
+    sont épuisées n'est plus réservée. Retourne le document brut ou None.
+    """
+    maintenant = datetime.utcnow()
+    collection = Tache._get_collection()
+    tache_doc = collection.find_one_and_update(
+        {
+            'statut': {'$in': [Tache.STATUT_EN_ATTENTE, Tache.STATUT_EN_COURS]},
+            'file': {'$in': list(files)},
+            'executer_apres': {'$lte': maintenant},
+            '$expr': {'$lt': ['$tentatives', '$tentatives_max']},
+        },
+        {
+            '$set': {
+                'statut': Tache.STATUT_EN_COURS,
+                'worker': worker,
+                'executer_apres': maintenant + timedelta(seconds=DELAI_VISIBILITE),
+            },
+            '$inc': {'tentatives': 1},
+        },
+        sort=[('executer_apres', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+    if tache_doc is None:
+        abandonner_expirees(files)
+        return None
+    delai = tache_doc.get('delai_visibilite')
+    if delai and delai != DELAI_VISIBILITE:
+        # Délai propre à la tâche (toujours dans le futur: pas de fenêtre de reprise)
+        tache_doc['executer_apres'] = maintenant + timedelta(seconds=delai)
+        collection.update_one(
+            {'_id': tache_doc['_id'], 'worker': worker, 'tentatives': tache_doc['tentatives']},
+            {'$set': {'executer_apres': tache_doc['executer_apres']}}
+        )
+    return tache_doc
+
+
+def abandonner_expirees(files):
+    """
+    Marquer abandonnées les tâches en cours dont le délai de visibilité a
+    expiré à la dernière tentative (le worker est tombé à chaque essai).
+    """
+    maintenant = datetime.utcnow()
+    return Tache._get_collection().update_many(
+        {
+            'statut': Tache.STATUT_EN_COURS,
+            'file': {'$in': list(files)},
+            'executer_apres': {'$lte': maintenant},
+            '$expr': {'$gte': ['$tentatives', '$tentatives_max']},
+        },
+        {'$set': {
+            'statut': Tache.STATUT_ABANDONNEE,
+            'erreur': 'Délai de visibilité expiré à la dernière tentative (worker arrêté)',
+            'date_fin': maintenant,
+        }}
+    ).modified_count
+
+
+def delai_reprise(tentative):
+    """Délai avant la prochaine tentative, avec une part d'aléa."""
+    delai = min(DELAI_REPRISE_BASE * 2 ** (tentative - 1), DELAI_REPRISE_MAX)
+    return delai * random.uniform(0.8, 1.2)
+
+
+def executer(tache_doc):
+    """
+    Exécuter une tâche réservée et enregistrer son issue. Retourne True si
+    elle a réussi. Les mises à jour sont conditionnées au worker qui l'a
+    réservée: un worker dont le délai a expiré n'écrase pas une reprise.
+    """
+    collection = Tache._get_collection()
+    filtre = {'_id': tache_doc['_id'], 'worker': tache_doc['worker'],
+              'tentatives': tache_doc['tentatives']}
+    definition = _registre.get(tache_doc['nom'])
+
+    try:
+        if definition is None:
+            raise KeyError(f"Tâche inconnue: {tache_doc['nom']}")
+        definition['fonction'](*tache_doc.get('args', []), **tache_doc.get('kwargs', {}))
+    except Exception:
+        erreur = traceback.format_exc(limit=5)
+        tentative = tache_doc['tentatives']
+        abandon = tentative >= tache_doc.get('tentatives_max', 5)
+        logger.warning("Tâche %s (%s) en échec, tentative %s%s", tache_doc['nom'],
+                       tache_doc['_id'], tentative, ' (abandonnée)' if abandon else '')
+        collection.update_one(filtre, {'$set': {
+            'statut': Tache.STATUT_ABANDONNEE if abandon else Tache.STATUT_EN_ATTENTE,
+            'erreur': erreur,
+            'executer_apres': datetime.utcnow() + timedelta(seconds=delai_reprise(tentative)),
+            'date_fin': datetime.utcnow() if abandon else None,
+        }})
+        return False
+
+    collection.update_one(filtre, {'$set': {
+        'statut': Tache.STATUT_TERMINEE,
+        'date_fin': datetime.utcnow(),
+        'erreur': None,
+    }})
+    return True
+
+
+def relancer_abandonnees(nom=None):
+    """Remettre en file les tâches abandonnées (après correction)."""
+    filtre = {'statut': Tache.STATUT_ABANDONNEE}
+    if nom:
+        filtre['nom'] = nom
+    return Tache._get_collection().update_many(filtre, {'$set': {
+        'statut': Tache.STATUT_EN_ATTENTE,
+        'tentatives': 0,
+        'executer_apres': datetime.utcnow(),
+    }}).modified_count
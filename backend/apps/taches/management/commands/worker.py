@@ -0,0 +1,80 @@
+"""
+Worker de la file de tâches de fond.
+
+Usage: python manage.py worker [--concurrence 4] [--files defaut emails] [--intervalle 1]
+
+Arrêt propre sur SIGTERM/SIGINT: plus de nouvelle réservation, les tâches
+en cours se terminent. Une tâche interrompue brutalement (SIGKILL) est
+reprise par un autre worker à l'expiration de son délai de visibilité.
+"""
+import os
+import signal
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from apps.taches.file import reserver, executer, taches_enregistrees
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches de fond mises en file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrence', type=int, default=4,
+            help="Nombre de tâches exécutées en parallèle."
+        )
+        parser.add_argument(
+            '--files', nargs='+', default=['defaut'],
+            help="Files à traiter."
+        )
+        parser.add_argument(
+            '--intervalle', type=float, default=1,
+            help="Attente (secondes) quand la file est vide."
+        )
+        parser.add_argument(
+            '--une-fois', action='store_true',
+            help="Vider la file puis s'arrêter."
+        )
+
+    def handle(self, *args, **options):
+        concurrence = max(1, options['concurrence'])
+        files = options['files']
+        worker = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+
+        arret = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: arret.set())
+
+        # Une place libre dans le pool par tâche réservée: on ne réserve
+        # jamais plus de tâches qu'on ne peut en exécuter
+        places = threading.Semaphore(concurrence)
+
+        def lancer(tache_doc):
+            try:
+                executer(tache_doc)
+            finally:
+                places.release()
+
+        self.stdout.write(
+            f"Worker {worker}: files {', '.join(files)}, concurrence {concurrence}, "
+            f"{len(taches_enregistrees())} tâche(s) enregistrée(s)."
+        )
+        with ThreadPoolExecutor(max_workers=concurrence, thread_name_prefix='tache') as pool:
+            while not arret.is_set():
+                if not places.acquire(timeout=options['intervalle']):
+                    continue
+                tache_doc = reserver(files, worker)
+                if tache_doc is None:
+                    places.release()
+                    if options['une_fois']:
+                        break
+                    arret.wait(options['intervalle'])
+                    continue
+                pool.submit(lancer, tache_doc)
+
+            self.stdout.write("Arrêt: attente des tâches en cours...")
+        self.stdout.write(self.style.SUCCESS("Worker arrêté."))
@@ -0,0 +1,69 @@
+"""
+Modèle MongoDB pour la file de tâches de fond.
+Collection: jobs
+"""
+from mongoengine import (
+    Document, StringField, IntField, DateTimeField, DictField, ListField
+)
+from datetime import datetime
+
+# Durée de conservation des tâches terminées (index TTL sur date_fin);
+# les tâches abandonnées sont gardées pour `relancer_abandonnees`
+RETENTION_TERMINEES = 7 * 24 * 3600  # secondes
+
+
+class Tache(Document):
+    """
+    Tâche en file d'attente, exécutée par `manage.py worker`.
+    Collection: jobs
+    """
+    # Statuts de tâche
+    STATUT_EN_ATTENTE = 'en_attente'
+    STATUT_EN_COURS = 'en_cours'
+    STATUT_TERMINEE = 'terminee'
+    STATUT_ABANDONNEE = 'abandonnee'  # Tentatives épuisées (dead-letter)
+
+    STATUT_CHOICES = [
+        (STATUT_EN_ATTENTE, 'En attente'),
+        (STATUT_EN_COURS, 'En cours'),
+        (STATUT_TERMINEE, 'Terminée'),
+        (STATUT_ABANDONNEE, 'Abandonnée'),
+    ]
+
+    # Fonction enregistrée (@tache) et ses arguments
+    nom = StringField(required=True)
+    args = ListField()
+    kwargs = DictField()
+    file = StringField(default='defaut')
+
+    statut = StringField(choices=STATUT_CHOICES, default=STATUT_EN_ATTENTE)
+    tentatives = IntField(default=0)
+    tentatives_max = IntField(default=5)
+    # En attente: date d'exécution au plus tôt.
+    # En cours: fin du délai de visibilité (la tâche est reprise au-delà).
+    executer_apres = DateTimeField(default=datetime.utcnow)
+    delai_visibilite = IntField(default=300)  # secondes
+
+    worker = StringField()
+    erreur = StringField()
+
+    # Dates
+    date_creation = DateTimeField(default=datetime.utcnow)
+    date_fin = DateTimeField()
+
+    meta = {
+        'collection': 'jobs',
+        'indexes': [
+            ('statut', 'file', 'executer_apres'),
+            'nom',
+            'date_creation',
+            {
+                'fields': ['date_fin'],
+                'expireAfterSeconds': RETENTION_TERMINEES,
+                'partialFilterExpression': {'statut': STATUT_TERMINEE},
+            },
+        ]
+    }
+
+    def __str__(self):
+        return f"Tâche {self.nom} ({self.statut})"
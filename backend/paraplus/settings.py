@@ -6,6 +6,7 @@ Marketplace parapharmacie et location de matériel médical.
 from pathlib import Path
 from datetime import timedelta
 import os
+import sys
 from decouple import config
 
 # Chemins de base
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
     'apps.locations',
     'apps.panier',
     'apps.paiements',
+    'apps.taches',
+    'apps.emails',
 ]
 
 MIDDLEWARE = [
@@ -57,6 +60,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Médias servis par Django en développement (voir paraplus/urls.py): en-têtes
+# de cache immuables des fichiers adressés par leur contenu. En production,
+# les médias sont servis par Cloudinary, qui fixe lui-même leur cache.
+if DEBUG:
+    MIDDLEWARE.insert(2, 'apps.core.middleware.CacheImmuableMiddleware')
+
 ROOT_URLCONF = 'paraplus.urls'
 
 TEMPLATES = [
@@ -90,11 +99,60 @@ DATABASES = {
 
 # Configuration MongoEngine - base de données unique
 import mongoengine
-mongoengine.connect(
-    db='Database',
-    host=MONGODB_URI,
-    alias='default'
-)
+# `manage.py test`: base MongoDB en mémoire (mongomock), sans serveur
+TESTS = len(sys.argv) > 1 and sys.argv[1] == 'test'
+if TESTS:
+    import mongomock
+    mongoengine.connect(
+        db='test_para_plus',
+        host='mongodb://localhost',
+        mongo_client_class=mongomock.MongoClient,
+        alias='default'
+    )
+else:
+    mongoengine.connect(
+        db='Database',
+        host=MONGODB_URI,
+        alias='default'
+    )
+
+# Cache (réponses du catalogue, compteurs de pagination)
+# locmem en développement ; redis en production. L'invalidation du
+# catalogue repose sur un compteur de génération partagé : avec locmem,
+# chaque processus (workers gunicorn, `manage.py worker`) aurait le sien et
+# servirait des pages périmées, d'où le refus hors DEBUG. `file` ne se
+# partage qu'entre processus d'une même machine.
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem' if DEBUG else 'redis')
+if CACHE_BACKEND == 'locmem' and not DEBUG:
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured(
+        "CACHE_BACKEND=locmem n'est pas partagé entre processus: "
+        "utilisez redis (ou file sur une seule machine) en production."
+    )
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('CACHE_LOCATION', default='redis://127.0.0.1:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'para-plus',
+        }
+    }
+
+# Durée de vie des réponses publiques du catalogue (secondes)
+CACHE_CATALOGUE_TIMEOUT = config('CACHE_CATALOGUE_TIMEOUT', default=300, cast=int)
 
 # Validation des mots de passe
 AUTH_PASSWORD_VALIDATORS = [
@@ -128,6 +186,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads: au-delà de cette taille, Django écrit le fichier reçu par
+# morceaux dans un fichier temporaire au lieu de le garder en mémoire
+FILE_UPLOAD_MAX_MEMORY_SIZE = config('FILE_UPLOAD_MAX_MEMORY_SIZE', default=512 * 1024, cast=int)
+
 # Configuration Cloudinary pour stockage images en production
 CLOUDINARY_STORAGE = {
     'CLOUD_NAME': config('CLOUDINARY_CLOUD_NAME', default=''),
@@ -184,6 +246,30 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Hachage des mots de passe: coût bcrypt et pool de threads borné
+BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', default=12, cast=int)
+BCRYPT_THREADS = config('BCRYPT_THREADS', default=2, cast=int)
+BCRYPT_FILE_MAX = config('BCRYPT_FILE_MAX', default=16, cast=int)
+BCRYPT_ATTENTE_MAX = config('BCRYPT_ATTENTE_MAX', default=5, cast=float)
+
+# Certificats publics des ID tokens Google (surchargeable pour les tests)
+GOOGLE_CERTS_URL = config('GOOGLE_CERTS_URL', default='https://www.googleapis.com/oauth2/v1/certs')
+
+# Numéros de commande réservés par blocs (un accès MongoDB par bloc)
+NUMERO_COMMANDE_BLOC = config('NUMERO_COMMANDE_BLOC', default=20, cast=int)
+
+# Paiements: processeur (chemin d'import) et secret des webhooks (HMAC)
+PAIEMENT_PROCESSEUR = config('PAIEMENT_PROCESSEUR', default='apps.paiements.processeurs.ProcesseurFactice')
+PAIEMENT_WEBHOOK_SECRET = config('PAIEMENT_WEBHOOK_SECRET', default='')
+
+# Tâches de fond: exécutées par `manage.py worker`, ou immédiatement
+# dans la requête si TACHES_SYNCHRONES (développement sans worker)
+TACHES_SYNCHRONES = config('TACHES_SYNCHRONES', default=False, cast=bool)
+
+# Index de recherche en mémoire (autocomplétion): construit au démarrage
+# du serveur (paraplus.wsgi) en production, au premier appel en développement
+INDEX_RECHERCHE_AU_DEMARRAGE = config('INDEX_RECHERCHE_AU_DEMARRAGE', default=not DEBUG, cast=bool)
+
 # Configuration CORS
 CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
@@ -215,3 +301,12 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@para-plus.tn')
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=10, cast=int)
+
+# Envoi en file (apps.emails): connexions SMTP réutilisées par worker,
+# inactivité avant fermeture (secondes) et débit par domaine destinataire
+# (messages/seconde, surchargeable par domaine)
+EMAIL_CONNEXIONS_SMTP = config('EMAIL_CONNEXIONS_SMTP', default=2, cast=int)
+EMAIL_INACTIVITE_SMTP = config('EMAIL_INACTIVITE_SMTP', default=60, cast=int)
+EMAIL_DEBIT_FOURNISSEUR = config('EMAIL_DEBIT_FOURNISSEUR', default=5, cast=float)
+EMAIL_DEBITS_FOURNISSEURS = {}
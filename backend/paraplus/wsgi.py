@@ -8,3 +8,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'paraplus.settings')
 
 application = get_wsgi_application()
+
+# Index de recherche en mémoire: construit en arrière-plan par le serveur
+# seulement (les commandes de gestion n'importent pas ce module)
+from apps.produits.index_recherche import demarrer_construction  # noqa: E402
+demarrer_construction()